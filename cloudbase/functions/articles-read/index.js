@@ -54,6 +54,7 @@ async function getToday() {
   const { data: articles } = await db.collection('daily_articles')
     .where({ date: todayStr })
     .orderBy('domain', 'asc')
+    .orderBy('sort_order', 'asc')
     .get();
 
   if (articles && articles.length > 0) {
@@ -86,6 +87,7 @@ async function getArchive(params) {
     .where(where)
     .orderBy('date', 'desc')
     .orderBy('domain', 'asc')
+    .orderBy('sort_order', 'asc')
     .skip(skip)
     .limit(limit)
     .get();
@@ -116,6 +118,7 @@ async function searchArticles(params) {
     .where(where)
     .orderBy('date', 'desc')
     .orderBy('domain', 'asc')
+    .orderBy('sort_order', 'asc')
     .limit(limit)
     .get();
 
@@ -1,6 +1,9 @@
 /**
  * articles-write: 批量写入当日文章（原子替换）
  * v2: 2026-02-07 更新 - 一次性发布，不会出现中间状态
+ * v3: 新增 mode: 'upsert' - 按文章 id 逐条插入/更新，content_hash 未变则跳过
+ *     （pepper/cloudbase_client.py 分批发送时使用，重试幂等）
+ *     deletes: [id...] 删除指定文章；keep: [id...] 删除当天不在列表中的其他文章（首次全量发布时清理旧 id）
  * 
  * 策略：先写入带 pending 标记的新数据 → 验证完整 → 原子切换
  */
@@ -50,6 +53,93 @@ function validateArticle(article, validDomains) {
   return { valid: true };
 }
 
+/**
+ * 文章 → 数据库文档（不含 _id / created_at）
+ * index 为文章在本次请求中的位置：没带 sort_order 的写入方（整天替换模式）按它保留编辑顺序
+ */
+function toDoc(date, article, index) {
+  return {
+    date,
+    domain: article.domain,
+    title: article.title,
+    author_name: article.author_name,
+    author_intro: article.author_intro || '',
+    source: article.source,
+    source_date: article.source_date || '',
+    source_url: article.source_url,
+    thumbnail: article.thumbnail || '',
+    content: article.content,
+    detail: article.detail || '',
+    insight: article.insight || '',
+    sort_order: Number.isInteger(article.sort_order) ? article.sort_order : index,
+    content_hash: article.content_hash || ''
+  };
+}
+
+/**
+ * upsert 模式：按 article.id 逐条写入
+ * - 不存在 → 插入；存在且 content_hash 相同 → 跳过；否则更新
+ * - 单条失败不影响其他文章，记入 failed
+ */
+async function upsertArticles(date, articles, validDomains) {
+  const now = new Date().toISOString();
+  const collection = db.collection('daily_articles');
+  const counts = { inserted: 0, updated: 0, skipped: 0 };
+  const failed = [];
+  
+  await Promise.all(articles.map(async (article, index) => {
+    const id = article.id;
+    if (!id || !id.startsWith(`${date}_`)) {
+      failed.push({ id: id || null, error: '缺少或无效 id' });
+      return;
+    }
+    const check = validateArticle(article, validDomains);
+    if (!check.valid) {
+      failed.push({ id, error: check.error });
+      return;
+    }
+    
+    try {
+      const { data } = await collection.doc(id).get();
+      const existing = data && data[0];
+      if (existing && article.content_hash && existing.content_hash === article.content_hash) {
+        counts.skipped++;
+      } else if (existing) {
+        await collection.doc(id).update({ ...toDoc(date, article, index), updated_at: now });
+        counts.updated++;
+      } else {
+        await collection.add({ _id: id, ...toDoc(date, article, index), created_at: now });
+        counts.inserted++;
+      }
+    } catch (e) {
+      console.error(`Upsert failed for ${id}:`, e);
+      failed.push({ id, error: e.message });
+    }
+  }));
+  
+  return { ...counts, failed, date };
+}
+
+/**
+ * upsert 模式的删除：deletes 按 id 删除，keep 删除当天不在列表中的文档
+ * 只接受当天的 id，避免误删其他日期
+ */
+async function deleteArticles(date, deletes, keep) {
+  const collection = db.collection('daily_articles');
+  let deleted = 0;
+  
+  const ids = (deletes || []).filter(id => typeof id === 'string' && id.startsWith(`${date}_`));
+  if (ids.length > 0) {
+    const { deleted: n } = await collection.where({ date, _id: _.in(ids) }).remove();
+    deleted += n || 0;
+  }
+  if (Array.isArray(keep) && keep.length > 0) {
+    const { deleted: n } = await collection.where({ date, _id: _.nin(keep) }).remove();
+    deleted += n || 0;
+  }
+  return deleted;
+}
+
 /**
  * 清理 pending 数据（回滚用）
  */
@@ -65,7 +155,7 @@ exports.main = async (event) => {
   try {
     // === 解析参数 ===
     const isHttpInvoke = event.headers || event.queryStringParameters;
-    let date, articles;
+    let date, articles, mode, deletes, keep;
     
     if (isHttpInvoke) {
       const apiKey = event.headers?.['x-api-key'] || event.queryStringParameters?.key || '';
@@ -84,21 +174,37 @@ exports.main = async (event) => {
       
       date = body.date;
       articles = body.articles;
+      mode = body.mode;
+      deletes = body.deletes;
+      keep = body.keep;
     } else {
       date = event.date;
       articles = event.articles;
+      mode = event.mode;
+      deletes = event.deletes;
+      keep = event.keep;
     }
     
     if (!date || !/^\d{4}-\d{2}-\d{2}$/.test(date)) {
       return { statusCode: 400, body: JSON.stringify({ success: false, error: '缺少或无效日期' }) };
     }
     
-    if (!Array.isArray(articles) || articles.length === 0) {
+    // upsert 模式允许只带 deletes / keep 的请求
+    const hasDeletes = mode === 'upsert' && ((deletes && deletes.length) || (keep && keep.length));
+    if (!Array.isArray(articles) || (articles.length === 0 && !hasDeletes)) {
       return { statusCode: 400, body: JSON.stringify({ success: false, error: 'articles 不能为空' }) };
     }
     
-    // === 验证所有文章 ===
     const validDomains = await loadValidDomains();
+    
+    // === upsert 模式：逐条写入 + 按需删除，不做整天替换 ===
+    if (mode === 'upsert') {
+      const data = await upsertArticles(date, articles, validDomains);
+      data.deleted = hasDeletes ? await deleteArticles(date, deletes, keep) : 0;
+      return { statusCode: 200, body: JSON.stringify({ success: true, data, error: null }) };
+    }
+    
+    // === 验证所有文章 ===
     const errors = [];
     
     for (let i = 0; i < articles.length; i++) {
@@ -122,18 +228,7 @@ exports.main = async (event) => {
     const now = new Date().toISOString();
     const docs = articles.map((article, idx) => ({
       _id: `${date}_${article.domain}_${String(idx + 1).padStart(3, '0')}`,
-      date,
-      domain: article.domain,
-      title: article.title,
-      author_name: article.author_name,
-      author_intro: article.author_intro || '',
-      source: article.source,
-      source_date: article.source_date || '',
-      source_url: article.source_url,
-      thumbnail: article.thumbnail || '',
-      content: article.content,
-      detail: article.detail || '',
-      insight: article.insight || '',
+      ...toDoc(date, article, idx),
       created_at: now,
       _pending: true  // 临时标记
     }));
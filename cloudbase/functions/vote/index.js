@@ -8,6 +8,9 @@
  *   - create: 创建/更新投票问题
  *   - trend: 查询领域趋势
  *   - stats: 获取所有问题的统计数据（供 Pepper 日报使用）
+ *
+ * 既可通过 SDK callFunction 调用，也可通过 HTTP 访问服务调用
+ * （POST JSON body 或 query string 传 action 等参数）
  */
 const cloud = require('@cloudbase/node-sdk');
 
@@ -332,8 +335,24 @@ async function getTrend(params) {
 }
 
 // === 主入口 ===
-exports.main = async (event) => {
+/**
+ * HTTP 访问服务调用时，参数在 query string / body 中，展开为普通 event
+ */
+function normalizeEvent(event) {
+  if (!event || !event.httpMethod) return event;
+  let body = {};
+  try {
+    const raw = event.isBase64Encoded ? Buffer.from(event.body || '', 'base64').toString() : event.body;
+    body = typeof raw === 'string' ? JSON.parse(raw || '{}') : (raw || {});
+  } catch (e) {
+    body = {};
+  }
+  return { ...(event.queryStringParameters || {}), ...body };
+}
+
+exports.main = async (rawEvent) => {
   try {
+    const event = normalizeEvent(rawEvent);
     const action = event.action || 'result';
 
     switch (action) {
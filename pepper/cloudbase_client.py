@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Mind Our Times - articles-write 发布客户端
+
+publish-to-cloudbase.py 和 publish-today.py 共用：
+1. 按请求体大小和条数把文章切成批次
+2. 复用 keep-alive 连接，有界并发地发送各批次
+3. 每篇文章带稳定 id（日期 + source_url 哈希）和内容哈希，
+   云函数以 upsert 模式写入，未变化的文章跳过，因此失败重试是幂等的
+4. 按本地发布清单（data/publish-manifest/<date>.json）只发送改动：新增、修改、删除
+5. 汇总 inserted / updated / skipped / deleted / failed
+
+环境变量 MOT_ARTICLES_API_URL 可指向本地替身服务（scripts/bench-cloudbase-publish.py serve）。
+"""
+import hashlib
+import http.client
+import json
+import os
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlparse
+
+# CloudBase API配置
+CLOUDBASE_ENV = "mind-our-times-3g7c3va270081e5c"
+API_URL = os.environ.get("MOT_ARTICLES_API_URL", f"https://{CLOUDBASE_ENV}.service.tcloudbase.com/articles-write")
+API_KEY = os.environ.get("MOT_ARTICLES_API_KEY", "FhoEwlj6ybrT3Mv1T6GceJvqgu2PQBazsKEz6Y-5Pkg")
+
+MAX_BATCH_BYTES = 256 * 1024    # 单个请求体上限（字节）
+MAX_BATCH_ARTICLES = 20         # 单个请求最多文章数
+DEFAULT_CONCURRENCY = 4         # 同时发送的批次数
+HTTP_TIMEOUT = 30               # 单次请求超时（秒）
+HTTP_RETRIES = 3                # 每个批次最多尝试次数
+HTTP_BACKOFF = 0.5              # 重试间隔基数（秒），按 2 的幂增长
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 每天一个发布清单（id → content_hash），用于增量发布
+MANIFEST_DIR = Path(__file__).resolve().parent.parent / "data" / "publish-manifest"
+
+# 参与内容哈希的字段：任一字段变化即视为文章有更新（含 sort_order，调整顺序也会更新）
+HASHED_FIELDS = ("domain", "title", "author_name", "author_intro", "source", "source_date",
+                 "source_url", "thumbnail", "content", "detail", "insight", "sort_order")
+
+
+class PublishError(Exception):
+    """批次发送失败（已用尽重试或不可重试的错误）"""
+
+
+def article_id(date, article):
+    """稳定文档 id：同一天同一 source_url 永远映射到同一 id"""
+    digest = hashlib.sha1(article["source_url"].encode("utf-8")).hexdigest()[:12]
+    return f"{date}_{digest}"
+
+
+def content_hash(article):
+    """文章内容哈希（规范化 JSON 的 sha256 前 16 位）"""
+    canonical = json.dumps({k: article.get(k, "") for k in HASHED_FIELDS},
+                           ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def prepare_articles(date, articles):
+    """给每篇文章补上 id、sort_order 和 content_hash（返回新列表，不修改入参）
+
+    id 由 source_url 决定、不再反映顺序，所以用 sort_order（输入中的位置）保留编辑排序，
+    读取端按 domain、sort_order 排序。同一天出现重复 source_url 会映射到同一 id，直接拒绝。
+    """
+    seen = {}
+    for index, article in enumerate(articles):
+        first = seen.setdefault(article["source_url"], index)
+        if first != index:
+            raise ValueError(f"duplicate source_url {article['source_url']} on {date}: "
+                             f"#{first + 1} {articles[first].get('title', '')!r} and "
+                             f"#{index + 1} {article.get('title', '')!r}")
+    prepared = []
+    for index, article in enumerate(articles):
+        article = dict(article, sort_order=index)
+        prepared.append(dict(article, id=article_id(date, article), content_hash=content_hash(article)))
+    return prepared
+
+
+def chunk_articles(articles, max_bytes=MAX_BATCH_BYTES, max_count=MAX_BATCH_ARTICLES):
+    """按序把文章切成批次：每批编码后不超过 max_bytes，且不超过 max_count 篇
+
+    单篇就超过 max_bytes 的文章独占一批（交给服务端判断是否接受）。
+    """
+    batches, batch, size = [], [], 0
+    for article in articles:
+        encoded = len(json.dumps(article, ensure_ascii=False).encode("utf-8")) + 1
+        if batch and (size + encoded > max_bytes or len(batch) >= max_count):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(article)
+        size += encoded
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+@dataclass
+class PublishResult:
+    """一次发布的汇总"""
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0            # 服务端确认内容未变
+    unchanged: int = 0          # 按本地清单未变，没有发送
+    deleted: int = 0
+    failed: int = 0
+    batches: int = 0
+    retries: int = 0
+    bytes_sent: int = 0
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return self.failed == 0
+
+
+class HttpSession:
+    """单一主机的 keep-alive 连接池，供多个线程并发 POST JSON"""
+
+    def __init__(self, base_url, max_idle=DEFAULT_CONCURRENCY, ssl_context=None):
+        parsed = urlparse(base_url)
+        self.scheme = parsed.scheme.lower()
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if self.scheme == "https" else 80)
+        self.path = parsed.path or "/"
+        self.max_idle = max_idle
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.opened = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def _acquire(self, timeout):
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                conn = self._idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=timeout,
+                                               context=self.ssl_context), False
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout), False
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def post_json(self, payload, headers=None, timeout=HTTP_TIMEOUT):
+        """POST JSON，返回 (status, body_bytes)；复用的连接已被服务器关闭时换新连接重试一次"""
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        for _ in range(2):
+            conn, reused = self._acquire(timeout)
+            try:
+                conn.request("POST", self.path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                continue
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            return resp.status, data
+        raise PublishError("connection closed by server")
+
+    def close(self):
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
+
+
+def parse_function_response(status, data):
+    """解析 articles-write 的响应（HTTP 访问时 body 可能再包一层 statusCode/body）"""
+    try:
+        result = json.loads(data or b"{}")
+    except ValueError:
+        raise PublishError(f"HTTP {status}: invalid JSON")
+    if isinstance(result, dict) and "statusCode" in result and "body" in result:
+        status = result["statusCode"]
+        body = result["body"]
+        result = json.loads(body) if isinstance(body, str) else body
+    return status, result
+
+
+class PublishManifest:
+    """某一天已成功发布的文章清单：{id: content_hash}
+
+    存于 MANIFEST_DIR/<date>.json。重新发布时与当前文章列表比对，
+    只发送新增 / 修改的文章和需要删除的 id，耗时与负载随改动量而不是当天文章数增长。
+
+    清单只记录经本客户端写入的结果。publish.py / publish-via-cli.sh 走整天替换模式，
+    会换掉服务端文档而清单不知情，所以它们在发布时调用 discard() 删除当天清单，
+    下次增量发布自动退回全量（--full）。
+    """
+
+    def __init__(self, date, root=MANIFEST_DIR):
+        self.date = date
+        self.path = Path(root) / f"{date}.json"
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("articles", {})
+        except (OSError, ValueError):
+            return None
+
+    def exists(self):
+        return self.entries is not None
+
+    def diff(self, prepared):
+        """返回 (需要发送的文章, 需要删除的 id)"""
+        entries = self.entries or {}
+        changed = [a for a in prepared if entries.get(a["id"]) != a["content_hash"]]
+        current = {a["id"] for a in prepared}
+        deletes = sorted(i for i in entries if i not in current)
+        return changed, deletes
+
+    def discard(self):
+        """删除清单（服务端被其他途径改写后调用），下次发布按全量处理"""
+        self.entries = None
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def update(self, published, deleted, replace=False):
+        """记录本次发布结果并原子写回；replace 时以 published 为完整清单"""
+        entries = {} if replace or self.entries is None else dict(self.entries)
+        entries.update(published)
+        for article_id in deleted:
+            entries.pop(article_id, None)
+        self.entries = entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"date": self.date, "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "articles": entries}, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+class CloudBaseClient:
+    """articles-write 发布客户端：分批、连接复用、有界并发、幂等重试"""
+
+    def __init__(self, api_url=API_URL, api_key=API_KEY, concurrency=DEFAULT_CONCURRENCY,
+                 max_batch_bytes=MAX_BATCH_BYTES, max_batch_articles=MAX_BATCH_ARTICLES,
+                 retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, timeout=HTTP_TIMEOUT, ssl_context=None):
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_articles = max_batch_articles
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = HttpSession(api_url, max_idle=concurrency, ssl_context=ssl_context)
+
+    def call(self, payload):
+        """调用 articles-write 一次（带重试），返回解析后的 data 字段和重试次数"""
+        headers = {"x-api-key": self.api_key}
+        last_error = None
+        for attempt in range(1, self.retries + 1):
+            try:
+                status, result = parse_function_response(
+                    *self.session.post_json(payload, headers, self.timeout))
+                if status == 200 and result.get("success"):
+                    return result.get("data") or {}, attempt - 1
+                last_error = f"HTTP {status}: {result.get('error')}"
+                if status not in RETRY_STATUS:
+                    break
+            except (OSError, http.client.HTTPException, PublishError) as e:
+                last_error = f"{type(e).__name__}: {e}"
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+        raise PublishError(last_error)
+
+    def publish(self, date, articles, manifest=None, full=False, on_batch=None):
+        """以 upsert 模式发布 date 当天的文章，返回 PublishResult
+
+        manifest 为 PublishManifest 时只发送与上次成功发布相比新增 / 修改的文章，
+        并删除已不在列表中的文章；否则（或 full=True）发送全部文章，
+        并让服务端清除当天不在列表中的旧文档，成功后重建清单。
+        on_batch(index, batch, data_or_error) 在每个批次完成时回调（用于打印进度）。
+        """
+        started = time.monotonic()
+        prepared = prepare_articles(date, articles)
+        if manifest is not None and manifest.exists() and not full:
+            changed, deletes = manifest.diff(prepared)
+            keep = None
+        else:
+            changed, deletes = prepared, []
+            keep = [article["id"] for article in prepared] or None
+        batches = chunk_articles(changed, self.max_batch_bytes, self.max_batch_articles)
+        result = PublishResult(batches=len(batches), unchanged=len(prepared) - len(changed))
+        published = {}  # 本次确认写入（或服务端确认未变）的 id → content_hash
+        lock = threading.Lock()
+
+        def send(index, batch):
+            payload = {"date": date, "mode": "upsert", "articles": batch}
+            try:
+                data, retries = self._send(payload, result, lock)
+            except PublishError as e:
+                with lock:
+                    result.failed += len(batch)
+                    result.errors.append(f"batch {index + 1}: {e}")
+                return index, batch, e
+            failed_ids = {failure.get("id") for failure in data.get("failed", [])}
+            with lock:
+                result.inserted += data.get("inserted", 0)
+                result.updated += data.get("updated", 0)
+                result.skipped += data.get("skipped", 0)
+                result.retries += retries
+                for failure in data.get("failed", []):
+                    result.failed += 1
+                    result.errors.append(f"{failure.get('id')}: {failure.get('error')}")
+                for article in batch:
+                    if article["id"] not in failed_ids:
+                        published[article["id"]] = article["content_hash"]
+            return index, batch, data
+
+        if batches:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(batches)))) as pool:
+                futures = [pool.submit(send, i, batch) for i, batch in enumerate(batches)]
+                for future in as_completed(futures):
+                    if on_batch:
+                        on_batch(*future.result())
+
+        # 删除放在写入之后：读者不会看到文章先消失再出现；有写入失败时不清理，留待下次
+        cleaned = False
+        if (deletes or keep) and result.failed == 0:
+            payload = {"date": date, "mode": "upsert", "articles": [], "deletes": deletes}
+            if keep:
+                payload["keep"] = keep
+            try:
+                data, retries = self._send(payload, result, lock)
+                result.deleted = data.get("deleted", 0)
+                result.retries += retries
+                cleaned = True
+            except PublishError as e:
+                result.errors.append(f"deletes: {e}")
+
+        if manifest is not None:
+            if keep is None:
+                manifest.update(published, deletes if cleaned else [])
+            elif cleaned:
+                # 全量发布且当天旧文档已清理干净，才建立清单；否则下次仍走全量
+                manifest.update(published, [], replace=True)
+        result.elapsed = time.monotonic() - started
+        return result
+
+    def _send(self, payload, result, lock):
+        size = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        with lock:
+            result.bytes_sent += size
+        return self.call(payload)
+
+    def close(self):
+        self.session.close()
@@ -1,17 +1,16 @@
 #!/usr/bin/env python3
 """
 将思想雷达输出发布到 Mind Our Times (CloudBase)
-用法：python3 publish-to-cloudbase.py <日期YYYY-MM-DD>
+用法：python3 publish-to-cloudbase.py <日期YYYY-MM-DD> [--full]
+
+通过 cloudbase_client 分批、并发、幂等地写入（upsert 模式）。
+按 data/publish-manifest/<日期>.json 只发送改动的文章；--full 忽略清单全量发布。
 """
 import sys
 import json
-import requests
 from datetime import datetime
 
-# CloudBase API配置
-CLOUDBASE_ENV = "mind-our-times-3g7c3va270081e5c"
-API_URL = f"https://{CLOUDBASE_ENV}.service.tcloudbase.com/articles-write"
-API_KEY = "FhoEwlj6ybrT3Mv1T6GceJvqgu2PQBazsKEz6Y-5Pkg"
+from cloudbase_client import CloudBaseClient, PublishManifest
 
 # 领域映射：思想雷达中文→Mind Our Times标识
 DOMAIN_MAP = {
@@ -67,32 +66,32 @@ def convert_article(radar_item):
         "insight": clean_insight(radar_item["signal"])
     }
 
-def publish_to_cloudbase(date, articles):
-    """发布到CloudBase"""
-    payload = {
-        "date": date,
-        "articles": articles
-    }
-    
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": API_KEY
-    }
-    
+def publish_to_cloudbase(date, articles, client=None, full=False):
+    """发布到CloudBase（按发布清单增量发送）；只关闭自己创建的 client"""
+    own_client = client is None
+    client = client or CloudBaseClient()
+    manifest = PublishManifest(date)
     print(f"正在发布 {len(articles)} 篇文章到 CloudBase...")
-    response = requests.post(API_URL, json=payload, headers=headers)
     
-    if response.status_code == 200:
-        result = response.json()
-        if result.get("success"):
-            print(f"✓ 成功发布 {result['data']['inserted']} 篇文章")
-            return True
-        else:
-            print(f"✗ 发布失败：{result.get('error')}")
-            return False
-    else:
-        print(f"✗ HTTP {response.status_code}: {response.text}")
+    def on_batch(index, batch, outcome):
+        if isinstance(outcome, Exception):
+            print(f"  ✗ 批次 {index + 1}（{len(batch)} 篇）失败：{outcome}")
+    
+    try:
+        result = client.publish(date, articles, manifest=manifest, full=full, on_batch=on_batch)
+    except ValueError as e:
+        print(f"✗ 发布中止：{e}")
         return False
+    finally:
+        if own_client:
+            client.close()
+    
+    print(f"{'✓' if result.ok else '✗'} 新增 {result.inserted}，更新 {result.updated}，删除 {result.deleted}，"
+          f"未变 {result.unchanged + result.skipped}，失败 {result.failed}"
+          f"（{result.batches} 批，{result.bytes_sent / 1024:.0f} KB，重试 {result.retries} 次，{result.elapsed:.2f}s）")
+    for error in result.errors:
+        print(f"  ✗ {error}")
+    return result.ok
 
 def main():
     if len(sys.argv) < 2:
@@ -118,7 +117,7 @@ def main():
         print(f"  [{article['domain']}] {article['title']}")
     
     # 发布
-    success = publish_to_cloudbase(date, articles)
+    success = publish_to_cloudbase(date, articles, full="--full" in sys.argv)
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
@@ -1,9 +1,22 @@
 #!/usr/bin/env python3
-"""批量发布今日所有文章"""
+"""批量发布今日所有文章
+
+用法：python3 publish-today.py [日期YYYY-MM-DD] [--full]   # 日期缺省为今天
+通过 cloudbase_client 直接调用 articles-write HTTP 接口（不再经 cloudbase CLI 传参），
+按发布清单只发送改动的文章；--full 忽略清单全量发布。
+
+注意：清单只知道本脚本（及 publish-to-cloudbase.py）写入的内容。当天若用 publish.py /
+publish-via-cli.sh 或在控制台改过文章，清单已失效：前两者会自动删除当天清单，
+其他途径改动后请加 --full 重新发布。
+"""
 import json
-import subprocess
+import sys
+from datetime import datetime
+
+from cloudbase_client import CloudBaseClient, PublishManifest
 
-date = "2026-02-05"
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+date = args[0] if args else datetime.now().strftime("%Y-%m-%d")
 input_file = f"./memory/briefing-index/{date}-full.json"
 
 DOMAIN_MAP = {
@@ -43,20 +56,23 @@ for item in data:
         "thumbnail": item.get("thumbnail", "")        # og:image（v1.3 新增）
     })
 
-payload = {"date": date, "articles": articles}
-payload_json = json.dumps(payload, ensure_ascii=False)
-
 print(f"正在发布 {len(articles)} 篇文章...")
 
-result = subprocess.run([
-    "cloudbase", "functions:invoke", "articles-write",
-    "--params", payload_json,
-    "-e", "mind-our-times-3g7c3va270081e5c"
-], capture_output=True, text=True)
+client = CloudBaseClient()
+try:
+    result = client.publish(date, articles, manifest=PublishManifest(date), full="--full" in sys.argv)
+except ValueError as e:
+    print(f"✗ 发布中止：{e}")
+    exit(1)
+finally:
+    client.close()
 
-print(result.stdout)
-if result.returncode != 0:
-    print(result.stderr)
+print(f"新增 {result.inserted}，更新 {result.updated}，删除 {result.deleted}，"
+      f"未变 {result.unchanged + result.skipped}，失败 {result.failed}"
+      f"（{result.batches} 批，{result.bytes_sent / 1024:.0f} KB，{result.elapsed:.2f}s）")
+if not result.ok:
+    for error in result.errors:
+        print(f"  ✗ {error}")
     exit(1)
 
 print(f"\n✅ 发布完成！访问：https://mind-our-times-3g7c3va270081e5c-1397697000.tcloudbaseapp.com")
@@ -78,5 +78,8 @@ cloudbase functions:invoke articles-write \
   --params "$(cat $TEMP_JSON)" \
   -e mind-our-times-3g7c3va270081e5c
 
+# 整天替换后服务端文档已变，删除增量发布清单（下次 publish-today.py 自动全量）
+rm -f "$(cd "$(dirname "$0")/.." && pwd)/data/publish-manifest/${DATE}.json"
+
 # 清理
 rm -f "$TEMP_JSON"
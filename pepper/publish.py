@@ -6,6 +6,8 @@
 import sys
 import json
 
+from cloudbase_client import PublishManifest
+
 def main():
     if len(sys.argv) < 2:
         print("用法: python3 publish.py YYYY-MM-DD")
@@ -65,6 +67,9 @@ def main():
         }
     }
     
+    # 整天替换会换掉服务端文档，增量发布清单随之失效
+    PublishManifest(date).discard()
+    
     # 输出JSON供cloudbase CLI使用
     print(json.dumps(payload, ensure_ascii=False, indent=2))
 
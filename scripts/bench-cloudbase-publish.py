@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Mind Our Times - articles-write 发布基准与本地替身服务
+
+启动一个本地 HTTP 服务模拟 articles-write 云函数（整天替换 / upsert 两种模式，
+数据存在内存里），比较一次性整包发布与 pepper/cloudbase_client.py 分批并发发布的耗时，
+并验证重发幂等（未变化的文章全部跳过）、失败重试，
+以及按发布清单增量发布（只发送新增 / 修改 / 删除）。
+
+用法：
+  python3 scripts/bench-cloudbase-publish.py bench [--articles 120] [--per-article 0.02] [--fail-every 7]
+  python3 scripts/bench-cloudbase-publish.py serve [--port 8788]   # 供手动运行发布脚本：
+      MOT_ARTICLES_API_URL=http://127.0.0.1:8788/articles-write python3 pepper/publish-today.py 2026-02-05
+"""
+
+import argparse
+import importlib.util
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+PEPPER_DIR = SCRIPT_DIR.parent / "pepper"
+
+
+def load_client():
+    """加载 pepper/cloudbase_client.py"""
+    spec = importlib.util.spec_from_file_location("cloudbase_client", PEPPER_DIR / "cloudbase_client.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_articles(count, date="2026-02-05"):
+    domains = ["T", "P", "H", "Φ", "R", "F"]
+    return [{
+        "domain": domains[i % len(domains)],
+        "title": f"文章标题 {i}",
+        "author_name": f"作者 {i}",
+        "author_intro": "作者简介" * 5,
+        "source": "Bench Review",
+        "source_date": date,
+        "source_url": f"https://example.com/{date}/article-{i}",
+        "content": "正文摘要内容。" * 60,
+        "detail": "深度分析内容。" * 100,
+        "insight": "题外话",
+        "thumbnail": f"https://example.com/images/{i}.jpg",
+    } for i in range(count)]
+
+
+def make_handler(latency, per_article, fail_every):
+    """模拟 articles-write：每次请求固定延迟，每篇文章一次数据库写入的延迟"""
+    state = {"requests": 0, "failed": 0, "bytes": 0, "docs": {}}
+    lock = threading.Lock()
+
+    class ArticlesWriteStandIn(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            with lock:
+                state["requests"] += 1
+                state["bytes"] += len(raw)
+                fail = fail_every and state["requests"] % fail_every == 0
+                if fail:
+                    state["failed"] += 1
+            time.sleep(latency)
+            if fail:
+                return self.reply(503, {"success": False, "error": "simulated 503"})
+            body = json.loads(raw)
+            date, articles = body["date"], body["articles"]
+
+            if body.get("mode") == "upsert":
+                counts = {"inserted": 0, "updated": 0, "skipped": 0}
+                for article in articles:
+                    with lock:
+                        existing = state["docs"].get(article["id"])
+                    if existing and existing["content_hash"] == article["content_hash"]:
+                        counts["skipped"] += 1
+                        continue
+                    time.sleep(per_article)
+                    with lock:
+                        state["docs"][article["id"]] = dict(article, date=date)
+                    counts["updated" if existing else "inserted"] += 1
+                deleted = 0
+                with lock:
+                    keep = set(body.get("keep") or [])
+                    for doc_id in list(state["docs"]):
+                        doc = state["docs"][doc_id]
+                        if doc["date"] == date and (doc_id in body.get("deletes", []) or (keep and doc_id not in keep)):
+                            del state["docs"][doc_id]
+                            deleted += 1
+                return self.reply(200, {"success": True,
+                                        "data": {**counts, "deleted": deleted, "failed": [], "date": date}})
+
+            # 整天替换：每篇都写一次，再删除旧数据
+            time.sleep(per_article * len(articles))
+            with lock:
+                state["docs"] = {k: v for k, v in state["docs"].items() if v["date"] != date}
+                for idx, article in enumerate(articles):
+                    state["docs"][f"{date}_{article['domain']}_{idx + 1:03d}"] = dict(article, date=date)
+            return self.reply(200, {"success": True, "data": {"inserted": len(articles), "date": date}})
+
+        def reply(self, status, payload):
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ArticlesWriteStandIn, state
+
+
+def start_server(latency, per_article, fail_every, port=0):
+    handler, state = make_handler(latency, per_article, fail_every)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def bench(args):
+    client_module = load_client()
+    articles = make_articles(args.articles)
+    print(f"📊 {args.articles} articles, {args.latency * 1000:.0f} ms per request, "
+          f"{args.per_article * 1000:.0f} ms per article write, every {args.fail_every or '-'}th request fails\n")
+    print(f"{'run':>22} {'wall (s)':>9} {'reqs':>5} {'KB sent':>8} {'ins':>4} {'upd':>4} {'skip':>5} {'fail':>5}")
+
+    # 旧方式：整包一次 POST（不重试）
+    server, state = start_server(args.latency, args.per_article, 0)
+    url = f"http://127.0.0.1:{server.server_address[1]}/articles-write"
+    session = client_module.HttpSession(url)
+    started = time.monotonic()
+    status, _ = session.post_json({"date": "2026-02-05", "articles": articles})
+    assert status == 200
+    print(f"{'single POST (replace)':>22} {time.monotonic() - started:>9.2f} {state['requests']:>5} "
+          f"{state['bytes'] / 1024:>8.0f} {len(articles):>4} {'':>4} {'':>5} {'':>5}")
+    server.shutdown()
+
+    server, state = start_server(args.latency, args.per_article, args.fail_every)
+    url = f"http://127.0.0.1:{server.server_address[1]}/articles-write"
+    edited = [dict(a) for a in articles]
+    edited[3]["title"] += "（修订）"
+    runs = [("batched c=1", articles, 1), ("batched c=4", articles, 4),
+            ("republish unchanged", articles, 4), ("republish 1 edited", edited, 4)]
+    state["docs"].clear()
+    for name, payload, concurrency in runs:
+        if name == "batched c=4":
+            state["docs"].clear()
+        before = (state["requests"], state["bytes"])
+        client = client_module.CloudBaseClient(api_url=url, concurrency=concurrency, backoff=0.05)
+        result = client.publish("2026-02-05", payload)
+        client.close()
+        assert result.ok, result.errors
+        print(f"{name:>22} {result.elapsed:>9.2f} {state['requests'] - before[0]:>5} "
+              f"{(state['bytes'] - before[1]) / 1024:>8.0f} {result.inserted:>4} {result.updated:>4} "
+              f"{result.skipped:>5} {result.failed:>5}")
+    assert len(state["docs"]) == len(articles), "duplicate documents after republish"
+
+    # 发布清单：当天先有一份整天替换写入的旧 id 文档；
+    # 全量发布清掉旧文档并建清单，之后改 1 篇、删 1 篇、加 1 篇只发送改动
+    legacy = client_module.CloudBaseClient(api_url=url, backoff=0.05)
+    legacy.call({"date": "2026-02-05", "articles": articles})
+    legacy.close()
+    print(f"\n{'manifest run':>22} {'wall (s)':>9} {'reqs':>5} {'KB sent':>8} {'ins':>4} {'upd':>4} "
+          f"{'del':>4} {'same':>5} {'fail':>5}")
+    revised = [dict(a) for a in articles[:-1]] + make_articles(1, "2026-02-05-extra")
+    revised[5]["content"] += "补充一句。"
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, payload in (("full + manifest", articles), ("unchanged", articles), ("1 edit/1 del/1 new", revised)):
+            before = (state["requests"], state["bytes"])
+            client = client_module.CloudBaseClient(api_url=url, concurrency=4, backoff=0.05)
+            manifest = client_module.PublishManifest("2026-02-05", root=tmp)
+            result = client.publish("2026-02-05", payload, manifest=manifest)
+            client.close()
+            assert result.ok, result.errors
+            print(f"{name:>22} {result.elapsed:>9.2f} {state['requests'] - before[0]:>5} "
+                  f"{(state['bytes'] - before[1]) / 1024:>8.1f} {result.inserted:>4} {result.updated:>4} "
+                  f"{result.deleted:>4} {result.unchanged + result.skipped:>5} {result.failed:>5}")
+    assert len(state["docs"]) == len(revised), "manifest publish left stale documents"
+    print(f"\n  {state['failed']} simulated 503s retried; {len(state['docs'])} documents stored")
+    server.shutdown()
+
+
+def serve(args):
+    server, state = start_server(args.latency, args.per_article, args.fail_every, args.port)
+    print(f"🛰️ articles-write stand-in on http://127.0.0.1:{server.server_address[1]}/articles-write (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\n{state['requests']} requests, {len(state['docs'])} documents")
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="articles-write publishing benchmark and local stand-in")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name in ('bench', 'serve'):
+        sub = subparsers.add_parser(name)
+        sub.add_argument('--articles', type=int, default=120, help="模拟的文章数")
+        sub.add_argument('--latency', type=float, default=0.1, help="每个请求的固定延迟（秒）")
+        sub.add_argument('--per-article', type=float, default=0.02, help="每篇文章写入的延迟（秒）")
+        sub.add_argument('--fail-every', type=int, default=7 if name == 'bench' else 0,
+                         help="每第 N 个请求返回 503")
+        if name == 'serve':
+            sub.add_argument('--port', type=int, default=8788)
+    args = parser.parse_args()
+    {'bench': bench, 'serve': serve}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark for fetch-og-image.py against a local HTTP stand-in.
+
+启动一个本地 HTTP 服务，每个页面人为延迟若干毫秒，
+比较不同并发数下批量抓取 og:image 的耗时。
+
+第二部分用同一替身服务验证连接池：统计 keep-alive 复用次数，
+并在缓存过期后用 ETag / Last-Modified 条件请求拿到 304。
+
+Usage:
+    python3 scripts/bench-og-image.py
+    python3 scripts/bench-og-image.py --articles 32 --latency 0.3 --levels 1,2,4,8
+    python3 scripts/bench-og-image.py --tls-cert cert.pem --tls-key key.pem   # HTTPS 替身
+"""
+
+import argparse
+import importlib.util
+import ssl
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+
+def load_fetcher():
+    """加载 fetch-og-image.py（文件名带连字符，无法直接 import）"""
+    spec = importlib.util.spec_from_file_location("fetch_og_image", SCRIPT_DIR / "fetch-og-image.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+LAST_MODIFIED = 'Mon, 02 Feb 2026 08:00:00 GMT'
+
+
+def make_handler(latency):
+    class StandInHandler(BaseHTTPRequestHandler):
+        """模拟出版方文章页：固定延迟后返回带 og:image 的 HTML，支持 keep-alive 和条件请求"""
+
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(latency)
+            etag = f'"{abs(hash(self.path))}"'
+            if self.headers.get('If-None-Match') == etag or self.headers.get('If-Modified-Since') == LAST_MODIFIED:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            body = (
+                '<!doctype html><html><head><title>Article</title>'
+                f'<meta property="og:image" content="/images{self.path}.jpg">'
+                '</head><body>' + '<p>lorem ipsum</p>' * 200 + '</body></html>'
+            ).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', LAST_MODIFIED)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StandInHandler
+
+
+def start_server(latency, tls_cert=None, tls_key=None):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(latency))
+    server.daemon_threads = True
+    if tls_cert:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(tls_cert, tls_key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent og:image fetching")
+    parser.add_argument('--articles', type=int, default=24, help="模拟的文章数")
+    parser.add_argument('--latency', type=float, default=0.25, help="每个页面的人为延迟（秒）")
+    parser.add_argument('--levels', default='1,2,4,8', help="要比较的并发数，逗号分隔")
+    parser.add_argument('--tls-cert', help="HTTPS 替身使用的证书（PEM，CN/SAN 为 127.0.0.1）")
+    parser.add_argument('--tls-key', help="HTTPS 替身使用的私钥（PEM）")
+    args = parser.parse_args()
+
+    fetcher = load_fetcher()
+    server = start_server(args.latency, args.tls_cert, args.tls_key)
+    scheme = 'https' if args.tls_cert else 'http'
+    base = f"{scheme}://127.0.0.1:{server.server_address[1]}"
+    ssl_context = ssl.create_default_context(cafile=args.tls_cert) if args.tls_cert else None
+    urls = [f"{base}/article-{i}" for i in range(args.articles)]
+
+    print(f"📊 {args.articles} articles, {args.latency * 1000:.0f} ms latency each\n")
+    print(f"{'concurrency':>12} {'wall (s)':>10} {'speedup':>8} {'found':>6}")
+
+    baseline = None
+    for level in [int(x) for x in args.levels.split(',')]:
+        started = time.monotonic()
+        # 所有 URL 都在同一个本地主机上，per-host 上限与并发数一致
+        pool = fetcher.ConnectionPool(max_idle_per_host=level, ssl_context=ssl_context)
+        results = fetcher.fetch_og_images(urls, concurrency=level, per_host=level, deadline=0, pool=pool)
+        elapsed = time.monotonic() - started
+        baseline = baseline or elapsed
+        found = sum(1 for r in results if r)
+        assert results == [f"{base}/images/article-{i}.jpg" for i in range(args.articles)], "results out of order"
+        print(f"{level:>12} {elapsed:>10.2f} {baseline / elapsed:>7.1f}x {found:>6}")
+        pool.close()
+
+    # 连接池 + 条件请求：第一轮写缓存，第二轮 TTL 为 0，所有条目都需重新验证
+    print(f"\n{'pass':>12} {'opened':>7} {'reused':>7} {'304s':>5} {'hits':>5}")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = fetcher.OgImageCache(path=f"{tmp}/cache.sqlite3", ttl=0, negative_ttl=0)
+        for name in ('cold', 'revalidate'):
+            pool = fetcher.ConnectionPool(max_idle_per_host=4, ssl_context=ssl_context)
+            hits_before = cache.hits
+            results = fetcher.fetch_og_images(urls, concurrency=4, per_host=4, deadline=0,
+                                              cache=cache, pool=pool)
+            pool.close()
+            assert all(results), "revalidated entries lost their image"
+            print(f"{name:>12} {pool.opened:>7} {pool.reused:>7} {pool.not_modified:>5} {cache.hits - hits_before:>5}")
+        cache.close()
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
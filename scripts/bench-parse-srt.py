@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark for parse_srt in podcast-enhanced-summary.py on synthetic
+multi-megabyte auto-caption VTT files.
+
+Fixtures mimic YouTube auto-subs: every cue repeats the previous line
+before adding a new one, words carry <00:00:00.000><c> timing tags, and
+[Music] markers appear now and then. The legacy whole-string parser is
+kept here for comparison; the streaming parser is fed the open file.
+
+Usage:
+  python3 scripts/bench-parse-srt.py
+  python3 scripts/bench-parse-srt.py --sizes 1,8,32
+"""
+
+import argparse
+import importlib.util
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+WORDS = ("the model learns to predict what comes next and that turns out to be "
+         "surprisingly powerful when you scale compute data and parameters together").split()
+
+
+def load_summarizer():
+    """Load podcast-enhanced-summary.py (hyphenated file name, not importable)."""
+    spec = importlib.util.spec_from_file_location("podcast_enhanced_summary",
+                                                  SCRIPT_DIR / "podcast-enhanced-summary.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_parse_srt(content: str) -> str:
+    """parse_srt as it was before the streaming rewrite."""
+    lines = []
+    seen = set()
+    for line in content.split('\n'):
+        line = line.strip()
+        if line.startswith('WEBVTT') or line.startswith('Kind:') or line.startswith('Language:'):
+            continue
+        if '-->' in line:
+            continue
+        if line.isdigit():
+            continue
+        if not line:
+            continue
+        if line.startswith('align:') or line.startswith('position:'):
+            continue
+        line = re.sub(r'<[^>]+>', '', line)
+        line = line.strip()
+        if not line:
+            continue
+        if line in seen:
+            continue
+        seen.add(line)
+        lines.append(line)
+    text = ' '.join(lines)
+    text = text.replace('[Music]', '').replace('[Applause]', '')
+    text = text.replace('  ', ' ')
+    return text
+
+
+def write_fixture(path: Path, megabytes: int, seed: int = 7):
+    """Write a rolling auto-caption VTT file of roughly the given size."""
+    rng = random.Random(seed)
+    target = megabytes * 1024 * 1024
+    written = 0
+    previous = ''
+    second = 0.0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("WEBVTT\nKind: captions\nLanguage: en\n\n")
+        while written < target:
+            words = [rng.choice(WORDS) for _ in range(rng.randint(5, 9))]
+            if rng.random() < 0.02:
+                words.insert(0, '[Music]')
+            start = f"{int(second // 3600):02d}:{int(second // 60 % 60):02d}:{second % 60:06.3f}"
+            second += 2.5
+            end = f"{int(second // 3600):02d}:{int(second // 60 % 60):02d}:{second % 60:06.3f}"
+            tagged = words[0] + ''.join(f"<{start}><c> {w}</c>" for w in words[1:])
+            cue = f"{start} --> {end} align:start position:0%\n{previous}\n{tagged}\n\n"
+            f.write(cue)
+            written += len(cue)
+            previous = ' '.join(words)
+
+
+def measure(fn):
+    """Time one run, then trace peak memory in a second run (tracemalloc skews timings)."""
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parse_srt on synthetic VTT files")
+    parser.add_argument('--sizes', default='1,4,16', help="fixture sizes in MB, comma-separated")
+    args = parser.parse_args()
+
+    summarizer = load_summarizer()
+    print(f"{'size':>6} {'parser':>10} {'time (s)':>9} {'MB/s':>7} {'peak MB':>8} {'out chars':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for megabytes in [int(x) for x in args.sizes.split(',')]:
+            path = Path(tmp) / f"bench-{megabytes}mb.vtt"
+            write_fixture(path, megabytes)
+
+            def run_legacy():
+                return legacy_parse_srt(path.read_text(encoding='utf-8'))
+
+            def run_streaming():
+                with open(path, encoding='utf-8') as f:
+                    return summarizer.parse_srt(f)
+
+            for name, fn in (('legacy', run_legacy), ('streaming', run_streaming)):
+                text, elapsed, peak = measure(fn)
+                print(f"{megabytes:>4}MB {name:>10} {elapsed:>9.2f} {megabytes / elapsed:>7.1f} "
+                      f"{peak / 1048576:>8.1f} {len(text):>10,}")
+
+
+if __name__ == '__main__':
+    main()
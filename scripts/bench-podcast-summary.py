@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark for podcast-enhanced-summary.py against a local mock
+chat-completions server.
+
+The mock answers every request after a configurable latency and can
+reject every Nth request with 429 + Retry-After. Transcript downloads are
+replaced by a fixed delay so the run is fully offline.
+
+Usage:
+  python3 scripts/bench-podcast-summary.py
+  python3 scripts/bench-podcast-summary.py --episodes 8 --latency 1.0 --levels 1,4 --reject-every 5
+"""
+
+import argparse
+import importlib.util
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+
+def load_summarizer():
+    """Load podcast-enhanced-summary.py (hyphenated file name, not importable)."""
+    spec = importlib.util.spec_from_file_location("podcast_enhanced_summary",
+                                                  SCRIPT_DIR / "podcast-enhanced-summary.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_handler(latency, reject_every, retry_after):
+    counter = {'requests': 0, 'rejected': 0}
+    lock = threading.Lock()
+
+    class MockChatCompletions(BaseHTTPRequestHandler):
+        """Minimal /v1/chat/completions stand-in returning a fixed JSON summary."""
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            with lock:
+                counter['requests'] += 1
+                reject = reject_every and counter['requests'] % reject_every == 0
+                if reject:
+                    counter['rejected'] += 1
+            if reject:
+                self.send_response(429)
+                self.send_header('Retry-After', str(retry_after))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            time.sleep(latency)
+            prompt = body['messages'][-1]['content']
+            content = {
+                "intro": "导语",
+                "summary_cn": "摘要" * 300,
+                "key_quotes": [{"en": "quote", "cn": "金句"}],
+                "guest_bio": "嘉宾",
+                "title_cn": prompt.split('标题：', 1)[-1].split('\n', 1)[0][:25],
+            }
+            payload = json.dumps({
+                "choices": [{"message": {"content": json.dumps(content, ensure_ascii=False)}}]
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockChatCompletions, counter
+
+
+def start_server(latency, reject_every, retry_after):
+    handler, counter = make_handler(latency, reject_every, retry_after)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counter
+
+
+def write_fixture(path, episodes):
+    data = {"episodes": [
+        {"videoId": f"video{i:03d}", "title": f"Episode {i}", "channelName": "Bench",
+         "durationFormatted": "1:00:00", "publishedAt": "2026-02-06T12:00:00Z", "domain": "T"}
+        for i in range(episodes)
+    ]}
+    path.write_text(json.dumps(data, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the podcast summary pipeline")
+    parser.add_argument('--episodes', type=int, default=8, help="number of synthetic episodes")
+    parser.add_argument('--latency', type=float, default=0.5, help="mock completion latency (s)")
+    parser.add_argument('--transcript-latency', type=float, default=0.2, help="mock transcript download latency (s)")
+    parser.add_argument('--levels', default='1,2,4,8', help="comma-separated summary concurrency levels")
+    parser.add_argument('--reject-every', type=int, default=0, help="answer every Nth request with 429")
+    parser.add_argument('--retry-after', type=float, default=0.2, help="Retry-After sent with 429 (s)")
+    args = parser.parse_args()
+
+    summarizer = load_summarizer()
+    server, counter = start_server(args.latency, args.reject_every, args.retry_after)
+    summarizer.CHAT_COMPLETIONS_URL = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    summarizer.load_openai_key = lambda: "bench"
+    summarizer.log = lambda message: None
+
+    def fake_transcript(video_id, **kwargs):
+        time.sleep(args.transcript_latency)
+        return f"Transcript for {video_id}. " * 200
+
+    summarizer.download_transcript = fake_transcript
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = Path(tmp) / "data.json"
+        for level in [int(x) for x in args.levels.split(',')]:
+            write_fixture(data_file, args.episodes)
+            before = dict(counter)
+            started = time.monotonic()
+            summarizer.process_podcasts(data_file, concurrency=level, transcript_workers=level,
+                                        requests_per_minute=6000, burst=level)
+            elapsed = time.monotonic() - started
+            episodes = json.loads(data_file.read_text())['episodes']
+            assert [ep['videoId'] for ep in episodes] == [f"video{i:03d}" for i in range(args.episodes)]
+            enhanced = sum(1 for ep in episodes if ep.get('intro'))
+            rows.append((level, elapsed, enhanced, counter['rejected'] - before['rejected']))
+
+        # Re-run with the summary cache: the second pass should not reach the API
+        cache = summarizer.SummaryCache(Path(tmp) / "summary-cache")
+        cache_rows = []
+        for name in ('cold', 'warm'):
+            write_fixture(data_file, args.episodes)
+            before = counter['requests']
+            started = time.monotonic()
+            summarizer.process_podcasts(data_file, concurrency=4, transcript_workers=4,
+                                        requests_per_minute=6000, burst=4, cache=cache)
+            cache_rows.append((name, time.monotonic() - started, counter['requests'] - before))
+
+    print(f"\n📊 {args.episodes} episodes, {args.latency * 1000:.0f} ms completion latency, "
+          f"{args.transcript_latency * 1000:.0f} ms transcript latency\n")
+    print(f"{'concurrency':>12} {'wall (s)':>10} {'speedup':>8} {'enhanced':>9} {'429s':>5}")
+    baseline = rows[0][1]
+    for level, elapsed, enhanced, rejected in rows:
+        print(f"{level:>12} {elapsed:>10.2f} {baseline / elapsed:>7.1f}x {enhanced:>9} {rejected:>5}")
+
+    print(f"\n{'cache pass':>12} {'wall (s)':>10} {'API calls':>10}")
+    for name, elapsed, calls in cache_rows:
+        print(f"{name:>12} {elapsed:>10.2f} {calls:>10}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+Mind Our Times - vote-stats 基准与本地替身服务
+
+启动一个本地 HTTP 服务模拟 vote 云函数（stats / result action），
+测量 vote-stats.py 的 HTTP 拉取耗时，并验证重试逻辑。
+
+用法：
+  python3 scripts/bench-vote-stats.py fetch [--questions 50] [--fail-first 2] [--latency 0.05]
+  python3 scripts/bench-vote-stats.py stats [--questions 10000 --days 365]   # calculate_stats 与历史读写
+  python3 scripts/bench-vote-stats.py notify [--targets 8 --latency 0.3]   # 离线假推送，验证并发与去重
+  python3 scripts/bench-vote-stats.py browser [--questions 50]   # 离线假 browser，验证就绪轮询
+  python3 scripts/bench-vote-stats.py window [--questions 1000 --days 365]   # 持久化累计索引 vs 每次重建
+  python3 scripts/bench-vote-stats.py serve [--port 8787]   # 供手动运行 vote-stats.py：
+      MOT_VOTE_API_URL=http://127.0.0.1:8787/vote python3 scripts/vote-stats.py --dry-run
+"""
+
+import argparse
+import importlib.util
+import json
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+
+def load_vote_stats():
+    """加载 vote-stats.py（文件名带连字符，无法直接 import）"""
+    spec = importlib.util.spec_from_file_location("vote_stats", SCRIPT_DIR / "vote-stats.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_questions(count):
+    questions = []
+    for i in range(count):
+        count_a, count_b = (i * 7) % 53, (i * 11) % 47
+        total = count_a + count_b
+        questions.append({
+            "question_id": f"2026-02-{i % 28 + 1:02d}-q{i}",
+            "question": f"问题 {i}",
+            "publish_date": f"2026-02-{i % 28 + 1:02d}",
+            "total": total,
+            "count_a": count_a,
+            "count_b": count_b,
+            "percent_a": round(count_a / total * 100) if total else 0,
+            "percent_b": round(count_b / total * 100) if total else 0,
+        })
+    return questions
+
+
+def make_handler(questions, latency=0.0, fail_first=0):
+    state = {"requests": 0}
+    lock = threading.Lock()
+
+    class VoteStandIn(BaseHTTPRequestHandler):
+        """模拟 vote 云函数 HTTP 访问：前 fail_first 次请求返回 503"""
+
+        def do_POST(self):
+            event = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            with lock:
+                state["requests"] += 1
+                failing = state["requests"] <= fail_first
+            time.sleep(latency)
+            if failing:
+                self.reply(503, {"success": False, "error": "Service Unavailable"})
+            elif event.get("action") == "stats":
+                self.reply(200, {"success": True, "data": {
+                    "questions": questions, "total_questions": len(questions),
+                    "total_votes": sum(q["total"] for q in questions)}})
+            elif event.get("action") == "result":
+                match = [q for q in questions if q["question_id"] == event.get("question_id")]
+                self.reply(200, {"success": True, "data": match[0]} if match
+                           else {"success": False, "error": "投票问题不存在"})
+            else:
+                self.reply(200, {"success": False, "error": f"无效 action: {event.get('action')}"})
+
+        def reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return VoteStandIn, state
+
+
+def start_server(questions, latency=0.0, fail_first=0, port=0):
+    handler, state = make_handler(questions, latency, fail_first)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def bench_fetch(args):
+    vote_stats = load_vote_stats()
+    questions = make_questions(args.questions)
+    server, state = start_server(questions, args.latency, args.fail_first)
+    url = f"http://127.0.0.1:{server.server_address[1]}/vote"
+
+    result = vote_stats.fetch_stats_via_http(url=url, backoff=0.05)
+    assert result.ok and result.questions == questions, result
+    print(f"✅ {len(result.questions)} questions via {result.source} in {result.elapsed * 1000:.1f} ms "
+          f"({result.attempts} attempts, {state['requests']} requests)")
+    server.shutdown()
+
+    # 服务不可达：应快速失败并给出结构化错误
+    result = vote_stats.fetch_stats_via_http(url="http://127.0.0.1:9/vote", timeout=1, backoff=0.05)
+    print(f"❌ unreachable: ok={result.ok} error={result.error!r} attempts={result.attempts} "
+          f"in {result.elapsed * 1000:.1f} ms")
+
+
+class FakeBrowser:
+    """模拟 openclaw browser CLI：browser 启动、中间页倒计时、SDK 加载各需若干（虚拟）秒
+
+    使用虚拟时钟，sleep 只推进时间，不真正等待。
+    """
+
+    REDIRECT_URL = "https://tcb.example/redirect?to=stats.html"
+    STATS_URL = "https://tcb.example/stats.html"
+
+    def __init__(self, questions, start_delay=1.5, redirect_delay=3.0, load_delay=2.0, redirect=True,
+                 render_delay=0.0):
+        self.now = 0.0
+        self.render_delay = render_delay  # 导航后中间页渲染出来之前探针只看到 LOADING
+        self.questions = questions
+        self.start_delay = start_delay
+        self.redirect_delay = redirect_delay
+        self.load_delay = load_delay
+        self.redirect = redirect
+        self.started_at = None
+        self.navigated_at = None
+        self.clicked_at = None
+        self.calls = 0
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def __call__(self, cmd, timeout):
+        self.calls += 1
+        self.now += 0.05  # 每次 CLI 调用的开销
+        action = cmd[2]
+        out = ""
+        if action == "status":
+            running = self.started_at is not None and self.now - self.started_at >= self.start_delay
+            out = json.dumps({"status": "running" if running else "stopped"})
+        elif action == "start":
+            self.started_at = self.now
+        elif action == "navigate":
+            self.navigated_at = self.now
+        elif action == "evaluate":
+            fn = cmd[cmd.index("--fn") + 1]
+            on_redirect = self.redirect and self.clicked_at is None
+            if "click()" in fn:
+                if on_redirect and self.now - self.navigated_at >= self.redirect_delay:
+                    self.clicked_at = self.now
+                out = json.dumps({"result": "clicked"})
+            elif "submitBtn" not in fn:  # location.href
+                out = json.dumps({"result": self.REDIRECT_URL if on_redirect else self.STATS_URL})
+            elif on_redirect and self.now - self.navigated_at < self.render_delay:
+                out = json.dumps({"result": "LOADING"})
+            elif on_redirect:
+                out = json.dumps({"result": "REDIRECT_PAGE:" + self.REDIRECT_URL})
+            else:
+                loaded_from = self.clicked_at if self.redirect else self.navigated_at
+                if self.now - loaded_from >= self.load_delay:
+                    out = json.dumps({"result": "READY:" + json.dumps({"questions": self.questions})})
+                else:
+                    out = json.dumps({"result": "LOADING"})
+        return subprocess.CompletedProcess(cmd, 0, out, "")
+
+
+def bench_browser(args):
+    vote_stats = load_vote_stats()
+    questions = make_questions(args.questions)
+    # 旧实现的固定等待：start 2s + 中间页检查 3s + 点击前后 8s + SDK 8s
+    legacy_fixed = {True: 2 + 3 + 4 + 4 + 8, False: 2 + 3 + 8}
+    rows = []
+    for name, redirect, deadline, render_delay in (("redirect page", True, 45, 0.0), ("late redirect", True, 45, 0.5),
+                                                   ("direct", False, 45, 0.0), ("deadline hit", True, 2, 0.0)):
+        fake = FakeBrowser(questions, redirect=redirect, render_delay=render_delay)
+        timings = {}
+        result = vote_stats.fetch_all_stats_via_browser(runner=fake, deadline=deadline, timings=timings,
+                                                        sleep=fake.sleep, clock=fake.clock)
+        if deadline >= 45:
+            assert result == questions, result
+        else:
+            assert result is None, "deadline should have been hit"
+        phases = ", ".join(f"{k}={v:.2f}" for k, v in timings.items())
+        rows.append(f"{name:>16} {fake.now:>12.2f} {legacy_fixed[redirect]:>11} {fake.calls:>10}  {phases}")
+    print(f"\n{'scenario':>16} {'virtual (s)':>12} {'legacy (s)':>11} {'CLI calls':>10}  phases")
+    print("\n".join(rows))
+
+
+def legacy_calculate_stats(current_data, history, questions_config):
+    """calculate_stats 改写前的实现（缺失问题检查为二次复杂度），用于对照"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    yesterday_snapshot = {}
+    if history["daily_snapshots"]:
+        last = history["daily_snapshots"][-1]
+        if last["date"] != today:
+            yesterday_snapshot = {q["question_id"]: q for q in last["questions"]}
+    stats = []
+    active_questions = {q["id"]: q for q in questions_config["questions"] if q.get("active", True)}
+    for q in current_data or []:
+        qid = q.get("question_id", q.get("id", ""))
+        if not qid:
+            continue
+        config = active_questions.get(qid, {})
+        prev = yesterday_snapshot.get(qid, {})
+        total = q.get("total", 0)
+        count_a = q.get("count_a", 0)
+        count_b = q.get("count_b", 0)
+        delta = total - prev.get("total", 0)
+        percent_a = round(count_a / total * 100) if total > 0 else 0
+        percent_b = 100 - percent_a if total > 0 else 0
+        publish_date = q.get("publish_date") or config.get("publish_date") or qid[:10]
+        try:
+            days_active = (datetime.now() - datetime.strptime(publish_date, "%Y-%m-%d")).days + 1
+        except:
+            days_active = 1
+        stats.append({
+            "question_id": qid, "question": q.get("question") or config.get("question", "未知问题"),
+            "total": total, "delta": delta, "count_a": count_a, "count_b": count_b,
+            "percent_a": percent_a, "percent_b": percent_b, "days_active": days_active,
+            "publish_date": publish_date
+        })
+    for qid, config in active_questions.items():
+        if not any(s["question_id"] == qid for s in stats):
+            prev = yesterday_snapshot.get(qid, {})
+            stats.append({
+                "question_id": qid, "question": config.get("question", "未知问题"),
+                "total": 0, "delta": 0 - prev.get("total", 0), "count_a": 0, "count_b": 0,
+                "percent_a": 0, "percent_b": 0, "days_active": 1,
+                "publish_date": config.get("publish_date", today)
+            })
+    return stats
+
+
+def make_history(questions, days):
+    """合成 days 天的快照；问题按天均匀发布，每天的快照只含已发布的问题"""
+    start = datetime.now().date() - timedelta(days=days)
+    per_day = max(1, len(questions) // days)
+    snapshots = []
+    for d in range(days):
+        visible = questions[:min(len(questions), (d + 1) * per_day)]
+        snapshots.append({
+            "date": (start + timedelta(days=d)).isoformat(),
+            "timestamp": "",
+            "questions": [dict(q, total=q["total"] * d // days, delta=0, days_active=1) for q in visible],
+        })
+    return snapshots
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def bench_stats(args):
+    vote_stats = load_vote_stats()
+    questions = make_questions(args.questions)
+    # 一半问题今天没有数据，走补零分支
+    current = questions[::2]
+    config = {"questions": [{"id": q["question_id"], "question": q["question"],
+                             "publish_date": q["publish_date"], "active": True} for q in questions]}
+    print(f"📊 {args.questions} questions, {args.days} days of snapshots\n")
+
+    history = {"daily_snapshots": make_history(questions, args.days)}
+    previous = {q["question_id"]: q for q in history["daily_snapshots"][-1]["questions"]}
+    legacy, legacy_time = timed(lambda: legacy_calculate_stats(current, history, config), 1)
+    indexed, indexed_time = timed(lambda: vote_stats.calculate_stats(current, previous, config), args.repeat)
+    assert indexed == legacy, "indexed calculate_stats differs from legacy"
+    print(f"{'calculate_stats':>22} {'legacy (s)':>11} {'indexed (s)':>12} {'speedup':>8}")
+    print(f"{'':>22} {legacy_time:>11.3f} {indexed_time:>12.4f} {legacy_time / indexed_time:>7.0f}x")
+
+    # 上一天快照的读取：history.json 整体加载 vs 追加日志的索引尾部
+    with tempfile.TemporaryDirectory() as tmp:
+        history_file = Path(tmp) / "history.json"
+        started = time.perf_counter()
+        vote_stats.save_history(history, history_file)
+        save_time = time.perf_counter() - started
+        store = vote_stats.VoteHistoryStore(Path(tmp) / "store")
+        store.import_history(history)
+        _, load_time = timed(lambda: vote_stats.load_history(history_file)["daily_snapshots"][-1], 1)
+        lookup, lookup_time = timed(lambda: store.previous_snapshot("9999-12-31"), args.repeat)
+        assert lookup.keys() == previous.keys()
+        # 今天的快照（make_history 的最后一天是昨天）
+        snapshot = {"date": datetime.now().strftime("%Y-%m-%d"), "timestamp": "", "questions": indexed}
+        _, append_time = timed(lambda: store.append_snapshot(snapshot), 1)
+        print(f"\n{'daily history I/O':>22} {'legacy (s)':>11} {'store (s)':>12} {'speedup':>8}")
+        for name, old, new in (("previous snapshot", load_time, lookup_time),
+                               ("save", save_time, append_time)):
+            print(f"{name:>22} {old:>11.3f} {new:>12.4f} {old / new:>7.0f}x")
+        print(f"\n  history.json {history_file.stat().st_size / 1048576:.1f} MB, "
+              f"series.json {store.series_file.stat().st_size / 1048576:.1f} MB")
+
+
+class LegacySeriesIndex:
+    """改写前每次 --window 都从全部快照重建的内存索引，用于对照（avg_daily 按实际覆盖天数修正）
+
+    每个问题保存按天的稠密数组（缺席的日期沿用前一天的计数，首次出现前为 0），
+    以及总票数的前缀和。建索引是一次线性扫描，之后每个问题的窗口查询都是 O(1)。
+    """
+
+    def __init__(self, snapshots):
+        ordinals = [datetime.strptime(s["date"], "%Y-%m-%d").toordinal() for s in snapshots]
+        self.start = ordinals[0] if ordinals else 0
+        self.days = ordinals[-1] - self.start + 1 if ordinals else 0
+        self.total, self.count_a, self.prefix = {}, {}, {}
+
+        last_seen = {}
+        for ordinal, snapshot in zip(ordinals, snapshots):
+            day = ordinal - self.start
+            for row in snapshot["questions"]:
+                qid = row["question_id"]
+                if qid not in self.total:
+                    self.total[qid] = [0] * self.days
+                    self.count_a[qid] = [0] * self.days
+                self._fill(qid, last_seen.get(qid), day)
+                self.total[qid][day] = row["total"]
+                self.count_a[qid][day] = row["count_a"]
+                last_seen[qid] = day
+        for qid, day in last_seen.items():
+            self._fill(qid, day, self.days)
+            prefix = self.prefix[qid] = [0] * (self.days + 1)
+            running = 0
+            for i, value in enumerate(self.total[qid]):
+                running += value
+                prefix[i + 1] = running
+
+    def _fill(self, qid, last, until):
+        """把 last 之后到 until 之前的空缺天沿用 last 当天的计数"""
+        if last is None:
+            return
+        total, count_a = self.total[qid], self.count_a[qid]
+        for day in range(last + 1, until):
+            total[day], count_a[day] = total[last], count_a[last]
+
+    def day(self, date):
+        """日期字符串对应的下标（截到索引范围内）"""
+        day = datetime.strptime(date, "%Y-%m-%d").toordinal() - self.start
+        return min(max(day, 0), self.days - 1)
+
+    def window(self, qid, end, days):
+        """问题 qid 截至下标 end 的 days 天窗口统计；未收录的问题返回 None"""
+        total, count_a, prefix = self.total.get(qid), self.count_a.get(qid), self.prefix.get(qid)
+        if total is None:
+            return None
+        start = end - days  # 窗口前一天的下标，可能早于索引起点（视为 0 票）
+        total_start = total[start] if start >= 0 else 0
+        a_start = count_a[start] if start >= 0 else 0
+        delta = total[end] - total_start
+        share_end = count_a[end] / total[end] * 100 if total[end] else 0
+        share_start = count_a[start] / total[start] * 100 if start >= 0 and total[start] else share_end
+        span = end - max(start, -1)
+        return {
+            "window": days,
+            "delta": delta,
+            "avg_daily": delta / span,
+            "avg_total": (prefix[end + 1] - prefix[max(start, -1) + 1]) / span,
+            "drift": share_end - share_start,
+            "window_percent_a": round((count_a[end] - a_start) / delta * 100) if delta > 0 else None,
+        }
+
+
+def bench_window(args):
+    vote_stats = load_vote_stats()
+    questions = make_questions(args.questions)
+    snapshots = make_history(questions, args.days)
+    # 制造缺席的日期、问题某几天缺席和同一天重跑
+    del snapshots[args.days // 3: args.days // 3 + 4]
+    for i, snapshot in enumerate(snapshots[:-1]):
+        if i % 7 == 3:
+            snapshot["questions"] = snapshot["questions"][::2]
+    snapshots.append(dict(snapshots[-1], questions=[dict(q, total=q["total"] + 5, count_a=q["count_a"] + 3)
+                                                    for q in snapshots[-1]["questions"]]))
+    today = snapshots[-1]["date"]
+    print(f"📊 {args.questions} questions, {len(snapshots)} snapshots over {args.days} days\n")
+
+    def compare(store, label, windows=(1, 7, 30, args.days * 2)):
+        merged = {s["date"]: s for s in snapshots_so_far}
+        legacy = LegacySeriesIndex([merged[d] for d in sorted(merged)])
+        end = legacy.day(today_so_far)
+        index = store.window_index()
+        mismatches = 0
+        for days in windows:
+            end_row, start_row, span = index.rows(today_so_far, days)
+            for q in questions[::max(1, len(questions) // 200)]:
+                expected = legacy.window(q["question_id"], end, days)
+                actual = index.window(q["question_id"], end_row, start_row, days, span)
+                if expected != actual and not (expected and actual and all(
+                        abs(expected[k] - actual[k]) < 1e-9 if isinstance(expected[k], float) else expected[k] == actual[k]
+                        for k in expected)):
+                    mismatches += 1
+        print(f"{'✅' if not mismatches else '❌'} {label}: windows {', '.join(map(str, windows))} match a full rebuild")
+        return mismatches
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        store = vote_stats.VoteHistoryStore(Path(tmp) / "store")
+        half = len(snapshots) // 2
+        store.import_history({"daily_snapshots": snapshots[:half]})
+        snapshots_so_far, today_so_far = snapshots[:half], snapshots[half - 1]["date"]
+        failures += compare(store, "after import")
+        for snapshot in snapshots[half:]:
+            store.append_snapshot(snapshot)
+        snapshots_so_far, today_so_far = snapshots, today
+        failures += compare(store, "after daily appends (gap + same-day rerun)")
+
+        # 模拟崩溃：日志写入后累计记录没跟上
+        tomorrow = (datetime.strptime(today, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        extra = dict(snapshots[-1], date=tomorrow)
+        with open(store.log_file, 'ab') as f:
+            f.write((json.dumps(extra, ensure_ascii=False) + "\n").encode('utf-8'))
+        store.recover()
+        snapshots_so_far, today_so_far = snapshots + [extra], tomorrow
+        failures += compare(store, "after crash recovery (rebuilt)", windows=(1, 7))
+        store.import_history({"daily_snapshots": snapshots})
+        snapshots_so_far, today_so_far = snapshots, today
+
+        store.compact()
+        failures += compare(store, "after compaction")
+
+        # 日常 --window 运行的成本：每次从全部快照重建 vs 读持久化记录两端
+        _, rebuild_time = timed(lambda: vote_stats_legacy_window(store, today, 30), 1)
+        _, query_time = timed(lambda: vote_stats.apply_window(
+            [dict(q, delta=0) for q in snapshots[-1]["questions"]], store.window_index(), today, 30, True), args.repeat)
+        append = dict(snapshots[-1], date=tomorrow)
+        _, append_time = timed(lambda: store.append_snapshot(append), 1)
+        print(f"\n{'--trend 30 per run':>22} {'rebuild (s)':>12} {'persisted (s)':>14} {'speedup':>8}")
+        print(f"{'':>22} {rebuild_time:>12.3f} {query_time:>14.4f} {rebuild_time / query_time:>7.0f}x")
+        print(f"  daily append incl. prefix row: {append_time * 1000:.1f} ms; "
+              f"prefix.jsonl {store.prefix_file.stat().st_size / 1048576:.1f} MB")
+    raise SystemExit(1 if failures else 0)
+
+
+def vote_stats_legacy_window(store, date, days):
+    index = LegacySeriesIndex(store.snapshots())
+    end = index.day(date)
+    return [index.window(qid, end, days) for qid in index.total]
+
+
+class FakeTransport:
+    """离线推送替身：每次发送固定延迟，指定目标的前几次发送失败"""
+
+    def __init__(self, latency, flaky=None):
+        self.latency = latency
+        self.flaky = dict(flaky or {})  # target -> 还要失败的次数
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send(self, channel, target, message, timeout):
+        time.sleep(self.latency)
+        with self.lock:
+            if self.flaky.get(target, 0) > 0:
+                self.flaky[target] -= 1
+                return "simulated 502"
+            self.sent.append((channel, target))
+        return None
+
+
+def bench_notify(args):
+    vote_stats = load_vote_stats()
+    targets = [("telegram", f"user{i}") for i in range(args.targets)]
+    report = vote_stats.format_report([], "2026-02-06")
+    print(f"📊 {args.targets} targets, {args.latency * 1000:.0f} ms per send, "
+          f"user0 fails twice before succeeding\n")
+    print(f"{'run':>12} {'wall (s)':>9} {'sent':>5} {'skipped':>8} {'retries':>8} {'slowest (s)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, workers, force in (("sequential", 1, True), ("concurrent", 8, True), ("rerun", 8, False)):
+            transport = FakeTransport(args.latency, {"user0": 2})
+            dispatcher = vote_stats.NotificationDispatcher(transport, workers=workers, backoff=0.05,
+                                                           ledger_file=Path(tmp) / "ledger.json")
+            started = time.monotonic()
+            results = dispatcher.dispatch(report, targets, "2026-02-06", force=force)
+            elapsed = time.monotonic() - started
+            assert [(r.channel, r.target) for r in results] == targets and all(r.ok for r in results)
+            retries = sum(r.attempts - 1 for r in results if not r.skipped)
+            slowest = max(r.latency for r in results)
+            skipped = sum(r.skipped for r in results)
+            print(f"{name:>12} {elapsed:>9.2f} {len(transport.sent):>5} {skipped:>8} {retries:>8} {slowest:>12.2f}")
+
+
+def serve(args):
+    server, _ = start_server(make_questions(args.questions), args.latency, args.fail_first, args.port)
+    print(f"🛰️ vote stand-in on http://127.0.0.1:{server.server_address[1]}/vote (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="vote-stats benchmarks and local stand-in")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name in ('fetch', 'stats', 'window', 'notify', 'browser', 'serve'):
+        sub = subparsers.add_parser(name)
+        sub.add_argument('--questions', type=int, default={'stats': 10000, 'window': 1000}.get(name, 50), help="模拟的问题数")
+        sub.add_argument('--latency', type=float, default=0.3 if name == 'notify' else 0.0,
+                         help="每个请求的人为延迟（秒）")
+        sub.add_argument('--fail-first', type=int, default=0, help="前 N 个请求返回 503")
+        if name == 'notify':
+            sub.add_argument('--targets', type=int, default=8, help="推送目标数")
+        if name in ('stats', 'window'):
+            sub.add_argument('--days', type=int, default=365, help="历史快照天数")
+            sub.add_argument('--repeat', type=int, default=5, help="新实现重复次数（取最快）")
+        if name == 'serve':
+            sub.add_argument('--port', type=int, default=8787)
+    args = parser.parse_args()
+    {'fetch': bench_fetch, 'stats': bench_stats, 'window': bench_window, 'notify': bench_notify, 'browser': bench_browser, 'serve': serve}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
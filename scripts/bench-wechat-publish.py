@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Mind Our Times - 微信公众号 API 本地替身与发布基准
+
+启动一个本地 HTTP 服务模拟 publish-deep-article.py 用到的公众号接口
+（cgi-bin/token、material/add_material、material/batchget_material、
+material/del_material、draft/add，素材存在内存里），用来离线验证：
+图片素材索引让相同图片的重复上传变成零网络请求；素材在后台被删除后，
+verify / cleanup 能找出并清掉失效条目，之后再次上传会重新走网络。
+upload 子命令比较旧的整块拼接上传与流式 multipart 上传的耗时和峰值内存（替身服务跑在
+子进程里，内存只统计上传方），并核对服务端收到的文件名、Content-Type 和内容哈希。
+token 子命令让多个发布进程同时启动，比较各自取 token 与共用 TokenCache 时 cgi-bin/token
+的调用次数，并检查提前刷新、过期排队和 token 被作废后的重试。
+
+用法：
+  python3 scripts/bench-wechat-publish.py bench [--runs 5] [--image-kb 300] [--latency 0.1]
+  python3 scripts/bench-wechat-publish.py upload [--image-mb 20]
+  python3 scripts/bench-wechat-publish.py token [--processes 8] [--latency 0.3]
+  python3 scripts/bench-wechat-publish.py serve [--port 8789]   # 供手动运行发布脚本：
+      MOT_WECHAT_API_BASE=http://127.0.0.1:8789 python3 scripts/publish-deep-article.py media verify
+"""
+
+import argparse
+import fcntl
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+SCRIPT_DIR = Path(__file__).parent
+TOKEN_TTL = 7200
+
+
+def load_publisher():
+    """加载 publish-deep-article.py（文件名带连字符，无法直接 import）"""
+    spec = importlib.util.spec_from_file_location("publish_deep_article", SCRIPT_DIR / "publish-deep-article.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def parse_multipart(body, content_type):
+    """取出 multipart/form-data 中 name="media" 的 (filename, content_type, 数据)"""
+    boundary = re.search(r'boundary=("?)([^";]+)\1', content_type).group(2).encode()
+    for part in body.split(b'--' + boundary):
+        head, sep, data = part.partition(b'\r\n\r\n')
+        if not sep or b'name="media"' not in head:
+            continue
+        headers = head.decode('utf-8', 'replace')
+        filename = re.search(r'filename="([^"]*)"', headers)
+        ctype = re.search(r'Content-Type:\s*(\S+)', headers, re.I)
+        return (filename.group(1) if filename else '', ctype.group(1) if ctype else '',
+                data[:-2] if data.endswith(b'\r\n') else data)
+    return None
+
+
+def make_handler(latency):
+    """模拟公众号接口：每个请求固定延迟，access_token 有效期 TOKEN_TTL"""
+    state = {"requests": {}, "bytes": 0, "tokens": {}, "materials": {}, "drafts": [], "uploads": []}
+    lock = threading.Lock()
+
+    class WeChatStandIn(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.route('GET')
+
+        def do_POST(self):
+            self.route('POST')
+
+        def route(self, method):
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            raw = self.rfile.read(int(self.headers.get('Content-Length', 0))) if method == 'POST' else b''
+            with lock:
+                state["requests"][url.path] = state["requests"].get(url.path, 0) + 1
+                state["bytes"] += len(raw)
+            time.sleep(latency)
+
+            if url.path == '/stand-in/materials':
+                # 仅替身提供：查看服务端收到的素材
+                with lock:
+                    return self.reply(state["materials"])
+            if url.path == '/stand-in/revoke-tokens':
+                # 仅替身提供：让已发出的 token 全部失效（模拟别处刷新或后台重置）
+                with lock:
+                    state["tokens"].clear()
+                return self.reply({"errcode": 0})
+
+            if url.path == '/cgi-bin/token':
+                token = hashlib.sha1(f"{query.get('appid')}{time.time()}".encode()).hexdigest()
+                with lock:
+                    state["tokens"][token] = time.time() + TOKEN_TTL
+                return self.reply({"access_token": token, "expires_in": TOKEN_TTL})
+
+            with lock:
+                expires = state["tokens"].get(query.get('access_token'), 0)
+            if expires < time.time():
+                return self.reply({"errcode": 40001, "errmsg": "invalid credential, access_token is invalid"})
+
+            if url.path == '/cgi-bin/material/add_material':
+                part = parse_multipart(raw, self.headers.get('Content-Type', ''))
+                if part is None:
+                    return self.reply({"errcode": 41005, "errmsg": "media data missing"})
+                filename, ctype, data = part
+                with lock:
+                    media_id = f"stand-in-media-{len(state['uploads']) + 1:06d}"
+                    state["materials"][media_id] = {"name": filename, "content_type": ctype,
+                                                    "size": len(data), "sha256": hashlib.sha256(data).hexdigest(),
+                                                    "update_time": int(time.time())}
+                    state["uploads"].append(media_id)
+                return self.reply({"media_id": media_id, "url": f"http://mmbiz.stand-in/{media_id}"})
+
+            body = json.loads(raw or b'{}')
+            if url.path == '/cgi-bin/material/batchget_material':
+                with lock:
+                    items = [{"media_id": media_id, "name": m["name"], "update_time": m["update_time"],
+                              "url": f"http://mmbiz.stand-in/{media_id}"}
+                             for media_id, m in state["materials"].items()]
+                offset, count = body.get('offset', 0), min(body.get('count', 20), 20)
+                page = items[offset:offset + count]
+                return self.reply({"total_count": len(items), "item_count": len(page), "item": page})
+            if url.path == '/cgi-bin/material/del_material':
+                with lock:
+                    found = state["materials"].pop(body.get('media_id'), None)
+                return self.reply({"errcode": 0 if found else 40007, "errmsg": "ok" if found else "invalid media_id"})
+            if url.path == '/cgi-bin/draft/add':
+                with lock:
+                    missing = [a["thumb_media_id"] for a in body.get("articles", [])
+                               if a.get("thumb_media_id") not in state["materials"]]
+                    if not missing:
+                        state["drafts"].append(body)
+                if missing:
+                    return self.reply({"errcode": 40007, "errmsg": f"invalid media_id {missing[0]}"})
+                return self.reply({"media_id": f"stand-in-draft-{len(state['drafts']):06d}"})
+            return self.reply({"errcode": 404, "errmsg": f"unknown api {url.path}"}, status=404)
+
+        def reply(self, payload, status=200):
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return WeChatStandIn, state
+
+
+def start_server(latency, port=0):
+    handler, state = make_handler(latency)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def bench(args):
+    publisher_module = load_publisher()
+    server, state = start_server(args.latency)
+    api_base = f"http://127.0.0.1:{server.server_address[1]}"
+    failures = 0
+
+    def expect(label, ok):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {label}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image = Path(tmp) / "cover.png"
+        image.write_bytes(b'\x89PNG\r\n\x1a\n' + os.urandom(args.image_kb * 1024))
+        print(f"📊 {args.runs} publisher runs uploading the same {args.image_kb} KB cover, "
+              f"{args.latency * 1000:.0f} ms per request\n")
+        print(f"{'mode':>12} {'wall (s)':>9} {'uploads':>8} {'token calls':>12} {'KB sent':>8}")
+        media_ids = {}
+        for mode in ('no index', 'index'):
+            index_path = Path(tmp) / "wechat-media-index.json"
+            before_uploads = state["requests"].get('/cgi-bin/material/add_material', 0)
+            before_tokens = state["requests"].get('/cgi-bin/token', 0)
+            before_bytes = state["bytes"]
+            started = time.monotonic()
+            for _ in range(args.runs):
+                # 每次运行都是新进程：新的 publisher，索引从磁盘重新加载
+                index = publisher_module.MediaIndex(index_path) if mode == 'index' else None
+                publisher = publisher_module.WeChatPublisher(api_base, media_index=index,
+                                                             credentials=("wx-bench", "secret"))
+                media_ids.setdefault(mode, []).append(publisher.upload_image(image))
+                if index is not None:
+                    index.flush()
+            print(f"{mode:>12} {time.monotonic() - started:>9.2f} "
+                  f"{state['requests'].get('/cgi-bin/material/add_material', 0) - before_uploads:>8} "
+                  f"{state['requests'].get('/cgi-bin/token', 0) - before_tokens:>12} "
+                  f"{(state['bytes'] - before_bytes) / 1024:>8.0f}")
+        print()
+        expect("indexed runs reuse one media_id", len(set(media_ids['index'])) == 1)
+
+        # 两个并发发布各自持有旧的内存索引：写回时互相保留对方的条目；命中不写文件
+        index_path = Path(tmp) / "wechat-media-index.json"
+        first, second = publisher_module.MediaIndex(index_path), publisher_module.MediaIndex(index_path)
+        first.record("a" * 64, "media-a")
+        second.record("b" * 64, "media-b")
+        expect("concurrent records keep each other's entries",
+               {"a" * 64, "b" * 64} <= publisher_module.MediaIndex(index_path).images.keys())
+        before = index_path.stat().st_mtime_ns
+        hit = publisher_module.MediaIndex(index_path)
+        hit.lookup("a" * 64)
+        expect("a lookup hit does not rewrite the index", index_path.stat().st_mtime_ns == before)
+        hit.flush()
+        index = publisher_module.MediaIndex(index_path)
+        expect("flush persists last_used", index.images["a" * 64]["last_used"] >= index.images["b" * 64]["uploaded_at"])
+        index.remove(["a" * 64, "b" * 64])
+
+        # 后台删除该素材：verify 报告失效，cleanup 删除，之后的上传重新走网络
+        publisher = publisher_module.WeChatPublisher(api_base, credentials=("wx-bench", "secret"))
+        publisher.post_json('/cgi-bin/material/del_material', {"media_id": media_ids['index'][0]})
+        index = publisher_module.MediaIndex(Path(tmp) / "wechat-media-index.json")
+        stale = index.stale(publisher.list_image_materials())
+        expect(f"verify finds the deleted material ({len(state['materials'])} left on the server)",
+               [entry['media_id'] for _, entry in stale] == [media_ids['index'][0]])
+        index.remove(digest for digest, _ in stale)
+        publisher.media_index = publisher_module.MediaIndex(Path(tmp) / "wechat-media-index.json")
+        expect("cleanup removed the stale entry", not publisher.media_index.images)
+        fresh = publisher.upload_image(image)
+        expect("upload after cleanup goes to the network again",
+               fresh != media_ids['index'][0] and fresh in state["materials"])
+        draft = publisher.add_draft([{"title": "t", "content": "<p>c</p>"}], fresh)
+        expect(f"draft accepted with the fresh thumb ({draft})", bool(draft))
+    server.shutdown()
+    raise SystemExit(1 if failures else 0)
+
+
+def legacy_upload(api_base, token, image_path):
+    """改写前的 upload_image：整块读入、拼接请求体，文件名和类型写死"""
+    url = f"{api_base}/cgi-bin/material/add_material?access_token={token}&type=image"
+    with open(image_path, 'rb') as f:
+        image_data = f.read()
+    boundary = '----WebKitFormBoundary7MA4YWxkTrZu0gW'
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="media"; filename="cover.png"\r\n'
+        f'Content-Type: image/png\r\n\r\n'
+    ).encode() + image_data + f'\r\n--{boundary}--\r\n'.encode()
+    req = urllib.request.Request(url, data=body,
+        headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}, method='POST')
+    resp = urllib.request.urlopen(req, timeout=30)
+    return json.loads(resp.read())['media_id']
+
+
+def upload(args):
+    publisher_module = load_publisher()
+    proc = subprocess.Popen([sys.executable, __file__, 'serve', '--port', '0', '--latency', '0'],
+                            stdout=subprocess.PIPE, text=True)
+    try:
+        api_base = re.search(r'http://[\d.:]+', proc.stdout.readline()).group(0)
+        failures = 0
+
+        def expect(label, ok):
+            nonlocal failures
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} {label}")
+
+        def materials():
+            return json.loads(urllib.request.urlopen(f"{api_base}/stand-in/materials").read())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            big = Path(tmp) / "inline-figure.jpg"
+            with open(big, 'wb') as f:
+                f.write(b'\xff\xd8\xff\xe0' + os.urandom(args.image_mb * 1024 * 1024))
+            digest = publisher_module.file_sha256(big)
+            publisher = publisher_module.WeChatPublisher(api_base, credentials=("wx-bench", "secret"))
+            token = publisher.get_access_token()
+            progress = []
+
+            runs = (("legacy", lambda: legacy_upload(api_base, token, big)),
+                    ("streaming", lambda: publisher.upload_image(
+                        big, progress=lambda sent, total: progress.append((sent, total)))))
+            print(f"📊 {args.image_mb} MB JPEG uploaded to the stand-in\n")
+            print(f"{'uploader':>10} {'time (s)':>9} {'MB/s':>7} {'peak MB':>8}  server saw")
+            for name, fn in runs:
+                started = time.perf_counter()
+                fn()
+                elapsed = time.perf_counter() - started
+                progress.clear()
+                tracemalloc.start()
+                media_id = fn()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                seen = materials()[media_id]
+                print(f"{name:>10} {elapsed:>9.2f} {args.image_mb / elapsed:>7.1f} {peak / 1048576:>8.1f}  "
+                      f"{seen['name']} {seen['content_type']} sha256 {'ok' if seen['sha256'] == digest else 'MISMATCH'}")
+            print()
+            seen = materials()[media_id]
+            expect("streaming upload arrives byte-identical", seen['sha256'] == digest)
+            expect(f"real filename and detected type sent ({seen['name']}, {seen['content_type']})",
+                   (seen['name'], seen['content_type']) == ("inline-figure.jpg", "image/jpeg"))
+            expect(f"progress reported {len(progress)} times, monotonic, ending at the full body",
+                   progress[-1][0] == progress[-1][1] == publisher.last_upload['bytes']
+                   and all(a[0] < b[0] for a, b in zip(progress, progress[1:])))
+
+            cases = {"photo.png": b'\xff\xd8\xff\xdb', "chart": b'\x89PNG\r\n\x1a\n',
+                     "anim.gif": b'GIF89a', "shot.webp": b'RIFF\0\0\0\0WEBPVP8 ', "scan.bmp": b'BM',
+                     "diagram.svg": b'<svg xmlns="http://www.w3.org/2000/svg"/>'}
+            expected = {"photo.png": "image/jpeg", "chart": "image/png", "anim.gif": "image/gif",
+                        "shot.webp": "image/webp", "scan.bmp": "image/bmp", "diagram.svg": "image/svg+xml"}
+            for name, head in cases.items():
+                path = Path(tmp) / name
+                path.write_bytes(head + b'\0' * 64)
+                detected = publisher_module.detect_content_type(path)
+                expect(f"{name:<12} detected as {detected}", detected == expected[name])
+    finally:
+        proc.terminate()
+        proc.wait()
+    raise SystemExit(1 if failures else 0)
+
+
+def _token_worker(publisher_module, api_base, cache_path, start, results):
+    """模拟一个发布进程：启动后取 token 并调一次接口"""
+    token_cache = publisher_module.TokenCache(cache_path) if cache_path else None
+    publisher = publisher_module.WeChatPublisher(api_base, credentials=("wx-bench", "secret"),
+                                                 token_cache=token_cache)
+    start.wait()
+    started = time.monotonic()
+    publisher.post_json('/cgi-bin/material/batchget_material', {"type": "image", "offset": 0, "count": 1})
+    results.put((publisher.access_token, time.monotonic() - started))
+
+
+def token(args):
+    publisher_module = load_publisher()
+    server, state = start_server(args.latency)
+    api_base = f"http://127.0.0.1:{server.server_address[1]}"
+    failures = 0
+    ctx = multiprocessing.get_context('fork')
+
+    def expect(label, ok):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {label}")
+
+    def token_calls():
+        return state["requests"].get('/cgi-bin/token', 0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = Path(tmp) / "wechat-token.json"
+        print(f"📊 {args.processes} publisher processes starting together, "
+              f"{args.latency * 1000:.0f} ms per request\n")
+        print(f"{'mode':>14} {'token calls':>12} {'distinct tokens':>16} {'slowest (s)':>12}")
+        runs = {}
+        for mode, path in (("per process", None), ("shared, cold", cache_path), ("shared, warm", cache_path)):
+            before = token_calls()
+            start, results = ctx.Event(), ctx.Queue()
+            procs = [ctx.Process(target=_token_worker, args=(publisher_module, api_base, path, start, results))
+                     for _ in range(args.processes)]
+            for proc in procs:
+                proc.start()
+            start.set()
+            outcomes = [results.get(timeout=60) for _ in procs]
+            for proc in procs:
+                proc.join()
+            calls = token_calls() - before
+            print(f"{mode:>14} {calls:>12} {len({t for t, _ in outcomes}):>16} "
+                  f"{max(e for _, e in outcomes):>12.2f}")
+            runs[mode] = (calls, len({t for t, _ in outcomes}))
+        print()
+        expect("cold start: one cgi-bin/token call shared by every process", runs["shared, cold"] == (1, 1))
+        expect("warm start: no cgi-bin/token calls", runs["shared, warm"] == (0, 1))
+
+        key = f"{api_base}|wx-bench"
+        fetch_publisher = publisher_module.WeChatPublisher(api_base, credentials=("wx-bench", "secret"))
+        old = json.loads(cache_path.read_text())[key]["token"]
+
+        # 进入提前刷新窗口：别的进程正在刷新（锁被占）时立即返回旧 token，不等待
+        fetched_at = json.loads(cache_path.read_text())[key]["fetched_at"]
+        clock = [fetched_at + 7200 - (publisher_module.TOKEN_REFRESH_AHEAD - 30)]
+        cache = publisher_module.TokenCache(cache_path, clock=lambda: clock[0])
+        lock_file = open(cache.lock_path, 'a')
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        before = token_calls()
+        started = time.monotonic()
+        got = cache.get(key, fetch_publisher.fetch_access_token)
+        expect(f"refresh window, lock busy: old token returned in {time.monotonic() - started:.3f}s",
+               got == old and token_calls() == before)
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        got = cache.get(key, fetch_publisher.fetch_access_token)
+        expect("refresh window, lock free: refreshed proactively", got != old and token_calls() == before + 1)
+
+        # 已过期：持锁者刷新期间其他调用方排队，拿到锁后复用刚写入的 token
+        clock[0] = fetched_at + 2 * 7200
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        waiter = {}
+        thread = threading.Thread(target=lambda: waiter.setdefault(
+            "token", publisher_module.TokenCache(cache_path, clock=lambda: clock[0]).get(
+                key, fetch_publisher.fetch_access_token)))
+        thread.start()
+        time.sleep(0.2)
+        expect("expired: caller waits for the refresh in progress", thread.is_alive())
+        before = token_calls()
+        fresh, expires_in = fetch_publisher.fetch_access_token()
+        cache._write(key, {"token": fresh, "fetched_at": clock[0], "expires_at": clock[0] + expires_in})
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        thread.join(10)
+        expect("expired: waiter reuses the token written by the lock holder",
+               waiter.get("token") == fresh and token_calls() == before + 1)
+        lock_file.close()
+
+        # 接口报 token 无效：作废缓存，重新获取后重试一次
+        publisher = publisher_module.WeChatPublisher(api_base, credentials=("wx-bench", "secret"),
+                                                     token_cache=publisher_module.TokenCache(cache_path))
+        publisher.get_access_token()
+        urllib.request.urlopen(f"{api_base}/stand-in/revoke-tokens").read()
+        before = token_calls()
+        publisher.post_json('/cgi-bin/material/batchget_material', {"type": "image", "offset": 0, "count": 1})
+        expect("revoked token: one refetch and a successful retry", token_calls() == before + 1)
+        expect("token file is private (0600)", cache_path.stat().st_mode & 0o777 == 0o600)
+    server.shutdown()
+    raise SystemExit(1 if failures else 0)
+
+
+def serve(args):
+    server, state = start_server(args.latency, args.port)
+    print(f"🛰️ WeChat API stand-in on http://127.0.0.1:{server.server_address[1]} (Ctrl-C to stop)", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\n{sum(state['requests'].values())} requests, {len(state['materials'])} materials, "
+              f"{len(state['drafts'])} drafts")
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WeChat API stand-in and publishing benchmark")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    sub = subparsers.add_parser('token')
+    sub.add_argument('--processes', type=int, default=8, help="同时启动的发布进程数")
+    sub.add_argument('--latency', type=float, default=0.3, help="每个请求的固定延迟（秒）")
+    sub = subparsers.add_parser('upload')
+    sub.add_argument('--image-mb', type=int, default=20, help="上传图片大小（MB）")
+    for name in ('bench', 'serve'):
+        sub = subparsers.add_parser(name)
+        sub.add_argument('--latency', type=float, default=0.1, help="每个请求的固定延迟（秒）")
+        if name == 'bench':
+            sub.add_argument('--runs', type=int, default=5, help="模拟的发布次数")
+            sub.add_argument('--image-kb', type=int, default=300, help="封面图大小（KB）")
+        else:
+            sub.add_argument('--port', type=int, default=8789)
+    args = parser.parse_args()
+    {'bench': bench, 'upload': upload, 'token': token, 'serve': serve}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+publish-deep-article.py 的 Markdown → 微信 HTML 渲染：金标准校验与基准
+
+check：一组小文档的期望输出（覆盖标题、段落内加粗/链接/斜体、引用、有序/无序列表、
+       列表在引用/分隔线/文末前输出等），以及 drafts/ 下各稿件与旧实现的输出对比
+       （旧实现把有序列表也渲染成 <ul>，对比时按此归一化）。
+bench：旧实现与新实现在 drafts/ 各稿件及 beckley_raw.md ×100 上的耗时和峰值内存。
+cache：渲染缓存的冷/热运行耗时，以及改稿件、改投票参数、升 STYLES_VERSION 时失效、
+       超出容量时按最近使用淘汰。封面由一个写固定 PNG 的替身生成（本机可能没有 PIL），
+       其耗时用 --cover-cost 模拟。
+
+用法：
+  python3 scripts/bench-wechat-render.py check
+  python3 scripts/bench-wechat-render.py bench [--scale 100]
+  python3 scripts/bench-wechat-render.py cache [--cover-cost 0.05]
+"""
+
+import argparse
+import importlib.util
+import io
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+DRAFTS_DIR = SCRIPT_DIR.parent / "drafts"
+
+
+def load_publisher():
+    """加载 publish-deep-article.py（文件名带连字符，无法直接 import）"""
+    spec = importlib.util.spec_from_file_location("publish_deep_article", SCRIPT_DIR / "publish-deep-article.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_markdown_to_wechat_html(md_content, vote_url=None, vote_question=None):
+    """改写前的逐行 re.sub 实现（不含投票区块以外的改动），用于对照"""
+    STYLES = {
+        'h1': 'font-size: 22px; font-weight: bold; color: #1a1a1a; margin: 30px 0 20px 0; line-height: 1.4;',
+        'h2': 'font-size: 18px; font-weight: bold; color: #2c3e50; margin: 28px 0 15px 0; line-height: 1.4; border-bottom: 1px solid #eee; padding-bottom: 8px;',
+        'h3': 'font-size: 16px; font-weight: bold; color: #34495e; margin: 20px 0 12px 0;',
+        'p': 'font-size: 16px; color: #333; line-height: 1.8; margin: 16px 0; text-align: justify;',
+        'strong': 'font-weight: bold; color: #1a1a1a;',
+        'blockquote': 'border-left: 3px solid #3498db; padding: 12px 20px; margin: 20px 0; background: #f8f9fa; color: #555; font-style: italic;',
+        'li': 'font-size: 16px; color: #333; line-height: 1.8; margin: 8px 0;',
+        'hr': 'border: none; border-top: 1px solid #ddd; margin: 30px 0;',
+        'a': 'color: #3498db; text-decoration: none;',
+    }
+    lines = md_content.split('\n')
+    html_parts = []
+    in_list = False
+    list_items = []
+    for line in lines:
+        stripped = line.strip()
+        if stripped == '---':
+            if in_list:
+                html_parts.append(f'<ul style="padding-left: 20px; margin: 16px 0;">{"".join(list_items)}</ul>')
+                list_items = []
+                in_list = False
+            html_parts.append(f'<hr style="{STYLES["hr"]}">')
+            continue
+        if stripped.startswith('>'):
+            quote_text = stripped[1:].strip()
+            quote_text = re.sub(r'\*\*(.+?)\*\*', r'<strong style="font-weight:bold;">\1</strong>', quote_text)
+            html_parts.append(f'<blockquote style="{STYLES["blockquote"]}">{quote_text}</blockquote>')
+            continue
+        if stripped.startswith('- ') or re.match(r'^\d+\. ', stripped):
+            in_list = True
+            if stripped.startswith('- '):
+                item_text = stripped[2:]
+            else:
+                item_text = re.sub(r'^\d+\. ', '', stripped)
+            item_text = re.sub(r'\*\*(.+?)\*\*', r'<strong style="font-weight:bold;">\1</strong>', item_text)
+            list_items.append(f'<li style="{STYLES["li"]}">{item_text}</li>')
+            continue
+        elif in_list and stripped:
+            html_parts.append(f'<ul style="padding-left: 20px; margin: 16px 0;">{"".join(list_items)}</ul>')
+            list_items = []
+            in_list = False
+        if stripped.startswith('# '):
+            html_parts.append(f'<h1 style="{STYLES["h1"]}">{stripped[2:]}</h1>')
+            continue
+        elif stripped.startswith('## '):
+            html_parts.append(f'<h2 style="{STYLES["h2"]}">{stripped[3:]}</h2>')
+            continue
+        elif stripped.startswith('### '):
+            html_parts.append(f'<h3 style="{STYLES["h3"]}">{stripped[4:]}</h3>')
+            continue
+        if stripped:
+            text = re.sub(r'\*\*(.+?)\*\*', rf'<strong style="{STYLES["strong"]}">\1</strong>', stripped)
+            text = re.sub(r'\[(.+?)\]\((.+?)\)', rf'<a style="{STYLES["a"]}" href="\2">\1</a>', text)
+            text = re.sub(r'\*([^*]+)\*', r'<em>\1</em>', text)
+            html_parts.append(f'<p style="{STYLES["p"]}">{text}</p>')
+    if list_items:
+        html_parts.append(f'<ul style="padding-left: 20px; margin: 16px 0;">{"".join(list_items)}</ul>')
+    return '\n'.join(html_parts)
+
+
+# 金标准里用到的样式（与 STYLES 逐字一致；改主题时需同步更新这里）
+P = '<p style="font-size: 16px; color: #333; line-height: 1.8; margin: 16px 0; text-align: justify;">'
+LI = '<li style="font-size: 16px; color: #333; line-height: 1.8; margin: 8px 0;">'
+UL = '<ul style="padding-left: 20px; margin: 16px 0;">'
+OL = '<ol style="padding-left: 20px; margin: 16px 0;">'
+BQ = ('<blockquote style="border-left: 3px solid #3498db; padding: 12px 20px; margin: 20px 0; '
+      'background: #f8f9fa; color: #555; font-style: italic;">')
+HR = '<hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">'
+H2 = ('<h2 style="font-size: 18px; font-weight: bold; color: #2c3e50; margin: 28px 0 15px 0; '
+      'line-height: 1.4; border-bottom: 1px solid #eee; padding-bottom: 8px;">')
+H3 = '<h3 style="font-size: 16px; font-weight: bold; color: #34495e; margin: 20px 0 12px 0;">'
+STRONG = '<strong style="font-weight: bold; color: #1a1a1a;">'
+STRONG_INLINE = '<strong style="font-weight:bold;">'
+A = '<a style="color: #3498db; text-decoration: none;" href="'
+
+GOLDEN = [
+    ("headings", "## 二级\n### 三级\n#### 四级",
+     f"{H2}二级</h2>\n{H3}三级</h3>\n{P}#### 四级</p>"),
+    ("inline", "有 **加粗**、*斜体* 和 [链接](https://a.b/c)。",
+     f'{P}有 {STRONG}加粗</strong>、<em>斜体</em> 和 {A}https://a.b/c">链接</a>。</p>'),
+    ("nested inline", "**粗体里的 [链接](u)** 与 *斜体里的 [链接](v)*",
+     f'{P}{STRONG}粗体里的 {A}u">链接</a></strong> 与 <em>斜体里的 {A}v">链接</a></em></p>'),
+    ("quote bold only", "> 引用里 **加粗** 和 *不处理斜体*",
+     f"{BQ}引用里 {STRONG_INLINE}加粗</strong> 和 *不处理斜体*</blockquote>"),
+    ("unordered list", "- 一\n\n- **二**\n\n正文",
+     f"{UL}{LI}一</li>{LI}{STRONG_INLINE}二</strong></li></ul>\n{P}正文</p>"),
+    ("ordered list", "1. 甲\n2. 乙",
+     f"{OL}{LI}甲</li>{LI}乙</li></ol>"),
+    ("list kind switch", "- 无序\n1. 有序",
+     f"{UL}{LI}无序</li></ul>\n{OL}{LI}有序</li></ol>"),
+    ("list before quote", "- 项\n> 引用",
+     f"{UL}{LI}项</li></ul>\n{BQ}引用</blockquote>"),
+    ("list before hr", "- 项\n---",
+     f"{UL}{LI}项</li></ul>\n{HR}"),
+    ("list at end", "正文\n- 末项",
+     f"{P}正文</p>\n{UL}{LI}末项</li></ul>"),
+]
+
+
+def check(args):
+    publisher = load_publisher()
+    failures = 0
+    for name, md, expected in GOLDEN:
+        actual = publisher.markdown_to_wechat_html(md)
+        ok = actual == expected
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}")
+        if not ok:
+            print(f"   expected: {expected}\n   actual:   {actual}")
+
+    # 流式输出与返回字符串一致
+    sample = (DRAFTS_DIR / "lex-fridman-ai-2026-02-06.md").read_text(encoding='utf-8')
+    out = io.StringIO()
+    publisher.markdown_to_wechat_html(sample, "https://v", "问？", out=out)
+    ok = out.getvalue() == publisher.markdown_to_wechat_html(sample, "https://v", "问？")
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} streaming writer matches string output")
+
+    def normalize(html):
+        return html.replace('<ol style', '<ul style').replace('</ol>', '</ul>')
+
+    for path in sorted(DRAFTS_DIR.glob("*.md")):
+        md = path.read_text(encoding='utf-8')
+        ok = normalize(publisher.markdown_to_wechat_html(md)) == legacy_markdown_to_wechat_html(md)
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {path.name} matches legacy output (ordered lists normalized)")
+    sys.exit(1 if failures else 0)
+
+
+def measure(fn):
+    """先计时，再单独跑一次测峰值内存（tracemalloc 会拖慢计时）"""
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench(args):
+    publisher = load_publisher()
+    docs = [(p.name, p.read_text(encoding='utf-8')) for p in sorted(DRAFTS_DIR.glob("*.md"))]
+    raw = (DRAFTS_DIR / "beckley_raw.md").read_text(encoding='utf-8')
+    docs.append((f"beckley_raw.md x{args.scale}", (raw + "\n") * args.scale))
+
+    print(f"{'document':>38} {'KB':>7} {'renderer':>10} {'time (ms)':>10} {'MB/s':>6} {'peak KB':>8}")
+    for name, md in docs:
+        size = len(md.encode('utf-8'))
+        runs = (("legacy", lambda: legacy_markdown_to_wechat_html(md)),
+                ("tokenizer", lambda: publisher.markdown_to_wechat_html(md)),
+                ("streaming", lambda: publisher.markdown_to_wechat_html(md, out=io.StringIO())))
+        for renderer, fn in runs:
+            _, elapsed, peak = measure(fn)
+            print(f"{name:>38} {size / 1024:>7.0f} {renderer:>10} {elapsed * 1000:>10.1f} "
+                  f"{size / 1048576 / elapsed:>6.1f} {peak / 1024:>8.0f}")
+
+
+def cache(args):
+    publisher = load_publisher()
+    calls = {"article": 0, "cover": 0}
+    render_article = publisher.render_article
+
+    def counting_render_article(*a):
+        calls["article"] += 1
+        return render_article(*a)
+
+    def fake_cover(title, cover_path):
+        calls["cover"] += 1
+        time.sleep(args.cover_cost)
+        Path(cover_path).write_bytes(b'\x89PNG\r\n\x1a\n' + title.encode('utf-8') * 1000)
+        return True
+
+    publisher.render_article = counting_render_article
+    publisher.render_cover = fake_cover
+    docs = [(p.name, p.read_text(encoding='utf-8')) for p in sorted(DRAFTS_DIR.glob("*.md"))]
+    failures = 0
+
+    def expect(label, ok):
+        nonlocal failures
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {label}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cover_tmp = str(Path(tmp) / "cover.png")
+        store = publisher.RenderCache(Path(tmp) / "render-cache", max_entries=len(docs) + 2)
+        print(f"{'pass':>6} {'time (ms)':>10} {'hits':>5} {'articles':>9} {'covers':>7}")
+        results = {}
+        for name in ('cold', 'warm'):
+            before = dict(calls, hits=store.hits)
+            started = time.perf_counter()
+            for doc, md in docs:
+                title = md.split('\n', 1)[0].replace('# ', '').strip()
+                results[doc, name] = publisher.render_with_cache(md, title, "https://v", "问？",
+                                                                 cache=store, cover_path=cover_tmp)
+            elapsed = time.perf_counter() - started
+            print(f"{name:>6} {elapsed * 1000:>10.1f} {store.hits - before['hits']:>5} "
+                  f"{calls['article'] - before['article']:>9} {calls['cover'] - before['cover']:>7}")
+
+        expect("warm pass returns identical HTML and cover bytes",
+               all(results[d, 'cold'][0] == results[d, 'warm'][0]
+                   and Path(results[d, 'cold'][1]).read_bytes() == Path(results[d, 'warm'][1]).read_bytes()
+                   for d, _ in docs))
+        expect("cached HTML equals an uncached render",
+               results[docs[0][0], 'warm'][0] == render_article(docs[0][1], "https://v", "问？"))
+
+        md = docs[0][1]
+        key = store.make_key(md, "https://v", "问？")
+        expect("edited draft misses", store.make_key(md + "\n补充。", "https://v", "问？") != key)
+        expect("different vote question misses", store.make_key(md, "https://v", "另一问？") != key)
+        publisher.STYLES_VERSION += 1
+        expect("STYLES_VERSION bump misses", store.make_key(md, "https://v", "问？") != key)
+        publisher.STYLES_VERSION -= 1
+        original = publisher.STYLES['p']
+        publisher.STYLES['p'] += ' color: #000;'
+        expect("STYLES edit misses", store.make_key(md, "https://v", "问？") != key)
+        publisher.STYLES['p'] = original
+
+        store.max_entries = 2
+        store.get(store.make_key(docs[1][1], "https://v", "问？"))
+        evicted = store.prune()
+        kept = {p.name for p in store.entries()}
+        expect(f"LRU prune keeps the 2 most recently used entries (evicted {evicted})",
+               store.path(store.make_key(docs[1][1], "https://v", "问？")).name in kept and len(kept) == 2)
+    sys.exit(1 if failures else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golden checks and benchmark for the WeChat Markdown renderer")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('check')
+    sub = subparsers.add_parser('bench')
+    sub.add_argument('--scale', type=int, default=100, help="beckley_raw.md 重复次数")
+    sub = subparsers.add_parser('cache')
+    sub.add_argument('--cover-cost', type=float, default=0.05, help="模拟生成一张封面的耗时（秒）")
+    args = parser.parse_args()
+    {'check': check, 'bench': bench, 'cache': cache}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
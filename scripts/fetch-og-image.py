@@ -4,110 +4,615 @@ Fetch og:image from URLs for Mind Our Times articles.
 
 Usage:
     python3 scripts/fetch-og-image.py <url>
-    python3 scripts/fetch-og-image.py --batch <json_file>
+    python3 scripts/fetch-og-image.py --batch <json_file> [--concurrency 8] [--per-host 2] [--deadline 60]
+
+同一域名的请求复用 keep-alive 连接；缓存过期的条目用 ETag / Last-Modified
+发送条件请求，304 时沿用缓存结果。
+
+Cache:
+    结果缓存在 data/og-image-cache.sqlite3（含"无图"的负缓存）。
+    --refresh   忽略已缓存结果重新抓取（仍写回缓存）
+    --no-cache  完全不读写缓存
 """
 
+import argparse
+import codecs
+import http.client
+import sqlite3
+import ssl
 import sys
 import json
-import urllib.request
-import re
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
+
+# 路径配置
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+CACHE_FILE = PROJECT_DIR / "data" / "og-image-cache.sqlite3"
+
+# 缓存参数
+CACHE_TTL = 7 * 86400           # 找到图片的结果保留 7 天
+CACHE_NEGATIVE_TTL = 86400      # "无 og:image" 的结果保留 1 天，出版方可能稍后补图
+CACHE_MAX_ENTRIES = 5000        # 超出后按最近访问时间淘汰
+
+# 流式解析参数
+CHUNK_SIZE = 8192               # 每次读取的字节数
+MAX_HEAD_BYTES = 100000         # 最多读取 100 KB，仍未见 </head> 则放弃
+
+# HTTP 参数
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+MAX_REDIRECTS = 5
+DRAIN_LIMIT = 65536             # 提前停止读取时，剩余正文不超过 64 KB 则读完以复用连接
+
+# 批量抓取默认参数
+DEFAULT_CONCURRENCY = 8     # 全局并发数
+DEFAULT_PER_HOST = 2        # 同一域名的最大并发连接数
+DEFAULT_DEADLINE = 60       # 整批抓取的总时限（秒）
+
+
+# 跟踪参数不影响页面内容，归一化时去掉
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid')
+
+
+def normalize_url(url):
+    """归一化 URL 作为缓存键：小写 scheme/host，去掉 fragment、默认端口和跟踪参数"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme, netloc.rsplit(':', 1)[-1]) in (('http', '80'), ('https', '443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+             if not k.lower().startswith(TRACKING_PARAMS)]
+    return urlunparse((scheme, netloc, parsed.path or '/', parsed.params,
+                       urlencode(sorted(query)), ''))
+
 
+class OgImageCache:
+    """og:image 结果的持久化缓存（SQLite）
 
-def fetch_og_image(url):
-    """从 URL 抓取 og:image"""
+    get() 返回 None 表示未命中；返回 "" 表示已知该页面没有 og:image（负缓存）。
+    同时保存响应的 ETag / Last-Modified，过期条目可用条件请求重新验证。
+    """
+
+    def __init__(self, path=CACHE_FILE, ttl=CACHE_TTL, negative_ttl=CACHE_NEGATIVE_TTL,
+                 max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS og_image ("
+            " url TEXT PRIMARY KEY,"
+            " image TEXT NOT NULL,"
+            " found INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " etag TEXT NOT NULL DEFAULT '',"
+            " last_modified TEXT NOT NULL DEFAULT '')"
+        )
+        # 旧版缓存文件没有校验字段，补列
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(og_image)")}
+        for column in ('etag', 'last_modified'):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE og_image ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+        self._db.execute("CREATE INDEX IF NOT EXISTS og_image_accessed ON og_image (accessed_at)")
+        self._db.commit()
+
+    def lookup(self, url):
+        """返回缓存条目（含已过期条目）或 None
+
+        条目为 {"image", "etag", "last_modified", "fresh"}；只有 fresh 的条目计为命中。
+        """
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT image, found, fetched_at, etag, last_modified FROM og_image WHERE url = ?", (key,)
+            ).fetchone()
+            if not row:
+                self.misses += 1
+                return None
+            image, found, fetched_at, etag, last_modified = row
+            fresh = now - fetched_at < (self.ttl if found else self.negative_ttl)
+            if fresh:
+                self._db.execute("UPDATE og_image SET accessed_at = ? WHERE url = ?", (now, key))
+                self._db.commit()
+                self.hits += 1
+            else:
+                self.misses += 1
+            return {'image': image, 'etag': etag, 'last_modified': last_modified, 'fresh': fresh}
+
+    def get(self, url):
+        entry = self.lookup(url)
+        return entry['image'] if entry and entry['fresh'] else None
+
+    def put(self, url, image, etag='', last_modified=''):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO og_image"
+                " (url, image, found, fetched_at, accessed_at, etag, last_modified)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (normalize_url(url), image, 1 if image else 0, now, now, etag or '', last_modified or '')
+            )
+            self._evict()
+            self._db.commit()
+
+    def touch(self, url):
+        """服务器返回 304 时续期条目"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE og_image SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                             (now, now, normalize_url(url)))
+            self._db.commit()
+
+    def _evict(self):
+        """超出容量时删除最久未访问的条目"""
+        count = self._db.execute("SELECT COUNT(*) FROM og_image").fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM og_image WHERE url IN ("
+                " SELECT url FROM og_image ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_cache(no_cache=False):
+    """打开默认缓存；--no-cache 或缓存不可用时返回 None"""
+    if no_cache:
+        return None
     try:
-        req = urllib.request.Request(url, headers={
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            html = resp.read().decode('utf-8', errors='ignore')[:100000]
-            
-            # 优先级 1: og:image
-            patterns = [
-                r'<meta[^>]+property=["\']og:image["\'][^>]+content=["\']([^"\']+)["\']',
-                r'<meta[^>]+content=["\']([^"\']+)["\'][^>]+property=["\']og:image["\']',
-            ]
-            for pattern in patterns:
-                match = re.search(pattern, html, re.IGNORECASE)
-                if match:
-                    img_url = match.group(1)
-                    # 处理相对 URL
-                    if img_url.startswith('//'):
-                        img_url = 'https:' + img_url
-                    elif img_url.startswith('/'):
-                        from urllib.parse import urlparse
-                        parsed = urlparse(url)
-                        img_url = f"{parsed.scheme}://{parsed.netloc}{img_url}"
-                    return img_url
-            
-            # 优先级 2: twitter:image
-            patterns = [
-                r'<meta[^>]+name=["\']twitter:image["\'][^>]+content=["\']([^"\']+)["\']',
-                r'<meta[^>]+content=["\']([^"\']+)["\'][^>]+name=["\']twitter:image["\']',
-            ]
-            for pattern in patterns:
-                match = re.search(pattern, html, re.IGNORECASE)
-                if match:
-                    img_url = match.group(1)
-                    if img_url.startswith('//'):
-                        img_url = 'https:' + img_url
-                    elif img_url.startswith('/'):
-                        from urllib.parse import urlparse
-                        parsed = urlparse(url)
-                        img_url = f"{parsed.scheme}://{parsed.netloc}{img_url}"
-                    return img_url
-            
-            return ""
+        return OgImageCache()
+    except sqlite3.Error as e:
+        print(f"  ⚠️ og:image cache unavailable ({e}), continuing without cache", file=sys.stderr)
+        return None
+
+
+class HeadImageScanner(HTMLParser):
+    """增量扫描 HTML <head> 中的图片声明
+
+    一次扫描同时收集 og:image、twitter:image 和 <link rel="image_src">，
+    遇到 og:image（最高优先级）、</head> 或 <body> 时置 done，调用方即可停止读取。
+    """
+
+    OG_KEYS = ('og:image', 'og:image:url', 'og:image:secure_url')
+    TWITTER_KEYS = ('twitter:image', 'twitter:image:src')
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.og_image = ''
+        self.twitter_image = ''
+        self.link_image = ''
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'meta':
+            attrs = {k: (v or '').strip() for k, v in attrs}
+            key = (attrs.get('property') or attrs.get('name') or '').lower()
+            content = attrs.get('content', '')
+            if not content:
+                return
+            if key in self.OG_KEYS:
+                self.og_image = content
+                self.done = True
+            elif key in self.TWITTER_KEYS and not self.twitter_image:
+                self.twitter_image = content
+        elif tag == 'link' and not self.link_image:
+            attrs = {k: (v or '').strip() for k, v in attrs}
+            if 'image_src' in attrs.get('rel', '').lower().split() and attrs.get('href'):
+                self.link_image = attrs['href']
+        elif tag == 'body':
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.done = True
+
+
+def scan_head_images(chunks, base_url, max_bytes=MAX_HEAD_BYTES):
+    """从字节块迭代器中流式提取图片声明，提前结束时不再消费后续数据
+
+    返回 {"og_image", "twitter_image", "link_image", "bytes_read"}，图片 URL 已转为绝对地址。
+    """
+    scanner = HeadImageScanner()
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    bytes_read = 0
+    for chunk in chunks:
+        bytes_read += len(chunk)
+        scanner.feed(decoder.decode(chunk))
+        if scanner.done or bytes_read >= max_bytes:
+            break
+    return {
+        'og_image': _absolute(scanner.og_image, base_url),
+        'twitter_image': _absolute(scanner.twitter_image, base_url),
+        'link_image': _absolute(scanner.link_image, base_url),
+        'bytes_read': bytes_read,
+    }
+
+
+def best_image(images):
+    """按优先级选图：og:image > twitter:image > link rel=image_src"""
+    return images['og_image'] or images['twitter_image'] or images['link_image']
+
+
+def _absolute(img_url, base_url):
+    # 处理相对 URL（//cdn/...、/images/...、images/...）
+    return urljoin(base_url, img_url) if img_url else ''
+
+
+class FetchError(Exception):
+    """页面抓取失败（HTTP 错误、重定向过多等），结果不写入缓存"""
+
+
+class ConnectionPool:
+    """按 (scheme, host, port) 复用 HTTP/1.1 keep-alive 连接
+
+    统计 opened（新建连接）、reused（复用连接）、not_modified（304 响应）。
+    ssl_context 可替换为信任自签名证书的 context，用于本地 HTTPS 替身服务。
+    """
+
+    def __init__(self, max_idle_per_host=DEFAULT_PER_HOST, ssl_context=None):
+        self.max_idle_per_host = max_idle_per_host
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.opened = 0
+        self.reused = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._idle = defaultdict(list)
+        self._closed = False
+
+    def _acquire(self, key, timeout, fresh=False):
+        with self._lock:
+            if self._idle[key] and not fresh:
+                self.reused += 1
+                conn = self._idle[key].pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.opened += 1
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context), False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def _release(self, key, conn):
+        with self._lock:
+            # 连接池已关闭（如超时后仍在运行的请求）时直接关闭连接，不再放回
+            if not self._closed and len(self._idle[key]) < self.max_idle_per_host:
+                self._idle[key].append(conn)
+                return
+        conn.close()
+
+    def request(self, url, headers, timeout=15):
+        """发送 GET 请求，返回 (response, release)
+
+        调用方读完需要的数据后必须调用 release(reusable)；
+        复用的连接若已被服务器关闭，自动新建连接重试一次（新连接失败则直接抛出）。
+        """
+        parsed = urlparse(url)
+        scheme = parsed.scheme.lower()
+        if scheme not in ('http', 'https'):
+            raise FetchError(f"unsupported scheme: {scheme}")
+        key = (scheme, parsed.hostname, parsed.port or (443 if scheme == 'https' else 80))
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+
+        for attempt in range(2):
+            conn, reused = self._acquire(key, timeout, fresh=attempt > 0)
+            try:
+                conn.request('GET', path, headers=headers)
+                resp = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # 服务器已关闭空闲连接，同主机的其他空闲连接多半也已失效
+                self._discard_idle(key)
+            except Exception:
+                conn.close()
+                raise
+
+        def release(reusable):
+            if reusable and not resp.will_close:
+                self._release(key, conn)
+            else:
+                conn.close()
+
+        return resp, release
+
+    def count_not_modified(self):
+        # 多个工作线程同时收到 304，计数需在锁内递增
+        with self._lock:
+            self.not_modified += 1
+
+    def _discard_idle(self, key):
+        with self._lock:
+            conns = self._idle.pop(key, [])
+        for conn in conns:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+def _fetch_og_image(url, timeout=15, pool=None, validators=None, cutoff=None):
+    """抓取页面并提取 og:image，网络错误时抛出异常（不写入负缓存）
+
+    返回 {"image", "etag", "last_modified", "not_modified"}。
+    validators 为缓存条目时发送 If-None-Match / If-Modified-Since。
+    cutoff 为整批的截止时间（time.monotonic()）：每一跳的超时不超过剩余时间，
+    读取正文时每块之前检查一次，过了截止时间抛出 FetchError。
+    """
+    own_pool = pool is None
+    pool = pool or ConnectionPool()
+    headers = {
+        'User-Agent': USER_AGENT,
+        'Accept': 'text/html,application/xhtml+xml',
+        'Accept-Encoding': 'identity',
+    }
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    conditional = 'If-None-Match' in headers or 'If-Modified-Since' in headers
+
+    def budget():
+        if cutoff is None:
+            return timeout
+        left = cutoff - time.monotonic()
+        if left <= 0:
+            raise FetchError("deadline reached")
+        return min(timeout, left)
+
+    def read_chunks(resp):
+        while True:
+            budget()
+            # read1 只等一次 recv，不会为凑满 CHUNK_SIZE 一直阻塞在慢速连接上
+            chunk = resp.read1(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            resp, release = pool.request(url, headers, timeout=budget())
+            status = resp.status
+            if status in (301, 302, 303, 307, 308) and resp.getheader('Location'):
+                url = urljoin(url, resp.getheader('Location'))
+                _drain(resp, release)
+                continue
+            if status == 304:
+                _drain(resp, release)
+                # 没发校验头却收到 304，无法得知图片，不能当作"无图"写入缓存
+                if not conditional:
+                    raise FetchError("HTTP 304 without conditional request")
+                pool.count_not_modified()
+                return {'image': '', 'etag': '', 'last_modified': '', 'not_modified': True}
+            if status >= 400:
+                _drain(resp, release)
+                raise FetchError(f"HTTP {status}")
+
+            # 分块读取，找到图片或读完 <head> 后停止
+            try:
+                images = scan_head_images(read_chunks(resp), url)
+            except FetchError:
+                release(False)
+                raise
+            _drain(resp, release)
+            return {
+                'image': best_image(images),
+                'etag': resp.getheader('ETag', ''),
+                'last_modified': resp.getheader('Last-Modified', ''),
+                'not_modified': False,
+            }
+        raise FetchError("too many redirects")
+    finally:
+        if own_pool:
+            pool.close()
+
+
+def _drain(resp, release):
+    """剩余正文较小时读完以复用连接，否则直接关闭连接"""
+    if resp.isclosed():
+        release(True)
+    elif resp.length is not None and resp.length <= DRAIN_LIMIT:
+        resp.read()
+        release(True)
+    else:
+        release(False)
+
+
+def fetch_og_image(url, timeout=15, cache=None, refresh=False, pool=None):
+    """从 URL 抓取 og:image（可选缓存）"""
+    entry = None
+    if cache is not None:
+        entry = cache.lookup(url)
+        if entry and entry['fresh'] and not refresh:
+            return entry['image']
+    # --refresh 时不带校验头，强制重新下载
+    return _revalidate(url, None if refresh else entry, timeout, cache, pool)
+
+
+def _revalidate(url, entry, timeout, cache, pool, cutoff=None):
+    try:
+        result = _fetch_og_image(url, timeout=timeout, pool=pool, validators=entry, cutoff=cutoff)
     except Exception as e:
         print(f"  ⚠️ Failed to fetch og:image for {url}: {e}", file=sys.stderr)
         return ""
+    if result['not_modified']:
+        # 只有带了 entry 的校验头才会返回 not_modified（否则 _fetch_og_image 抛 FetchError）
+        cache.touch(url)
+        return entry['image']
+    if cache is not None:
+        cache.put(url, result['image'], result['etag'], result['last_modified'])
+    return result['image']
+
+
+def fetch_og_images(urls, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST,
+                    deadline=DEFAULT_DEADLINE, on_result=None, cache=None, refresh=False, pool=None):
+    """并发抓取多个 URL 的 og:image，结果按输入顺序返回
 
+    超过 deadline 仍未完成的 URL 结果为空字符串；空 URL 直接返回空字符串。
+    命中缓存的 URL 不进入线程池；过期条目带校验头重新请求。
+    on_result(index, url, img_url) 在每个 URL 完成时回调（用于打印进度）。
+    pool 为 ConnectionPool，传入时可在调用后读取连接复用统计。
+    """
+    results = [''] * len(urls)
+    todo = []
+    for i, url in enumerate(urls):
+        if not url:
+            continue
+        entry = cache.lookup(url) if cache is not None else None
+        if entry and entry['fresh'] and not refresh:
+            results[i] = entry['image']
+            if on_result:
+                on_result(i, url, entry['image'])
+            continue
+        todo.append((i, url, None if refresh else entry))
+    own_pool = pool is None
+    pool = pool or ConnectionPool(max_idle_per_host=per_host)
+    started = time.monotonic()
+    cutoff = started + deadline if deadline else None
+
+    # 按域名排队：每个域名同时最多 per_host 个任务在线程池里，一个完成后才提交该域名的下一个，
+    # 线程不会因为等同一域名的名额而空占着，其他域名也不会被饿死
+    queues = {}
+    for item in todo:
+        queues.setdefault(urlparse(item[1]).netloc.lower(), deque()).append(item)
+    lock = threading.Lock()
+    active = defaultdict(int)
+    state = {'left': len(todo), 'stopped': False}
+    finished = threading.Event()
+    if not todo:
+        finished.set()
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+
+    def submit_next(host):
+        with lock:
+            if state['stopped'] or not queues[host] or active[host] >= max(1, per_host):
+                return
+            active[host] += 1
+            executor.submit(worker, host, *queues[host].popleft())
+
+    def worker(host, index, url, entry):
+        try:
+            if cutoff is None or time.monotonic() < cutoff:
+                results[index] = _revalidate(url, entry, 15, cache, pool, cutoff)
+                if on_result:
+                    on_result(index, url, results[index])
+        finally:
+            with lock:
+                active[host] -= 1
+                state['left'] -= 1
+                if state['left'] == 0:
+                    finished.set()
+            submit_next(host)
 
-def process_batch(json_file):
+    # 先给每个域名各提交一个，再补第二个……交错排进线程池队列
+    for _ in range(max(1, per_host)):
+        for host in queues:
+            submit_next(host)
+    finished.wait(None if cutoff is None else max(0, cutoff - time.monotonic()))
+    with lock:
+        state['stopped'] = True
+        pending = state['left']
+    # 不等待超时的请求：它们的超时不超过截止时间，很快会自行结束；已返回的结果已写入 results
+    executor.shutdown(wait=False, cancel_futures=True)
+    if own_pool:
+        pool.close()
+    if pending:
+        print(f"  ⏱️ Deadline reached, {pending} URLs left without thumbnail", file=sys.stderr)
+    return list(results)
+
+
+def process_batch(json_file, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST,
+                  deadline=DEFAULT_DEADLINE, cache=None, refresh=False):
     """批量处理 JSON 文件中的文章，添加 thumbnail 字段"""
     with open(json_file, 'r', encoding='utf-8') as f:
         articles = json.load(f)
-    
-    for i, article in enumerate(articles):
-        url = article.get('url', article.get('source_url', ''))
-        if not url:
-            article['thumbnail'] = ''
-            continue
-        
-        print(f"[{i+1}/{len(articles)}] Fetching og:image for {url[:60]}...")
-        article['thumbnail'] = fetch_og_image(url)
-        if article['thumbnail']:
-            print(f"  ✅ {article['thumbnail'][:80]}...")
-        else:
-            print(f"  ⚠️ No og:image found")
+
+    urls = [article.get('url', article.get('source_url', '')) for article in articles]
+    print(f"Fetching og:image for {sum(1 for u in urls if u)} articles "
+          f"(concurrency={concurrency}, per-host={per_host}, deadline={deadline}s)...")
+
+    progress_lock = threading.Lock()
+
+    def report(index, url, img_url):
+        with progress_lock:
+            print(f"[{index+1}/{len(articles)}] {url[:60]}")
+            if img_url:
+                print(f"  ✅ {img_url[:80]}...")
+            else:
+                print(f"  ⚠️ No og:image found")
+
+    started = time.monotonic()
+    pool = ConnectionPool(max_idle_per_host=per_host)
+    thumbnails = fetch_og_images(urls, concurrency=concurrency, per_host=per_host, deadline=deadline,
+                                 on_result=report, cache=cache, refresh=refresh, pool=pool)
+    pool.close()
+    # 按原始顺序写回
+    for article, thumbnail in zip(articles, thumbnails):
+        article['thumbnail'] = thumbnail
     
     # 写回
     with open(json_file, 'w', encoding='utf-8') as f:
         json.dump(articles, f, ensure_ascii=False, indent=2)
     
-    print(f"\n✅ Processed {len(articles)} articles, saved to {json_file}")
+    print(f"\n✅ Processed {len(articles)} articles in {time.monotonic() - started:.1f}s, saved to {json_file}")
+    print(f"   Connections: {pool.opened} opened, {pool.reused} reused, {pool.not_modified} not modified (304)")
+    if cache is not None:
+        print(f"   Cache: {cache.hits} hits, {cache.misses} misses")
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage:")
-        print("  python3 scripts/fetch-og-image.py <url>")
-        print("  python3 scripts/fetch-og-image.py --batch <json_file>")
-        sys.exit(1)
-    
-    if sys.argv[1] == '--batch':
-        if len(sys.argv) < 3:
-            print("Error: --batch requires a JSON file path")
-            sys.exit(1)
-        process_batch(sys.argv[2])
-    else:
-        url = sys.argv[1]
-        og_image = fetch_og_image(url)
+    parser = argparse.ArgumentParser(description="Fetch og:image for Mind Our Times articles")
+    parser.add_argument('url', nargs='?', help="单个文章 URL")
+    parser.add_argument('--batch', metavar='JSON_FILE', help="批量处理文章 JSON，写入 thumbnail 字段")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="批量抓取的并发数")
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST, help="同一域名的最大并发数")
+    parser.add_argument('--deadline', type=float, default=DEFAULT_DEADLINE, help="整批抓取的总时限（秒），0 表示不限")
+    parser.add_argument('--refresh', action='store_true', help="忽略缓存重新抓取（结果仍写回缓存）")
+    parser.add_argument('--no-cache', action='store_true', help="不读写 og:image 缓存")
+    args = parser.parse_args()
+
+    cache = open_cache(no_cache=args.no_cache)
+    if args.batch:
+        process_batch(args.batch, concurrency=args.concurrency, per_host=args.per_host,
+                      deadline=args.deadline, cache=cache, refresh=args.refresh)
+    elif args.url:
+        og_image = fetch_og_image(args.url, cache=cache, refresh=args.refresh)
         if og_image:
             print(og_image)
         else:
             print("No og:image found", file=sys.stderr)
             sys.exit(1)
+    else:
+        parser.print_usage()
+        sys.exit(1)
 
 
 if __name__ == '__main__':
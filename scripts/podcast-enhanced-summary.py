@@ -6,15 +6,51 @@ Uses yt-dlp to download subtitles, then GPT-4o to generate
 high-quality, structured summaries from full transcripts.
 
 Cost: ~$0.04-0.15 per podcast (depending on length)
+
+Pipeline: transcripts download in a thread pool ahead of summarization;
+summary requests run concurrently behind a token-bucket rate limiter.
+Results are applied to data.json in episode order.
+
+Summaries are cached by content hash (model + prompt version + context +
+episode metadata) in data/summary-cache/, so re-runs only call the API for
+episodes whose transcript or prompt inputs changed.
+
+Transcripts are fetched once into a compressed local store
+(data/transcripts/); summarization, quote verification and search all read
+from it, and --offline runs entirely from the store.
+
+Transcripts longer than a single request's budget are summarized with a
+map-reduce: sentence-aligned, token-budgeted chunks are summarized
+concurrently, then one reduce request produces the final JSON.
+
+Usage:
+  python3 scripts/podcast-enhanced-summary.py [--summary-mode auto|single|chunked] [--concurrency 3] [--transcript-workers 4] [--rpm 20] [--no-cache] [--offline]
+  python3 scripts/podcast-enhanced-summary.py --resume [--only <videoId>]
+  python3 scripts/podcast-enhanced-summary.py cache {list,show,stats,prune,clear}
+  python3 scripts/podcast-enhanced-summary.py transcripts {list,stats,search} [pattern]
 """
 
+import argparse
+import gzip
+import hashlib
+import io
 import json
 import os
+import re
 import subprocess
 import sys
 import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterable, Iterator, Union
+
+try:
+    import zstandard  # optional: better compression for the transcript store
+except ImportError:
+    zstandard = None
 
 # Paths
 SCRIPT_DIR = Path(__file__).parent
@@ -23,12 +59,319 @@ ROOT_WORKSPACE = SCRIPT_DIR.parent.parent  # ~/.openclaw/workspace/
 DATA_FILE = WORKSPACE / "podcast-friday/frontend/data.json"
 OPENAI_KEY_FILE = ROOT_WORKSPACE / ".config/api_keys/openai"
 YT_DLP = "yt-dlp"
+CHAT_COMPLETIONS_URL = "https://api.openai.com/v1/chat/completions"
+MODEL = "gpt-4o"
+PROMPT_VERSION = "v1.2"     # bump whenever the summary prompt template changes
+SUMMARY_CACHE_DIR = WORKSPACE / "data/summary-cache"
+SUMMARY_CACHE_MAX_ENTRIES = 500
+TRANSCRIPT_DIR = WORKSPACE / "data/transcripts"
+
+# Summarization modes
+MAX_CONTEXT_CHARS = 100000  # ~75K tokens, safe for 128K context (single-request mode)
+CHUNK_TOKENS = 12000        # token budget per map-step chunk
+CHUNK_WORKERS = 8           # concurrent map-step requests per episode
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?。！？])\s+')
+
+# Subtitle parsing
+SRT_TAG = re.compile(r'<[^>]+>')
+SRT_ARTIFACT = re.compile(r'\[(?:Music|Applause)\]')
+SRT_SPACES = re.compile(r'\s{2,}')
+SRT_SKIP_PREFIXES = ('WEBVTT', 'Kind:', 'Language:', 'align:', 'position:')
+SRT_DEDUP_WINDOW = 8        # rolling auto-captions repeat a line within the next few cues
+
+# Pipeline defaults
+TRANSCRIPT_WORKERS = 4      # concurrent transcript downloads
+SUMMARY_WORKERS = 3         # concurrent GPT-4o requests
+REQUESTS_PER_MINUTE = 20    # token-bucket refill rate for GPT-4o requests
+REQUEST_BURST = 3           # token-bucket capacity
+
+print_lock = threading.Lock()
+
+def log(message: str):
+    """Thread-safe print (pipeline workers share stdout)."""
+    with print_lock:
+        print(message, flush=True)
+
+class TokenBucket:
+    """Blocking token-bucket rate limiter shared by summary workers."""
+
+    def __init__(self, rate_per_minute: float, capacity: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class SummaryCache:
+    """Content-addressed on-disk cache of GPT summaries.
+
+    One JSON file per key; hits refresh the file mtime so prune() evicts
+    the least recently used entries first.
+    """
+
+    def __init__(self, directory: Path = SUMMARY_CACHE_DIR, max_entries: int = SUMMARY_CACHE_MAX_ENTRIES):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, context: str, metadata: dict) -> str:
+        material = json.dumps({
+            "model": model,
+            "prompt_version": PROMPT_VERSION,
+            "metadata": metadata,
+            "context": context,
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self.path(key)
+        try:
+            entry = json.loads(path.read_text())
+            os.utime(path)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return entry.get('summary')
+
+    def put(self, key: str, summary: dict, info: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entry = {"key": key, "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'), **info, "summary": summary}
+        # Write to a temp file first so a crash never leaves a truncated entry
+        tmp = self.path(key).with_suffix('.tmp')
+        tmp.write_text(json.dumps(entry, ensure_ascii=False, indent=2))
+        os.replace(tmp, self.path(key))
+        self.prune()
+
+    def entries(self) -> List[Path]:
+        """Cache files, most recently used first."""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob('*.json'), key=lambda p: p.stat().st_mtime, reverse=True)
+
+    def prune(self, max_entries: Optional[int] = None) -> int:
+        limit = self.max_entries if max_entries is None else max_entries
+        with self.lock:
+            stale = self.entries()[limit:]
+            for path in stale:
+                path.unlink(missing_ok=True)
+        return len(stale)
+
+def cache_command(args):
+    """Inspect or maintain the summary cache."""
+    cache = SummaryCache()
+    entries = cache.entries()
+    if args.action == 'list':
+        for path in entries:
+            entry = json.loads(path.read_text())
+            print(f"{entry['key'][:16]}  {entry.get('created_at', '')}  {entry.get('videoId', ''):<12} "
+                  f"{entry.get('model', '')}/{entry.get('prompt_version', '')}  {entry.get('title', '')[:40]}")
+    elif args.action == 'show':
+        matches = [p for p in entries if p.stem.startswith(args.key or '')]
+        if len(matches) != 1:
+            print(f"❌ {len(matches)} entries match '{args.key}'")
+            return 1
+        print(matches[0].read_text())
+    elif args.action == 'stats':
+        size = sum(p.stat().st_size for p in entries)
+        print(f"📦 {len(entries)} entries, {size / 1024:.1f} KB in {cache.directory} (max {cache.max_entries})")
+    elif args.action == 'prune':
+        removed = cache.prune(args.max_entries)
+        print(f"🧹 Removed {removed} entries")
+    elif args.action == 'clear':
+        removed = cache.prune(0)
+        print(f"🧹 Removed {removed} entries")
+    return 0
+
+class TranscriptStore:
+    """Local transcript store keyed by videoId.
+
+    Each transcript is one compressed text file (zstd when the optional
+    ``zstandard`` package is installed, gzip otherwise) plus an entry in
+    index.json. Readers stream the decompressed text, so search and quote
+    checks never hold a whole 4-hour transcript in memory.
+    """
+
+    def __init__(self, directory: Path = TRANSCRIPT_DIR):
+        self.directory = Path(directory)
+        self.index_file = self.directory / "index.json"
+        self.lock = threading.RLock()  # re-entrant: put() reads self.index while holding it
+        self._index = None
+
+    @property
+    def index(self) -> Dict[str, dict]:
+        if self._index is None:
+            # Transcript workers hit this concurrently: load once under the lock so a
+            # second load cannot replace an index another thread already added to.
+            with self.lock:
+                if self._index is None:
+                    try:
+                        self._index = json.loads(self.index_file.read_text())
+                    except (OSError, ValueError):
+                        self._index = {}
+        return self._index
+
+    def has(self, video_id: str) -> bool:
+        entry = self.index.get(video_id)
+        return bool(entry) and (self.directory / entry['file']).exists()
+
+    def put(self, video_id: str, text: str, source: str = "youtube-transcript-api"):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        codec = 'zstd' if zstandard else 'gzip'
+        filename = f"{video_id}.txt.{'zst' if codec == 'zstd' else 'gz'}"
+        data = text.encode('utf-8')
+        tmp = self.directory / f".{filename}.tmp"
+        with open(tmp, 'wb') as raw:
+            if codec == 'zstd':
+                with zstandard.ZstdCompressor(level=10).stream_writer(raw) as writer:
+                    writer.write(data)
+            else:
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9, mtime=0) as writer:
+                    writer.write(data)
+        os.replace(tmp, self.directory / filename)
+        with self.lock:
+            self.index[video_id] = {
+                "file": filename,
+                "codec": codec,
+                "chars": len(text),
+                "bytes": (self.directory / filename).stat().st_size,
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "source": source,
+                "fetched_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+            tmp_index = self.index_file.with_suffix('.tmp')
+            tmp_index.write_text(json.dumps(self.index, ensure_ascii=False, indent=2))
+            os.replace(tmp_index, self.index_file)
+
+    def open_text(self, video_id: str) -> io.TextIOBase:
+        """Open a transcript as a streaming text reader."""
+        entry = self.index[video_id]
+        raw = open(self.directory / entry['file'], 'rb')
+        if entry['codec'] == 'zstd':
+            if not zstandard:
+                raw.close()
+                raise RuntimeError("zstandard is required to read zstd transcripts (pip install zstandard)")
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        else:
+            stream = gzip.GzipFile(fileobj=raw, mode='rb')
+            stream.myfileobj = raw  # close the file together with the gzip stream
+        return io.TextIOWrapper(io.BufferedReader(stream), encoding='utf-8')
+
+    def read(self, video_id: str, max_chars: Optional[int] = None) -> str:
+        """Read a transcript, decompressing at most max_chars characters."""
+        with self.open_text(video_id) as f:
+            return f.read(-1 if max_chars is None else max_chars)
+
+    def iter_chunks(self, video_id: str, size: int = 65536):
+        with self.open_text(video_id) as f:
+            while True:
+                chunk = f.read(size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def contains(self, video_id: str, phrase: str) -> bool:
+        """Streaming, whitespace/case-insensitive phrase search within one transcript."""
+        needle = normalize_phrase(phrase)
+        if not needle:
+            return False
+        # Chunks are normalized separately, so remember whether a separator fell
+        # on a chunk boundary and put the single space back when joining.
+        tail, gap = '', False
+        for chunk in self.iter_chunks(video_id):
+            piece = normalize_phrase(chunk)
+            gap = gap or not chunk[0].isalnum()
+            if piece:
+                window = tail + (' ' if tail and gap else '') + piece
+                if needle in window:
+                    return True
+                tail = window[-len(needle):]
+                gap = False
+            gap = gap or not chunk[-1].isalnum()
+        return False
+
+    def search(self, pattern: str, context: int = 60):
+        """Yield (videoId, snippet) for every regex match across stored transcripts."""
+        regex = re.compile(pattern, re.IGNORECASE)
+        for video_id in sorted(self.index):
+            if not self.has(video_id):
+                continue
+            overlap = ''
+            for chunk in self.iter_chunks(video_id):
+                window = overlap + chunk
+                for match in regex.finditer(window):
+                    if match.end() <= len(overlap):
+                        continue  # already reported from the previous window
+                    start = max(0, match.start() - context)
+                    yield video_id, window[start:match.end() + context].replace('\n', ' ')
+                overlap = window[-context * 2:]
+
+def normalize_phrase(text: str) -> str:
+    """Lower-case and collapse whitespace/punctuation for quote matching."""
+    return ' '.join(''.join(ch if ch.isalnum() else ' ' for ch in text.lower()).split())
+
+def transcripts_command(args):
+    """Inspect the local transcript store."""
+    store = TranscriptStore()
+    if args.action == 'list':
+        for video_id, entry in sorted(store.index.items()):
+            print(f"{video_id:<12} {entry['chars']:>9,} chars  {entry['bytes']:>8,} bytes  "
+                  f"{entry['codec']:<4}  {entry['fetched_at']}")
+    elif args.action == 'stats':
+        chars = sum(e['chars'] for e in store.index.values())
+        size = sum(e['bytes'] for e in store.index.values())
+        ratio = size / max(1, chars)
+        print(f"📦 {len(store.index)} transcripts, {chars:,} chars in {size / 1024:.1f} KB "
+              f"({ratio:.0%} of plain text) in {store.directory}")
+    elif args.action == 'search':
+        if not args.pattern:
+            print("❌ search requires a pattern")
+            return 1
+        hits = 0
+        for video_id, snippet in store.search(args.pattern):
+            hits += 1
+            print(f"{video_id}: …{snippet}…")
+        print(f"🔎 {hits} matches")
+    return 0
 
 def load_openai_key():
     return OPENAI_KEY_FILE.read_text().strip()
 
-def download_transcript(video_id: str) -> Optional[str]:
-    """Download transcript using youtube-transcript-api."""
+def download_transcript(video_id: str, store: Optional[TranscriptStore] = None,
+                        offline: bool = False, max_chars: Optional[int] = None) -> Optional[str]:
+    """Download transcript using youtube-transcript-api (or read it from the local store).
+
+    max_chars limits how much of a stored transcript is decompressed; fresh
+    downloads are always stored and returned in full.
+    """
+    if store and store.has(video_id):
+        full_text = store.read(video_id, max_chars=max_chars)
+        log(f"  📂 [{video_id}] Stored transcript: {len(full_text):,} of {store.index[video_id]['chars']:,} chars")
+        return full_text
+    if offline:
+        log(f"  ⚠️ [{video_id}] Offline and no stored transcript")
+        return None
+    
     try:
         from youtube_transcript_api import YouTubeTranscriptApi
         
@@ -42,82 +385,164 @@ def download_transcript(video_id: str) -> Optional[str]:
         # Clean up
         full_text = full_text.replace('\n', ' ').replace('  ', ' ')
         
-        print(f"  📥 Got transcript: {len(full_text):,} chars")
+        log(f"  📥 [{video_id}] Got transcript: {len(full_text):,} chars")
+        if store:
+            store.put(video_id, full_text)
         return full_text
         
     except Exception as e:
         error_name = type(e).__name__
         if 'NoTranscript' in error_name or 'Disabled' in error_name:
-            print(f"  ⚠️ No transcript available for {video_id}")
+            log(f"  ⚠️ No transcript available for {video_id}")
         else:
-            print(f"  ⚠️ Transcript error ({error_name}): {str(e)[:50]}")
+            log(f"  ⚠️ [{video_id}] Transcript error ({error_name}): {str(e)[:50]}")
         return None
 
-def parse_srt(content: str) -> str:
-    """Parse SRT/VTT format, extract text, remove duplicates and timestamps."""
-    import re
-    
-    lines = []
-    seen = set()
+def iter_srt_text(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Stream cleaned caption lines from SRT/VTT text, a file object or any line iterator.
+
+    Auto-generated captions repeat each line in the next one or two cues
+    ("rolling" captions), so duplicates are dropped within a small rolling
+    window instead of tracking every line ever seen.
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    recent = deque(maxlen=SRT_DEDUP_WINDOW)
+    recent_set = set()
     
-    for line in content.split('\n'):
+    for line in source:
         line = line.strip()
         
-        # Skip VTT header
-        if line.startswith('WEBVTT') or line.startswith('Kind:') or line.startswith('Language:'):
-            continue
-        # Skip timestamp lines (both SRT and VTT format)
-        if '-->' in line:
-            continue
-        # Skip numeric index lines (SRT)
-        if line.isdigit():
-            continue
-        # Skip empty lines
-        if not line:
-            continue
-        # Skip position/alignment tags
-        if line.startswith('align:') or line.startswith('position:'):
+        # Skip empty lines, numeric index lines (SRT), timestamps, VTT header and position tags
+        if not line or line.isdigit() or '-->' in line or line.startswith(SRT_SKIP_PREFIXES):
             continue
         
-        # Remove VTT tags like <c>, </c>, <00:00:00.000>
-        line = re.sub(r'<[^>]+>', '', line)
-        line = line.strip()
-        
+        # Remove VTT tags like <c>, </c>, <00:00:00.000> and artifacts like [Music]
+        if '<' in line or '[' in line:
+            line = SRT_ARTIFACT.sub('', SRT_TAG.sub('', line))
+            line = SRT_SPACES.sub(' ', line).strip()
         if not line:
             continue
-            
+        
         # Skip duplicate lines (common in auto-subs)
-        if line in seen:
+        if line in recent_set:
+            continue
+        if len(recent) == recent.maxlen:
+            recent_set.discard(recent[0])
+        recent.append(line)
+        recent_set.add(line)
+        yield line
+
+def parse_srt(content: Union[str, Iterable[str]]) -> str:
+    """Parse SRT/VTT format, extract text, remove duplicates and timestamps."""
+    return ' '.join(iter_srt_text(content))
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: ~4 ASCII chars per token, 1 token per CJK/other char."""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in SENTENCE_BOUNDARY.split(text) if s.strip()]
+
+def chunk_transcript(text: str, max_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """Split a transcript into sentence-aligned chunks of at most max_tokens.
+
+    Auto-generated captions often have no punctuation at all; any
+    "sentence" over the budget is split further at word boundaries.
+    """
+    chunks, current, current_tokens = [], [], 0
+    
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append(' '.join(current))
+        current, current_tokens = [], 0
+    
+    for sentence in split_sentences(text):
+        tokens = estimate_tokens(sentence)
+        if tokens > max_tokens:
+            flush()
+            words = sentence.split(' ')
+            step = max(1, len(words) * max_tokens // tokens)
+            for i in range(0, len(words), step):
+                chunks.append(' '.join(words[i:i + step]))
             continue
-        seen.add(line)
-        lines.append(line)
+        if current_tokens + tokens > max_tokens:
+            flush()
+        current.append(sentence)
+        current_tokens += tokens
+    flush()
+    return chunks
+
+def summarize_chunks(video: dict, transcript: str, max_retries: int = 3,
+                     limiter: Optional[TokenBucket] = None) -> Optional[str]:
+    """Map step: summarize all chunks concurrently, return the notes joined in order."""
+    video_id = video.get('videoId', '')
+    chunks = chunk_transcript(transcript)
+    log(f"  🧩 [{video_id}] Map-reduce over {len(chunks)} chunks (≤{CHUNK_TOKENS:,} tokens each)")
     
-    # Join and clean up
-    text = ' '.join(lines)
-    # Remove common artifacts
-    text = text.replace('[Music]', '').replace('[Applause]', '')
-    text = text.replace('  ', ' ')  # Clean double spaces
-    return text
-
-def generate_enhanced_summary(video: dict, transcript: Optional[str], max_retries: int = 3) -> Optional[dict]:
-    """Generate enhanced summary using GPT-4o with full transcript."""
-    import urllib.request
-    import time
+    def summarize_chunk(index: int, chunk: str) -> Optional[dict]:
+        prompt = f"""You are taking research notes on part {index + 1} of {len(chunks)} of a podcast transcript.
+
+Podcast: {video.get('title', '')} ({video.get('channelName', '')})
+
+[TRANSCRIPT PART {index + 1}/{len(chunks)}]
+{chunk}
+
+Return JSON with these fields:
+{{
+  "points": ["the 3-6 most important claims, arguments or facts in this part, one sentence each"],
+  "quotes": ["1-2 of the most striking verbatim English sentences from this part"],
+  "speakers": "who speaks in this part and any background they mention about themselves"
+}}
+
+Return JSON only."""
+        return chat_completion(prompt, f"{video_id}#{index + 1}", max_retries, limiter)
     
-    api_key = load_openai_key()
+    with ThreadPoolExecutor(max_workers=max(1, min(CHUNK_WORKERS, len(chunks)))) as pool:
+        results = list(pool.map(summarize_chunk, range(len(chunks)), chunks))
+    
+    if any(r is None for r in results):
+        log(f"  ❌ [{video_id}] {sum(r is None for r in results)} of {len(chunks)} chunks failed")
+        return None
+    
+    notes = []
+    for i, result in enumerate(results, 1):
+        notes.append(f"## Part {i}/{len(chunks)}")
+        notes.extend(f"- {point}" for point in result.get('points', []))
+        notes.extend(f'> "{quote}"' for quote in result.get('quotes', []))
+        if result.get('speakers'):
+            notes.append(f"Speakers: {result['speakers']}")
+    return '\n'.join(notes)
+
+def generate_enhanced_summary(video: dict, transcript: Optional[str], max_retries: int = 3,
+                              limiter: Optional[TokenBucket] = None,
+                              cache: Optional[SummaryCache] = None, mode: str = "auto") -> Optional[dict]:
+    """Generate enhanced summary using GPT-4o with full transcript.
+
+    mode: "single" sends one request with the transcript truncated to
+    MAX_CONTEXT_CHARS; "chunked" map-reduces the whole transcript; "auto"
+    picks chunked only when the transcript would otherwise be truncated.
+    """
+    video_id = video.get('videoId', '')
     
     # Build context
-    if transcript and len(transcript) > 500:
+    has_transcript = bool(transcript) and len(transcript) > 500
+    chunked = has_transcript and (mode == "chunked" or (mode == "auto" and len(transcript) > MAX_CONTEXT_CHARS))
+    if chunked:
+        context = transcript
+        context_type = "chunked transcript"
+    elif has_transcript:
         # Use transcript (truncate if too long for context)
-        max_chars = 100000  # ~75K tokens, safe for 128K context
-        context = transcript[:max_chars]
+        context = transcript[:MAX_CONTEXT_CHARS]
         context_type = "full transcript"
     else:
         # Fallback to description
         context = video.get('description', '')[:3000]
         context_type = "description only"
     
-    print(f"  📝 Using {context_type} ({len(context):,} chars)")
+    log(f"  📝 [{video_id}] Using {context_type} ({len(context):,} chars)")
     
     # 获取发布日期
     published_at = video.get('publishedAt', '')
@@ -132,6 +557,30 @@ def generate_enhanced_summary(video: dict, transcript: Optional[str], max_retrie
     else:
         date_str = ""
     
+    # Content-addressed cache lookup (covers every input of the prompt)
+    metadata = {
+        "title": video.get('title', ''),
+        "channelName": video.get('channelName', ''),
+        "durationFormatted": video.get('durationFormatted', ''),
+        "date": date_str,
+        "context_type": context_type,
+    }
+    if chunked:
+        metadata["chunk_tokens"] = CHUNK_TOKENS
+    cache_key = SummaryCache.make_key(MODEL, context, metadata)
+    if cache:
+        cached = cache.get(cache_key)
+        if cached:
+            log(f"  💾 [{video_id}] Cached summary {cache_key[:12]}")
+            return cached
+    
+    if chunked:
+        # Map: summarize every chunk concurrently; reduce below with the notes as context
+        context = summarize_chunks(video, transcript, max_retries, limiter)
+        if context is None:
+            return None
+        context_type = "chunk notes (covering the full transcript, in order)"
+    
     prompt = f"""你是一位知识密度极高的中文内容策展人，为高知人群筛选深度内容。
 
 请为以下播客生成结构化的深度摘要。
@@ -178,8 +627,21 @@ def generate_enhanced_summary(video: dict, transcript: Optional[str], max_retrie
 
 只返回 JSON，不要其他内容。"""
 
+    summary = chat_completion(prompt, video_id, max_retries, limiter)
+    if summary and cache:
+        cache.put(cache_key, summary, {"model": MODEL, "prompt_version": PROMPT_VERSION,
+                                       "videoId": video_id, "title": video.get('title', '')})
+    return summary
+
+def chat_completion(prompt: str, video_id: str, max_retries: int = 3,
+                    limiter: Optional[TokenBucket] = None) -> Optional[dict]:
+    """POST one JSON-mode chat completion and return the parsed JSON content."""
+    import urllib.request
+    import urllib.error
+    
+    api_key = load_openai_key()
     body = {
-        "model": "gpt-4o",
+        "model": MODEL,
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.7,
         "response_format": {"type": "json_object"}
@@ -192,8 +654,10 @@ def generate_enhanced_summary(video: dict, transcript: Optional[str], max_retrie
     
     # Retry with exponential backoff
     for attempt in range(max_retries):
+        if limiter:
+            limiter.acquire()
         req = urllib.request.Request(
-            "https://api.openai.com/v1/chat/completions",
+            CHAT_COMPLETIONS_URL,
             data=json.dumps(body).encode('utf-8'),
             headers=headers,
             method='POST'
@@ -206,65 +670,197 @@ def generate_enhanced_summary(video: dict, transcript: Optional[str], max_retrie
                 return json.loads(content)
         except urllib.error.HTTPError as e:
             if e.code == 429:  # Rate limit
-                wait_time = (2 ** attempt) * 15  # 15s, 30s, 60s
-                print(f"  ⏳ Rate limited, waiting {wait_time}s (attempt {attempt + 1}/{max_retries})")
+                # Honour Retry-After when the server sends one
+                retry_after = e.headers.get('Retry-After') if e.headers else None
+                try:
+                    wait_time = float(retry_after)
+                except (TypeError, ValueError):
+                    wait_time = (2 ** attempt) * 15  # 15s, 30s, 60s
+                log(f"  ⏳ [{video_id}] Rate limited, waiting {wait_time:g}s (attempt {attempt + 1}/{max_retries})")
                 time.sleep(wait_time)
                 continue
             else:
-                print(f"  ❌ GPT-4o HTTP error {e.code}: {e.reason}")
+                log(f"  ❌ [{video_id}] GPT-4o HTTP error {e.code}: {e.reason}")
                 return None
         except Exception as e:
-            print(f"  ❌ GPT-4o error: {e}")
+            log(f"  ❌ [{video_id}] GPT-4o error: {e}")
             return None
     
-    print(f"  ❌ Failed after {max_retries} retries")
+    log(f"  ❌ [{video_id}] Failed after {max_retries} retries")
     return None
 
-def process_podcasts():
-    """Process all podcasts in data.json with enhanced summaries."""
+def apply_summary(ep: dict, enhanced: dict):
+    """Copy enhanced summary fields onto an episode."""
+    ep['intro'] = enhanced.get('intro', '')  # 开篇导语（融合标题+为什么值得听+时间）
+    ep['summary_cn'] = enhanced.get('summary_cn', ep.get('summary_cn', ''))
+    ep['why_listen'] = enhanced.get('why_listen', ep.get('why_listen', ''))
+    ep['key_quotes'] = enhanced.get('key_quotes', [])
+    ep['guest_bio'] = enhanced.get('guest_bio', '')
+    ep['title_cn'] = enhanced.get('title_cn', ep.get('title_cn', ''))
+
+def verify_quotes(ep: dict, store: TranscriptStore) -> int:
+    """Check that each English key quote appears in the stored transcript; returns misses."""
+    video_id = ep.get('videoId', '')
+    if not store.has(video_id):
+        return 0
+    missing = [q.get('en', '') for q in ep.get('key_quotes', []) if not store.contains(video_id, q.get('en', ''))]
+    for quote in missing:
+        log(f"  ⚠️ [{video_id}] Quote not found in transcript: {quote[:60]}")
+    return len(missing)
+
+def atomic_write_text(path: Path, text: str):
+    """Write via temp file + fsync + rename so readers never see a partial file."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class CheckpointJournal:
+    """Per-episode checkpoint of completed summaries, keyed by videoId.
+
+    Rewritten atomically after every completed episode, so a crash or
+    Ctrl-C loses at most the episodes still in flight. Removed once
+    data.json has been saved with all results.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            self.entries = json.loads(path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, video_id: str) -> Optional[dict]:
+        entry = self.entries.get(video_id)
+        return entry['summary'] if entry else None
+
+    def record(self, video_id: str, summary: dict):
+        with self.lock:
+            self.entries[video_id] = {"summary": summary, "completed_at": time.strftime('%Y-%m-%dT%H:%M:%S')}
+            atomic_write_text(self.path, json.dumps(self.entries, ensure_ascii=False, indent=2))
+
+    def discard(self, video_ids: Iterable[str]):
+        """Drop checkpoints whose results are now saved; remove the file once empty."""
+        with self.lock:
+            for video_id in video_ids:
+                self.entries.pop(video_id, None)
+            if self.entries:
+                atomic_write_text(self.path, json.dumps(self.entries, ensure_ascii=False, indent=2))
+            else:
+                self.path.unlink(missing_ok=True)
+
+def is_completed(ep: dict) -> bool:
+    """An episode counts as done once it carries every enhanced field."""
+    return all(ep.get(field) for field in ('intro', 'summary_cn', 'key_quotes', 'guest_bio'))
+
+def process_podcasts(data_file: Path = DATA_FILE, concurrency: int = SUMMARY_WORKERS,
+                     transcript_workers: int = TRANSCRIPT_WORKERS,
+                     requests_per_minute: float = REQUESTS_PER_MINUTE, burst: int = REQUEST_BURST,
+                     cache: Optional[SummaryCache] = None, store: Optional[TranscriptStore] = None,
+                     offline: bool = False, mode: str = "auto", resume: bool = False,
+                     only: Optional[List[str]] = None):
+    """Process all podcasts in data.json with enhanced summaries.
+
+    Transcript downloads are submitted up front so they run ahead of the
+    summary workers; each summary task waits only for its own transcript.
+    Completed summaries are checkpointed to <data_file>.journal; with
+    resume=True, episodes already summarized (in the journal or in
+    data.json) are skipped. only restricts the run to the given videoIds.
+    Checkpoints of episodes outside this run are always merged into
+    data.json before it is saved, and only checkpoints that made it into
+    the saved file are removed from the journal.
+    """
     
-    if not DATA_FILE.exists():
-        print(f"❌ Data file not found: {DATA_FILE}")
+    if not data_file.exists():
+        print(f"❌ Data file not found: {data_file}")
         sys.exit(1)
     
-    data = json.loads(DATA_FILE.read_text())
+    data = json.loads(data_file.read_text())
     episodes = data.get('episodes', [])
+    journal = CheckpointJournal(data_file.with_name(data_file.name + '.journal'))
     
-    print(f"📡 Processing {len(episodes)} podcasts with enhanced summaries...\n")
-    
-    for i, ep in enumerate(episodes, 1):
+    # Decide which episodes still need work; checkpoints of episodes this run
+    # does not redo are merged now so the save below keeps them
+    todo = []
+    merged = []
+    for ep in episodes:
         video_id = ep.get('videoId', '')
-        title = ep.get('title', '')[:50]
-        print(f"[{i}/{len(episodes)}] {title}...")
-        
-        # Download transcript
-        transcript = download_transcript(video_id)
-        
-        # Generate enhanced summary
-        enhanced = generate_enhanced_summary(ep, transcript)
-        
-        if enhanced:
-            # Update episode with enhanced data
-            ep['intro'] = enhanced.get('intro', '')  # 开篇导语（融合标题+为什么值得听+时间）
-            ep['summary_cn'] = enhanced.get('summary_cn', ep.get('summary_cn', ''))
-            ep['why_listen'] = enhanced.get('why_listen', ep.get('why_listen', ''))
-            ep['key_quotes'] = enhanced.get('key_quotes', [])
-            ep['guest_bio'] = enhanced.get('guest_bio', '')
-            ep['title_cn'] = enhanced.get('title_cn', ep.get('title_cn', ''))
-            print(f"  ✅ Enhanced ({len(ep['summary_cn'])} chars)")
-        else:
-            print(f"  ⚠️ Keeping original summary")
-        
-        print()
-        
-        # Delay between podcasts to avoid rate limits
-        if i < len(episodes):
-            import time
-            time.sleep(5)
+        in_scope = not only or video_id in only
+        checkpoint = journal.get(video_id)
+        if checkpoint and (resume or not in_scope):
+            apply_summary(ep, checkpoint)
+            merged.append(video_id)
+            continue
+        if not in_scope or (resume and is_completed(ep)):
+            continue
+        todo.append(ep)
+    skipped = len(episodes) - len(todo)
+    if merged:
+        print(f"♻️ Merged {len(merged)} checkpointed summaries from {journal.path.name}")
+    
+    print(f"📡 Processing {len(todo)} podcasts with enhanced summaries"
+          f"{f' ({skipped} skipped)' if skipped else ''} "
+          f"(concurrency={concurrency}, transcripts={transcript_workers}, rpm={requests_per_minute:g})...\n")
     
-    # Save updated data
-    DATA_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2))
-    print(f"💾 Saved to {DATA_FILE}")
+    limiter = TokenBucket(requests_per_minute, burst)
+    started = time.monotonic()
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, transcript_workers)) as transcript_pool, \
+             ThreadPoolExecutor(max_workers=max(1, concurrency)) as summary_pool:
+            # Single-request summaries only use the first MAX_CONTEXT_CHARS; auto and
+            # chunked need the full length to decide / map over every chunk.
+            max_chars = MAX_CONTEXT_CHARS if mode == "single" else None
+            transcripts = [transcript_pool.submit(download_transcript, ep.get('videoId', ''), store=store,
+                                                  offline=offline, max_chars=max_chars)
+                           for ep in todo]
+            
+            def summarize(ep, transcript_future):
+                enhanced = generate_enhanced_summary(ep, transcript_future.result(), limiter=limiter,
+                                                     cache=cache, mode=mode)
+                if enhanced:
+                    journal.record(ep.get('videoId', ''), enhanced)
+                return enhanced
+            
+            summaries = [summary_pool.submit(summarize, ep, tf) for ep, tf in zip(todo, transcripts)]
+            
+            # Apply results in episode order so data.json stays deterministic
+            try:
+                for i, (ep, future) in enumerate(zip(todo, summaries), 1):
+                    title = ep.get('title', '')[:50]
+                    try:
+                        enhanced = future.result()
+                    except Exception as e:
+                        log(f"  ❌ [{ep.get('videoId', '')}] Pipeline error: {e}")
+                        enhanced = None
+                
+                    if enhanced:
+                        apply_summary(ep, enhanced)
+                        merged.append(ep.get('videoId', ''))
+                        log(f"[{i}/{len(todo)}] ✅ {title} ({len(ep['summary_cn'])} chars)")
+                        if store:
+                            verify_quotes(ep, store)
+                    else:
+                        log(f"[{i}/{len(todo)}] ⚠️ {title}: keeping original summary")
+            except KeyboardInterrupt:
+                # Drop queued work; in-flight summaries still finish and get checkpointed
+                transcript_pool.shutdown(wait=False, cancel_futures=True)
+                summary_pool.shutdown(wait=False, cancel_futures=True)
+                raise
+    except KeyboardInterrupt:
+        print(f"\n⏹️ Interrupted: {len(journal.entries)} completed summaries kept in {journal.path}")
+        print("   Re-run with --resume to continue")
+        raise
+    
+    # Save updated data, then drop the checkpoints that are now in data.json
+    atomic_write_text(data_file, json.dumps(data, ensure_ascii=False, indent=2))
+    journal.discard(merged)
+    print(f"\n💾 Saved to {data_file} ({time.monotonic() - started:.1f}s)")
+    if cache:
+        print(f"   Summary cache: {cache.hits} hits, {cache.misses} misses")
     
     # Show summary
     print("\n📊 Summary:")
@@ -273,5 +869,41 @@ def process_podcasts():
         has_quotes = '✓' if ep.get('key_quotes') else '✗'
         print(f"  [{ep.get('domain', '?')}] {ep.get('title_cn', '')[:30]}... ({summary_len} chars, quotes: {has_quotes})")
 
+def main():
+    parser = argparse.ArgumentParser(description="Generate enhanced podcast summaries")
+    parser.add_argument('--data-file', type=Path, default=DATA_FILE, help="podcast data.json to update")
+    parser.add_argument('--concurrency', type=int, default=SUMMARY_WORKERS, help="concurrent GPT-4o requests")
+    parser.add_argument('--transcript-workers', type=int, default=TRANSCRIPT_WORKERS, help="concurrent transcript downloads")
+    parser.add_argument('--rpm', type=float, default=REQUESTS_PER_MINUTE, help="GPT-4o requests per minute")
+    parser.add_argument('--burst', type=int, default=REQUEST_BURST, help="requests allowed in a burst")
+    parser.add_argument('--no-cache', action='store_true', help="always call the API, ignore the summary cache")
+    parser.add_argument('--offline', action='store_true', help="use stored transcripts only, never download")
+    parser.add_argument('--summary-mode', choices=['auto', 'single', 'chunked'], default='auto',
+                        help="single request (truncated), map-reduce over chunks, or auto (chunked when too long)")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip episodes already summarized (checkpoint journal or data.json)")
+    parser.add_argument('--only', action='append', metavar='VIDEO_ID', help="only process this videoId (repeatable)")
+    subparsers = parser.add_subparsers(dest='command')
+    cache_parser = subparsers.add_parser('cache', help="inspect the summary cache")
+    cache_parser.add_argument('action', choices=['list', 'show', 'stats', 'prune', 'clear'])
+    cache_parser.add_argument('key', nargs='?', help="key prefix (for show)")
+    cache_parser.add_argument('--max-entries', type=int, help="entries to keep (for prune)")
+    transcripts_parser = subparsers.add_parser('transcripts', help="inspect the local transcript store")
+    transcripts_parser.add_argument('action', choices=['list', 'stats', 'search'])
+    transcripts_parser.add_argument('pattern', nargs='?', help="regex to search for (for search)")
+    args = parser.parse_args()
+    
+    if args.command == 'cache':
+        return cache_command(args)
+    if args.command == 'transcripts':
+        return transcripts_command(args)
+    
+    cache = None if args.no_cache else SummaryCache()
+    process_podcasts(args.data_file, concurrency=args.concurrency, transcript_workers=args.transcript_workers,
+                     requests_per_minute=args.rpm, burst=args.burst, cache=cache,
+                     store=TranscriptStore(), offline=args.offline, mode=args.summary_mode,
+                     resume=args.resume, only=args.only)
+    return 0
+
 if __name__ == "__main__":
-    process_podcasts()
+    sys.exit(main())
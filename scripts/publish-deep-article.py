@@ -2,10 +2,33 @@
 """
 发布深度编译文章到微信公众号草稿箱
 支持 Markdown 转换为微信 HTML 格式
+
+渲染结果（完整 HTML + 封面 PNG）缓存在 data/render-cache/，键为稿件内容、
+样式主题版本（STYLES_VERSION + STYLES 摘要）和投票参数的哈希；
+稿件未改动时重跑（例如 token 失败后重试）跳过全部本地渲染。
+    --no-cache  不读写渲染缓存
+
+上传过的图片记录在 data/wechat-media-index.json（图片 SHA-256 → 永久素材 media_id），
+相同图片再次上传时直接复用，不发网络请求、不占素材配额。
+    python3 scripts/publish-deep-article.py media list      列出索引
+    python3 scripts/publish-deep-article.py media verify    与公众号素材库核对，报告失效条目
+    python3 scripts/publish-deep-article.py media cleanup   核对并删除失效条目
+
+access_token 缓存在 data/wechat-token.json（按 API 地址 + AppID 区分），多个进程共用：
+距过期不到 TOKEN_REFRESH_AHEAD 秒时由抢到锁的一个进程提前刷新，其余进程继续用旧 token；
+已过期时所有进程在同一把锁上排队，只有第一个请求 cgi-bin/token。
+
+MOT_WECHAT_API_BASE 可指向本地替身（scripts/bench-wechat-publish.py serve）离线测试。
 """
+import fcntl
+import hashlib
+import io
 import json
+import mimetypes
 import os
+import shutil
 import sys
+import threading
 import time
 import urllib.request
 import urllib.parse
@@ -13,9 +36,289 @@ import re
 from pathlib import Path
 from datetime import datetime
 
+# 路径配置
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+RENDER_CACHE_DIR = PROJECT_DIR / "data" / "render-cache"
+MEDIA_INDEX_FILE = PROJECT_DIR / "data" / "wechat-media-index.json"
+TOKEN_CACHE_FILE = PROJECT_DIR / "data" / "wechat-token.json"
+
+# 微信 API
+WECHAT_API_BASE = os.environ.get('MOT_WECHAT_API_BASE', 'https://api.weixin.qq.com').rstrip('/')
+MATERIAL_PAGE_SIZE = 20         # batchget_material 每页最多 20 条
+TOKEN_REFRESH_AHEAD = 600       # 距过期不到 10 分钟时提前刷新（其余进程不等待）
+TOKEN_EXPIRY_MARGIN = 60        # 距过期不到 1 分钟视为已过期（必须等刷新完成）
+INVALID_TOKEN_ERRCODES = (40001, 40014, 42001)  # token 无效 / 已过期：作废缓存后重试一次
+UPLOAD_CHUNK_SIZE = 64 * 1024   # 上传图片时每次读取、发送的字节数
+UPLOAD_TIMEOUT = 30             # 单次 socket 读写超时（秒），大图按块发送不受总时长限制
+
+# 图片文件头 → Content-Type（扩展名不可靠时以文件内容为准）
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+
+# 渲染缓存参数
+RENDER_CACHE_MAX_ENTRIES = 50   # 超出后按最近使用时间淘汰（每条约含一张封面 PNG）
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def detect_content_type(path):
+    """按文件头判断图片类型，识别不了时按扩展名猜，都不行则为 application/octet-stream"""
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return mimetypes.guess_type(str(path))[0] or 'application/octet-stream'
+
+
+class MultipartFile:
+    """单个文件字段的 multipart/form-data 请求体，按块从磁盘读取，不在内存中拼整个文件
+
+    可直接作为 urllib 的 data 传入（迭代对象 + 显式 Content-Length）；
+    progress(sent, total) 在每块发出后调用。
+    """
+
+    def __init__(self, path, field='media', filename=None, content_type=None,
+                 chunk_size=UPLOAD_CHUNK_SIZE, progress=None):
+        self.path = Path(path)
+        self.boundary = f'----MindOurTimes{os.urandom(12).hex()}'
+        self.content_type = content_type or detect_content_type(self.path)
+        name = (filename or self.path.name).replace('"', '%22')
+        self.head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{name}"\r\n'
+            f'Content-Type: {self.content_type}\r\n\r\n'
+        ).encode('utf-8')
+        self.tail = f'\r\n--{self.boundary}--\r\n'.encode()
+        self.file_size = self.path.stat().st_size
+        self.length = len(self.head) + self.file_size + len(self.tail)
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.sent = 0
+
+    @property
+    def headers(self):
+        return {'Content-Type': f'multipart/form-data; boundary={self.boundary}',
+                'Content-Length': str(self.length)}
+
+    def _emit(self, chunk):
+        self.sent += len(chunk)
+        if self.progress:
+            self.progress(self.sent, self.length)
+        return chunk
+
+    def __iter__(self):
+        self.sent = 0
+        yield self._emit(self.head)
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                yield self._emit(chunk)
+        yield self._emit(self.tail)
+
+
+class TokenCache:
+    """进程间共享的 access_token 缓存（JSON 文件 + fcntl 锁，锁文件为 .<name>.lock）
+
+    get() 先无锁读文件；token 进入提前刷新窗口时非阻塞地抢锁，抢到的进程刷新，
+    抢不到说明别人在刷新，直接返回仍然有效的旧 token；token 已过期时阻塞等锁，
+    拿到锁后重读文件，别人刚刷新过就不再请求（single-flight）。
+    """
+
+    def __init__(self, path=TOKEN_CACHE_FILE, refresh_ahead=TOKEN_REFRESH_AHEAD,
+                 expiry_margin=TOKEN_EXPIRY_MARGIN, clock=time.time):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(f".{self.path.name}.lock")
+        self.refresh_ahead = refresh_ahead
+        self.expiry_margin = expiry_margin
+        self.clock = clock
+        self.thread_lock = threading.Lock()  # flock 只在进程之间互斥，同进程内的线程另加一把
+        self.fetches = 0
+
+    def _read(self, key):
+        try:
+            return json.loads(self.path.read_text()).get(key)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key, entry):
+        try:
+            tokens = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            tokens = {}
+        now = self.clock()
+        tokens = {k: v for k, v in tokens.items() if v.get('expires_at', 0) > now}
+        if entry is None:
+            tokens.pop(key, None)
+        else:
+            tokens[key] = entry
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(tokens, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _state(self, entry):
+        """'fresh' / 'refresh'（仍可用但该刷新了）/ 'expired'"""
+        if not entry:
+            return 'expired'
+        remaining = entry['expires_at'] - self.clock()
+        if remaining <= self.expiry_margin:
+            return 'expired'
+        return 'refresh' if remaining <= self.refresh_ahead else 'fresh'
+
+    def get(self, key, fetch):
+        """返回 key 的有效 token；需要时调用 fetch() -> (token, expires_in) 刷新"""
+        entry = self._read(key)
+        state = self._state(entry)
+        if state == 'fresh':
+            return entry['token']
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        blocking = state == 'expired'
+        if not self.thread_lock.acquire(blocking=blocking):
+            return entry['token']
+        try:
+            with open(self.lock_path, 'a') as lock:
+                try:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    return entry['token']
+                try:
+                    # 等锁期间可能已有别的进程刷新过
+                    entry = self._read(key)
+                    if self._state(entry) == 'fresh':
+                        return entry['token']
+                    try:
+                        token, expires_in = fetch()
+                    except Exception:
+                        # 提前刷新失败不影响使用旧 token
+                        if self._state(entry) != 'expired':
+                            return entry['token']
+                        raise
+                    self.fetches += 1
+                    now = self.clock()
+                    self._write(key, {"token": token, "fetched_at": now, "expires_at": now + expires_in})
+                    return token
+                finally:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+        finally:
+            self.thread_lock.release()
+
+    def invalidate(self, key, token):
+        """接口报 token 无效时作废缓存；只删仍是这个 token 的条目，不误删别人刚刷新的"""
+        with self.thread_lock, open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                entry = self._read(key)
+                if entry and entry['token'] == token:
+                    self._write(key, None)
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+class MediaIndex:
+    """图片 SHA-256 → 永久素材 media_id 的本地索引
+
+    条目：{media_id, url, filename, size, uploaded_at, last_used}。
+    写入与 TokenCache 一样在 fcntl 锁（.<name>.lock）内进行：重读磁盘上的索引，
+    并入本进程的新增 / 删除 / last_used 更新后原子替换，并发发布不会互相覆盖条目。
+    命中只在内存里记下 last_used，由调用方在发布结束时 flush() 一次写回。
+    """
+
+    def __init__(self, path=MEDIA_INDEX_FILE):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(f".{self.path.name}.lock")
+        self.thread_lock = threading.Lock()  # flock 只在进程之间互斥，同进程内的线程另加一把
+        self.hits = 0
+        self.misses = 0
+        self.images = self._load()
+        self._recorded, self._removed, self._touched = {}, set(), {}
+
+    def _load(self):
+        try:
+            return json.loads(self.path.read_text()).get('images', {})
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        """把本进程未写回的改动并入磁盘上的索引"""
+        if not (self._recorded or self._removed or self._touched):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.thread_lock, open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                images = self._load()
+                images.update(self._recorded)
+                for digest in self._removed:
+                    images.pop(digest, None)
+                for digest, used in self._touched.items():
+                    if digest in images and images[digest].get('last_used', '') < used:
+                        images[digest]['last_used'] = used
+                tmp = self.path.with_name(f".{self.path.name}.tmp")
+                with open(tmp, 'w') as f:
+                    json.dump({"images": images}, f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+                self.images = images
+                self._recorded, self._removed, self._touched = {}, set(), {}
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def lookup(self, digest):
+        entry = self.images.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry['last_used'] = self._touched[digest] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        return entry
+
+    def record(self, digest, media_id, **info):
+        """记下新上传的素材并立即写回（素材已在服务端，不能因进程退出而丢失）"""
+        now = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.images[digest] = self._recorded[digest] = {"media_id": media_id, **info,
+                                                        "uploaded_at": now, "last_used": now}
+        self._removed.discard(digest)
+        self.flush()
+
+    def stale(self, live_media_ids):
+        """素材库里已不存在的条目：[(digest, entry)]"""
+        return [(digest, entry) for digest, entry in self.images.items()
+                if entry['media_id'] not in live_media_ids]
+
+    def remove(self, digests):
+        for digest in digests:
+            self.images.pop(digest, None)
+            self._recorded.pop(digest, None)
+            self._touched.pop(digest, None)
+            self._removed.add(digest)
+        self.flush()
+
+
 class WeChatPublisher:
-    def __init__(self):
-        self.appid, self.appsecret = self.load_credentials()
+    def __init__(self, api_base=WECHAT_API_BASE, media_index=None, credentials=None, token_cache=None):
+        self.api_base = api_base
+        self.appid, self.appsecret = credentials or self.load_credentials()
+        self.media_index = media_index
+        self.token_cache = token_cache
+        self.last_upload = None
         self.access_token = None
         self.token_expires_at = 0
     
@@ -30,36 +333,95 @@ class WeChatPublisher:
                 appsecret = line.split(':', 1)[1].strip()
         return appid, appsecret
     
+    def fetch_access_token(self):
+        """请求 cgi-bin/token，返回 (token, expires_in)"""
+        url = f"{self.api_base}/cgi-bin/token?grant_type=client_credential&appid={self.appid}&secret={self.appsecret}"
+        resp = urllib.request.urlopen(url, timeout=10)
+        result = json.loads(resp.read())
+        if 'access_token' not in result:
+            raise RuntimeError(f"cgi-bin/token failed: {result.get('errcode')} {result.get('errmsg', '')}")
+        return result['access_token'], result['expires_in']
+    
     def get_access_token(self):
         if self.access_token and time.time() < self.token_expires_at:
             return self.access_token
-        url = f"https://api.weixin.qq.com/cgi-bin/token?grant_type=client_credential&appid={self.appid}&secret={self.appsecret}"
-        resp = urllib.request.urlopen(url, timeout=10)
-        result = json.loads(resp.read())
-        self.access_token = result['access_token']
-        self.token_expires_at = time.time() + result['expires_in'] - 300
+        if self.token_cache is not None:
+            # 共享缓存自己决定何时刷新；实例上只记一小段时间，避免每个请求都读文件
+            self.access_token = self.token_cache.get(f"{self.api_base}|{self.appid}", self.fetch_access_token)
+            self.token_expires_at = time.time() + TOKEN_EXPIRY_MARGIN
+            return self.access_token
+        self.access_token, expires_in = self.fetch_access_token()
+        self.token_expires_at = time.time() + expires_in - 300
         return self.access_token
     
-    def upload_image(self, image_path):
+    def invalidate_access_token(self, token):
+        self.access_token = None
+        self.token_expires_at = 0
+        if self.token_cache is not None:
+            self.token_cache.invalidate(f"{self.api_base}|{self.appid}", token)
+    
+    def post_json(self, path, payload, timeout=30, retry_invalid_token=True):
         token = self.get_access_token()
-        url = f"https://api.weixin.qq.com/cgi-bin/material/add_material?access_token={token}&type=image"
-        with open(image_path, 'rb') as f:
-            image_data = f.read()
-        boundary = '----WebKitFormBoundary7MA4YWxkTrZu0gW'
-        body = (
-            f'--{boundary}\r\n'
-            f'Content-Disposition: form-data; name="media"; filename="cover.png"\r\n'
-            f'Content-Type: image/png\r\n\r\n'
-        ).encode() + image_data + f'\r\n--{boundary}--\r\n'.encode()
-        req = urllib.request.Request(url, data=body, 
-            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}, method='POST')
-        resp = urllib.request.urlopen(req, timeout=30)
+        req = urllib.request.Request(f"{self.api_base}{path}?access_token={token}",
+            data=json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST')
+        resp = urllib.request.urlopen(req, timeout=timeout)
         result = json.loads(resp.read())
+        if result.get('errcode') in INVALID_TOKEN_ERRCODES and retry_invalid_token:
+            self.invalidate_access_token(token)
+            return self.post_json(path, payload, timeout, retry_invalid_token=False)
+        if result.get('errcode'):
+            raise RuntimeError(f"{path} failed: {result.get('errcode')} {result.get('errmsg', '')}")
+        return result
+    
+    def upload_image(self, image_path, progress=None):
+        """上传永久图片素材；索引里已有同样内容的图片时直接返回其 media_id
+
+        请求体按块流式发送，文件名和 Content-Type 取自实际文件；
+        progress(sent, total) 报告进度，耗时与速率记在 self.last_upload。
+        """
+        digest = None
+        if self.media_index is not None:
+            digest = file_sha256(image_path)
+            entry = self.media_index.lookup(digest)
+            if entry:
+                return entry['media_id']
+        body = MultipartFile(image_path, progress=progress)
+        started = time.monotonic()
+        for attempt in range(2):
+            token = self.get_access_token()
+            url = f"{self.api_base}/cgi-bin/material/add_material?access_token={token}&type=image"
+            req = urllib.request.Request(url, data=body, headers=body.headers, method='POST')
+            resp = urllib.request.urlopen(req, timeout=UPLOAD_TIMEOUT)
+            result = json.loads(resp.read())
+            if result.get('errcode') not in INVALID_TOKEN_ERRCODES or attempt:
+                break
+            self.invalidate_access_token(token)
+        elapsed = time.monotonic() - started
+        self.last_upload = {"bytes": body.length, "content_type": body.content_type,
+                            "elapsed": elapsed, "rate": body.length / elapsed if elapsed else 0}
+        if 'media_id' not in result:
+            raise RuntimeError(f"add_material failed: {result.get('errcode')} {result.get('errmsg', '')}")
+        if digest is not None:
+            self.media_index.record(digest, result['media_id'], url=result.get('url', ''),
+                                    filename=body.path.name, size=body.file_size,
+                                    content_type=body.content_type)
         return result['media_id']
     
+    def list_image_materials(self):
+        """翻页列出素材库中全部永久图片素材的 media_id"""
+        media_ids = set()
+        offset = 0
+        while True:
+            result = self.post_json('/cgi-bin/material/batchget_material',
+                                    {"type": "image", "offset": offset, "count": MATERIAL_PAGE_SIZE})
+            items = result.get('item', [])
+            media_ids.update(item['media_id'] for item in items)
+            offset += len(items)
+            if not items or offset >= result.get('total_count', 0):
+                return media_ids
+    
     def add_draft(self, articles, thumb_media_id):
-        token = self.get_access_token()
-        url = f"https://api.weixin.qq.com/cgi-bin/draft/add?access_token={token}"
         news_items = []
         for article in articles:
             item = {
@@ -74,117 +436,308 @@ class WeChatPublisher:
                 "show_cover_pic": 0
             }
             news_items.append(item)
-        payload = {"articles": news_items}
-        req = urllib.request.Request(url,
-            data=json.dumps(payload, ensure_ascii=False).encode('utf-8'),
-            headers={'Content-Type': 'application/json'}, method='POST')
-        resp = urllib.request.urlopen(req, timeout=30)
-        result = json.loads(resp.read())
+        result = self.post_json('/cgi-bin/draft/add', {"articles": news_items})
         return result['media_id']
 
 
-def markdown_to_wechat_html(md_content, vote_url=None, vote_question=None):
-    """Convert markdown to WeChat-compatible HTML"""
-    
-    # 定义样式
-    STYLES = {
-        'h1': 'font-size: 22px; font-weight: bold; color: #1a1a1a; margin: 30px 0 20px 0; line-height: 1.4;',
-        'h2': 'font-size: 18px; font-weight: bold; color: #2c3e50; margin: 28px 0 15px 0; line-height: 1.4; border-bottom: 1px solid #eee; padding-bottom: 8px;',
-        'h3': 'font-size: 16px; font-weight: bold; color: #34495e; margin: 20px 0 12px 0;',
-        'p': 'font-size: 16px; color: #333; line-height: 1.8; margin: 16px 0; text-align: justify;',
-        'strong': 'font-weight: bold; color: #1a1a1a;',
-        'blockquote': 'border-left: 3px solid #3498db; padding: 12px 20px; margin: 20px 0; background: #f8f9fa; color: #555; font-style: italic;',
-        'li': 'font-size: 16px; color: #333; line-height: 1.8; margin: 8px 0;',
-        'hr': 'border: none; border-top: 1px solid #ddd; margin: 30px 0;',
-        'a': 'color: #3498db; text-decoration: none;',
-    }
-    
-    lines = md_content.split('\n')
-    html_parts = []
-    in_blockquote = False
-    in_list = False
+# 样式主题版本：修改 STYLES 以外的外观（外层包装、投票区块、封面、渲染规则）时递增，
+# 使旧的渲染缓存失效；STYLES 本身的改动由其摘要自动区分
+STYLES_VERSION = 1
+
+# 微信文章样式（内联 style，公众号不支持外部 CSS）
+STYLES = {
+    'h1': 'font-size: 22px; font-weight: bold; color: #1a1a1a; margin: 30px 0 20px 0; line-height: 1.4;',
+    'h2': 'font-size: 18px; font-weight: bold; color: #2c3e50; margin: 28px 0 15px 0; line-height: 1.4; border-bottom: 1px solid #eee; padding-bottom: 8px;',
+    'h3': 'font-size: 16px; font-weight: bold; color: #34495e; margin: 20px 0 12px 0;',
+    'p': 'font-size: 16px; color: #333; line-height: 1.8; margin: 16px 0; text-align: justify;',
+    'strong': 'font-weight: bold; color: #1a1a1a;',
+    'blockquote': 'border-left: 3px solid #3498db; padding: 12px 20px; margin: 20px 0; background: #f8f9fa; color: #555; font-style: italic;',
+    'li': 'font-size: 16px; color: #333; line-height: 1.8; margin: 8px 0;',
+    'hr': 'border: none; border-top: 1px solid #ddd; margin: 30px 0;',
+    'a': 'color: #3498db; text-decoration: none;',
+    'list': 'padding-left: 20px; margin: 16px 0;',
+    'strong_inline': 'font-weight:bold;',   # 列表项和引用中的加粗
+}
+
+# 预先拼好的标签，渲染时只做字符串拼接
+OPEN_TAG = {name: f'<{name} style="{STYLES[name]}">' for name in ('h1', 'h2', 'h3', 'p', 'blockquote', 'li')}
+OPEN_TAG['ul'] = f'<ul style="{STYLES["list"]}">'
+OPEN_TAG['ol'] = f'<ol style="{STYLES["list"]}">'
+HR_TAG = f'<hr style="{STYLES["hr"]}">'
+STRONG_TAG = f'<strong style="{STYLES["strong"]}">'
+STRONG_INLINE_TAG = f'<strong style="{STYLES["strong_inline"]}">'
+LINK_TAG = f'<a style="{STYLES["a"]}" href="'
+
+# 块级：一次匹配判断行类型（作用于去掉首尾空白后的行）
+BLOCK_PATTERN = re.compile(r'(?P<hr>---$)|(?P<quote>>)|(?P<ul>- )|(?P<ol>\d+\. )|(?P<h>#{1,3} )')
+# 行内：加粗 / 链接 / 斜体，一次从左到右扫描；加粗和链接文字内部递归处理
+INLINE_PATTERN = re.compile(r'\*\*(?P<bold>.+?)\*\*|\[(?P<text>.+?)\]\((?P<href>.+?)\)|\*(?P<em>[^*]+)\*')
+BOLD_PATTERN = re.compile(r'\*\*(.+?)\*\*')
+
+VOTE_SECTION = '''
+<section style="margin: 40px 0; padding: 24px; background: linear-gradient(135deg, #fafafa 0%, #f5f5f5 100%); border-radius: 8px; text-align: center;">
+    <p style="font-size: 14px; color: #666; margin: 0 0 12px 0; letter-spacing: 0.1em;">📊 今日之问</p>
+    <p style="font-size: 18px; font-weight: bold; color: #1a1a1a; margin: 0 0 20px 0; line-height: 1.5;">{vote_question}</p>
+    <a href="{vote_url}" style="display: inline-block; padding: 12px 32px; background: #1a1a1a; color: white; text-decoration: none; border-radius: 4px; font-size: 15px;">参与投票 →</a>
+    <p style="font-size: 12px; color: #999; margin: 16px 0 0 0;">投票后查看实时结果</p>
+</section>
+'''
+
+
+def _inline_match(m):
+    if m.group('bold') is not None:
+        return STRONG_TAG + render_inline(m.group('bold')) + '</strong>'
+    if m.group('href') is not None:
+        return LINK_TAG + m.group('href') + '">' + render_inline(m.group('text')) + '</a>'
+    return '<em>' + render_inline(m.group('em')) + '</em>'
+
+
+def render_inline(text):
+    """段落内的加粗、链接、斜体"""
+    if '*' not in text and '[' not in text:
+        return text
+    return INLINE_PATTERN.sub(_inline_match, text)
+
+
+def render_bold(text):
+    """列表项和引用只处理加粗"""
+    if '**' not in text:
+        return text
+    return BOLD_PATTERN.sub(lambda m: STRONG_INLINE_TAG + m.group(1) + '</strong>', text)
+
+
+def render_markdown(lines, write):
+    """把 Markdown 行逐块渲染为微信 HTML，每个块调用一次 write(html)
+
+    lines 可以是字符串或任意按行迭代的对象（如打开的文件）；块之间由调用方决定分隔符。
+    列表在遇到任何非列表的非空行、分隔线或文档结尾时输出；有序 / 无序切换时另起一个列表。
+    """
+    if isinstance(lines, str):
+        lines = lines.split('\n')
+    list_kind = None
     list_items = []
-    
+
+    def flush_list():
+        nonlocal list_kind
+        if list_kind:
+            write(OPEN_TAG[list_kind] + ''.join(list_items) + f'</{list_kind}>')
+            list_items.clear()
+            list_kind = None
+
     for line in lines:
         stripped = line.strip()
-        
-        # 处理分隔线
-        if stripped == '---':
-            if in_list:
-                html_parts.append(f'<ul style="padding-left: 20px; margin: 16px 0;">{"".join(list_items)}</ul>')
-                list_items = []
-                in_list = False
-            html_parts.append(f'<hr style="{STYLES["hr"]}">')
+        if not stripped:
             continue
-        
-        # 处理引用块
-        if stripped.startswith('>'):
-            quote_text = stripped[1:].strip()
-            # 处理引用中的加粗
-            quote_text = re.sub(r'\*\*(.+?)\*\*', r'<strong style="font-weight:bold;">\1</strong>', quote_text)
-            html_parts.append(f'<blockquote style="{STYLES["blockquote"]}">{quote_text}</blockquote>')
-            continue
-        
-        # 处理列表
-        if stripped.startswith('- ') or re.match(r'^\d+\. ', stripped):
-            in_list = True
-            if stripped.startswith('- '):
-                item_text = stripped[2:]
-            else:
-                item_text = re.sub(r'^\d+\. ', '', stripped)
-            # 处理加粗
-            item_text = re.sub(r'\*\*(.+?)\*\*', r'<strong style="font-weight:bold;">\1</strong>', item_text)
-            list_items.append(f'<li style="{STYLES["li"]}">{item_text}</li>')
-            continue
-        elif in_list and stripped:
-            html_parts.append(f'<ul style="padding-left: 20px; margin: 16px 0;">{"".join(list_items)}</ul>')
-            list_items = []
-            in_list = False
-        
-        # 处理标题
-        if stripped.startswith('# '):
-            text = stripped[2:]
-            html_parts.append(f'<h1 style="{STYLES["h1"]}">{text}</h1>')
-            continue
-        elif stripped.startswith('## '):
-            text = stripped[3:]
-            html_parts.append(f'<h2 style="{STYLES["h2"]}">{text}</h2>')
-            continue
-        elif stripped.startswith('### '):
-            text = stripped[4:]
-            html_parts.append(f'<h3 style="{STYLES["h3"]}">{text}</h3>')
+        m = BLOCK_PATTERN.match(stripped)
+        kind = m.lastgroup if m else None
+
+        if kind in ('ul', 'ol'):
+            if list_kind != kind:
+                flush_list()
+                list_kind = kind
+            item = stripped[m.end():]
+            list_items.append(OPEN_TAG['li'] + render_bold(item) + '</li>')
             continue
-        
-        # 处理普通段落
-        if stripped:
-            # 处理加粗
-            text = re.sub(r'\*\*(.+?)\*\*', rf'<strong style="{STYLES["strong"]}">\1</strong>', stripped)
-            # 处理链接
-            text = re.sub(r'\[(.+?)\]\((.+?)\)', rf'<a style="{STYLES["a"]}" href="\2">\1</a>', text)
-            # 处理斜体
-            text = re.sub(r'\*([^*]+)\*', r'<em>\1</em>', text)
-            html_parts.append(f'<p style="{STYLES["p"]}">{text}</p>')
-    
-    # 处理剩余列表
-    if list_items:
-        html_parts.append(f'<ul style="padding-left: 20px; margin: 16px 0;">{"".join(list_items)}</ul>')
-    
+        flush_list()
+
+        if kind == 'hr':
+            write(HR_TAG)
+        elif kind == 'quote':
+            write(OPEN_TAG['blockquote'] + render_bold(stripped[1:].strip()) + '</blockquote>')
+        elif kind == 'h':
+            level = f'h{m.end() - 1}'
+            write(OPEN_TAG[level] + stripped[m.end():] + f'</{level}>')
+        else:
+            write(OPEN_TAG['p'] + render_inline(stripped) + '</p>')
+    flush_list()
+
+
+def markdown_to_wechat_html(md_content, vote_url=None, vote_question=None, out=None):
+    """Convert markdown to WeChat-compatible HTML
+
+    out 为可写文本流时直接流式写入并返回 None；否则返回拼好的字符串。
+    """
+    buffer = out if out is not None else io.StringIO()
+    first = True
+
+    def write(block):
+        nonlocal first
+        if not first:
+            buffer.write('\n')
+        buffer.write(block)
+        first = False
+
+    render_markdown(md_content, write)
     # 添加投票区块
     if vote_url and vote_question:
-        vote_section = f'''
-<section style="margin: 40px 0; padding: 24px; background: linear-gradient(135deg, #fafafa 0%, #f5f5f5 100%); border-radius: 8px; text-align: center;">
-    <p style="font-size: 14px; color: #666; margin: 0 0 12px 0; letter-spacing: 0.1em;">📊 今日之问</p>
-    <p style="font-size: 18px; font-weight: bold; color: #1a1a1a; margin: 0 0 20px 0; line-height: 1.5;">{vote_question}</p>
-    <a href="{vote_url}" style="display: inline-block; padding: 12px 32px; background: #1a1a1a; color: white; text-decoration: none; border-radius: 4px; font-size: 15px;">参与投票 →</a>
-    <p style="font-size: 12px; color: #999; margin: 16px 0 0 0;">投票后查看实时结果</p>
+        write(VOTE_SECTION.format(vote_url=vote_url, vote_question=vote_question))
+    return None if out is not None else buffer.getvalue()
+
+
+ARTICLE_WRAPPER = '''
+<section style="padding: 0; margin: 0; background: #fff;">
+    <p style="text-align: center; color: #999; font-size: 13px; margin: 0 0 20px 0; letter-spacing: 0.1em;">MIND OUR TIMES</p>
+    {html_content}
+    <section style="margin-top: 40px; padding-top: 20px; border-top: 1px solid #eee; text-align: center;">
+        <p style="font-size: 13px; color: #999; margin: 0;">追踪时代思想脉搏</p>
+    </section>
 </section>
 '''
-        html_parts.append(vote_section)
-    
-    return '\n'.join(html_parts)
+
+
+def render_article(md_content, vote_url=None, vote_question=None):
+    """正文 HTML 外加 MIND OUR TIMES 页眉页脚"""
+    html_content = markdown_to_wechat_html(md_content, vote_url, vote_question)
+    return ARTICLE_WRAPPER.format(html_content=html_content)
+
+
+def render_cover(title, cover_path):
+    """用 PIL 生成 900x500 封面；PIL 未安装时返回 False"""
+    try:
+        from PIL import Image, ImageDraw, ImageFont
+    except ImportError:
+        return False
+    img = Image.new('RGB', (900, 500), color='#1a1a1a')
+    draw = ImageDraw.Draw(img)
+    try:
+        font_large = ImageFont.truetype('/System/Library/Fonts/PingFang.ttc', 36)
+        font_small = ImageFont.truetype('/System/Library/Fonts/PingFang.ttc', 20)
+    except:
+        font_large = ImageFont.load_default()
+        font_small = ImageFont.load_default()
+    # 标题（截断到合适长度）
+    display_title = title[:20] + '...' if len(title) > 20 else title
+    draw.text((450, 230), display_title, font=font_large, fill='#ffffff', anchor='mm')
+    draw.text((450, 290), 'MIND OUR TIMES', font=font_small, fill='#888888', anchor='mm')
+    img.save(cover_path, format='PNG')
+    return True
+
+
+class RenderCache:
+    """渲染结果的磁盘缓存：每个键一个目录，含 article.html、cover.png（可缺）和 meta.json
+
+    命中时刷新 meta.json 的 mtime，prune() 按最近使用时间淘汰最旧的条目。
+    """
+
+    def __init__(self, directory=RENDER_CACHE_DIR, max_entries=RENDER_CACHE_MAX_ENTRIES):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(md_content, vote_url=None, vote_question=None):
+        material = json.dumps({
+            "draft": hashlib.sha256(md_content.encode('utf-8')).hexdigest(),
+            "styles_version": STYLES_VERSION,
+            "styles": STYLES,
+            "vote_url": vote_url,
+            "vote_question": vote_question,
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return self.directory / key[:32]
+
+    def get(self, key):
+        """命中时返回 (html, 封面路径或 None)，否则返回 None"""
+        entry = self.path(key)
+        try:
+            meta = json.loads((entry / 'meta.json').read_text())
+            html = (entry / 'article.html').read_text(encoding='utf-8')
+            os.utime(entry / 'meta.json')
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if meta.get('key') != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        cover = entry / 'cover.png'
+        return html, (cover if cover.exists() else None)
+
+    def put(self, key, html, cover_path=None, info=None):
+        """写入一条缓存（先写临时目录再整体改名，崩溃不会留下半条），返回缓存中的封面路径"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entry = self.path(key)
+        tmp = entry.with_name(f'.{entry.name}.{os.getpid()}.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        (tmp / 'article.html').write_text(html, encoding='utf-8')
+        if cover_path:
+            shutil.copyfile(cover_path, tmp / 'cover.png')
+        meta = {"key": key, "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                "styles_version": STYLES_VERSION, **(info or {})}
+        (tmp / 'meta.json').write_text(json.dumps(meta, ensure_ascii=False, indent=2))
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+        self.prune()
+        return entry / 'cover.png' if cover_path else None
+
+    def entries(self):
+        """缓存条目目录，最近使用的在前"""
+        if not self.directory.exists():
+            return []
+        metas = [p for p in self.directory.glob('*/meta.json') if not p.parent.name.startswith('.')]
+        return [p.parent for p in sorted(metas, key=lambda p: p.stat().st_mtime, reverse=True)]
+
+    def prune(self, max_entries=None):
+        limit = self.max_entries if max_entries is None else max_entries
+        stale = self.entries()[limit:]
+        for entry in stale:
+            shutil.rmtree(entry, ignore_errors=True)
+        return len(stale)
+
+
+def render_with_cache(md_content, title, vote_url=None, vote_question=None, cache=None,
+                      cover_path='/tmp/mot_cover.png'):
+    """返回 (完整 HTML, 封面路径或 None)；cache 命中时不做任何渲染"""
+    key = cache.make_key(md_content, vote_url, vote_question) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
+    if cached and cached[1] is not None:
+        return cached
+
+    if cached:
+        # 上次渲染时没有 PIL：HTML 沿用缓存，只补生成封面
+        full_html = cached[0]
+    else:
+        full_html = render_article(md_content, vote_url, vote_question)
+    if not render_cover(title, cover_path):
+        if cached:
+            return full_html, None
+        cover_path = None
+    if cache is not None:
+        cover_path = cache.put(key, full_html, cover_path, {"title": title}) or cover_path
+    return full_html, cover_path
+
+
+def media_command(action):
+    """查看或维护图片素材索引"""
+    index = MediaIndex()
+    if action == 'list':
+        for digest, entry in sorted(index.images.items(), key=lambda kv: kv[1]['last_used'], reverse=True):
+            print(f"{digest[:16]}  {entry['media_id']:<28} {entry['last_used']}  "
+                  f"{entry.get('size', 0) / 1024:>7.1f} KB  {entry.get('filename', '')}")
+        print(f"📦 {len(index.images)} images in {index.path}")
+        return 0
+    if action not in ('verify', 'cleanup'):
+        print("Usage: publish-deep-article.py media {list,verify,cleanup}")
+        return 1
+    live = WeChatPublisher(token_cache=TokenCache()).list_image_materials()
+    stale = index.stale(live)
+    for digest, entry in stale:
+        print(f"   ⚠️ {digest[:16]}  {entry['media_id']}  {entry.get('filename', '')}  已不在素材库")
+    print(f"🔍 {len(index.images)} indexed, {len(live)} images in the material library, {len(stale)} stale")
+    if action == 'cleanup' and stale:
+        index.remove(digest for digest, _ in stale)
+        print(f"🧹 removed {len(stale)} stale entries")
+    return 0
 
 
 def main():
+    if sys.argv[1:2] == ['media']:
+        sys.exit(media_command(sys.argv[2] if len(sys.argv) > 2 else 'list'))
+    
     # 配置
     ARTICLE_PATH = './mind-our-times/drafts/lex-fridman-ai-2026-02-06.md'
     VOTE_URL = 'https://mind-our-times-3g7c3va270081e5c-1397697000.tcloudbaseapp.com/vote.html?id=2026-02-06-ai-fear'
@@ -198,52 +751,32 @@ def main():
     lines = md_content.split('\n')
     title = lines[0].replace('# ', '').strip()
     
-    # 转换为 HTML
-    html_content = markdown_to_wechat_html(md_content, VOTE_URL, VOTE_QUESTION)
-    
-    # 包装完整 HTML
-    full_html = f'''
-<section style="padding: 0; margin: 0; background: #fff;">
-    <p style="text-align: center; color: #999; font-size: 13px; margin: 0 0 20px 0; letter-spacing: 0.1em;">MIND OUR TIMES</p>
-    {html_content}
-    <section style="margin-top: 40px; padding-top: 20px; border-top: 1px solid #eee; text-align: center;">
-        <p style="font-size: 13px; color: #999; margin: 0;">追踪时代思想脉搏</p>
-    </section>
-</section>
-'''
+    # 转换为 HTML、生成封面图（稿件和投票参数未变时直接取缓存）
+    cache = None if '--no-cache' in sys.argv else RenderCache()
+    full_html, cover_path = render_with_cache(md_content, title, VOTE_URL, VOTE_QUESTION, cache=cache)
     
     # 发布到草稿箱
     print(f"📝 标题：{title}")
     print(f"📊 投票链接：{VOTE_URL}")
-    print(f"📄 内容长度：{len(html_content)} 字符")
-    
-    publisher = WeChatPublisher()
-    
-    # 生成封面图
-    cover_path = '/tmp/mot_cover.png'
-    try:
-        from PIL import Image, ImageDraw, ImageFont
-        img = Image.new('RGB', (900, 500), color='#1a1a1a')
-        draw = ImageDraw.Draw(img)
-        try:
-            font_large = ImageFont.truetype('/System/Library/Fonts/PingFang.ttc', 36)
-            font_small = ImageFont.truetype('/System/Library/Fonts/PingFang.ttc', 20)
-        except:
-            font_large = ImageFont.load_default()
-            font_small = ImageFont.load_default()
-        # 标题（截断到合适长度）
-        display_title = title[:20] + '...' if len(title) > 20 else title
-        draw.text((450, 230), display_title, font=font_large, fill='#ffffff', anchor='mm')
-        draw.text((450, 290), 'MIND OUR TIMES', font=font_small, fill='#888888', anchor='mm')
-        img.save(cover_path)
-    except ImportError:
+    print(f"📄 内容长度：{len(full_html)} 字符")
+    if cache is not None:
+        print(f"🗂️ 渲染缓存：{'命中' if cache.hits else '未命中，已写入'}")
+    if cover_path is None:
         # 没有 PIL，用默认封面
         print("⚠️ PIL 未安装，使用默认封面")
         cover_path = '/tmp/default_cover.png'
     
+    publisher = WeChatPublisher(media_index=MediaIndex(), token_cache=TokenCache())
+    
     print("🖼️ 上传封面图...")
-    thumb_media_id = publisher.upload_image(cover_path)
-    print(f"   Media ID: {thumb_media_id}")
+    thumb_media_id = publisher.upload_image(
+        cover_path, progress=lambda sent, total: print(f"\r   {sent * 100 // total:>3}%", end='', flush=True))
+    if publisher.last_upload:
+        upload = publisher.last_upload
+        print(f"\r   {upload['bytes'] / 1024:.0f} KB {upload['content_type']}，"
+              f"{upload['elapsed']:.2f}s（{upload['rate'] / 1024:.0f} KB/s）")
+    print(f"   Media ID: {thumb_media_id}{'（素材索引命中，未重新上传）' if publisher.media_index.hits else ''}")
+    publisher.media_index.flush()  # 命中时的 last_used 更新一次写回
     
     print("📤 发布草稿...")
     article = {
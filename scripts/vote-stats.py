@@ -5,21 +5,44 @@ Mind Our Times - 投票统计脚本 v2
 
 功能：
 1. 从配置文件读取问题列表
-2. 通过 CloudBase SDK 页面获取数据
+2. 通过 vote 云函数 HTTP 接口（stats action）获取数据，失败时回退到 browser 抓取
 3. 计算总票数、增量、比例
-4. 存档到 JSON 文件
-5. 发送 Telegram 日报
+4. 追加写入历史存储（data/vote-stats/store/，history.json 作为导入导出格式）
+5. 并发推送日报到配置的目标（默认 Telegram），按天去重
+
+数据文件：store/、timings.jsonl、notify-ledger.json 都是本机运行状态，不进 git。
+history.json 只在首次运行时导入存储，之后不再自动更新，也不再纳入版本管理；
+需要备份或迁移到另一台机器时用 --export-history 导出、--import-history 导入。
 
 用法：
   python3 scripts/vote-stats.py           # 运行统计并发 Telegram
   python3 scripts/vote-stats.py --dry-run # 只统计不发送
+  python3 scripts/vote-stats.py --force-notify  # 当天已推送过也再发一次
+  python3 scripts/vote-stats.py --profile [path.prof]  # cProfile 整次运行并打印热点
+  python3 scripts/vote-stats.py --browser-deadline 60  # browser 回退路径的总时限（秒）
+  python3 scripts/vote-stats.py --window 7    # 报告近 7 日增量而非日增量
+  python3 scripts/vote-stats.py --trend 30    # 近 30 日增量、日均票数、均值和 A/B 占比变化
   python3 scripts/vote-stats.py --add <question_id> <question_text>  # 添加问题
+  python3 scripts/vote-stats.py --compact                  # 把追加日志并入列式存储
+  python3 scripts/vote-stats.py --export-history [path]    # 导出为 history.json 格式
+  python3 scripts/vote-stats.py --import-history [path]    # 从 history.json 格式导入（替换存储）
 """
 
+import cProfile
+import fcntl
+import functools
+import http.client
 import json
 import os
+import pstats
 import sys
 import subprocess
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -30,17 +53,167 @@ WORKSPACE_DIR = PROJECT_DIR.parent
 DATA_DIR = PROJECT_DIR / "data" / "vote-stats"
 HISTORY_FILE = DATA_DIR / "history.json"
 QUESTIONS_FILE = DATA_DIR / "questions.json"
+QUESTIONS_JOURNAL = DATA_DIR / "questions.json.journal"  # questions.json 的 write-ahead journal
+TIMINGS_FILE = DATA_DIR / "timings.jsonl"  # 每次运行的阶段耗时，一行一条
+PROFILE_DIR = DATA_DIR / "profiles"        # --profile 的 cProfile 输出
+STORE_DIR = DATA_DIR / "store"          # 追加写的历史存储（见 VoteHistoryStore）
+PREFIX_CHECKPOINT_EVERY = 30  # 累计记录每隔多少行带一次全部问题的折叠状态（见 prefix_row）
 
 # CloudBase 配置
 ENV_ID = "mind-our-times-3g7c3va270081e5c"
 WEBAPP_URL = f"https://{ENV_ID}-1397697000.tcloudbaseapp.com"
+# vote 云函数 HTTP 访问地址（可用环境变量指向本地替身服务）
+VOTE_API_URL = os.environ.get("MOT_VOTE_API_URL", f"https://{ENV_ID}.service.tcloudbase.com/vote")
+HTTP_TIMEOUT = 10       # 单次请求超时（秒）
+HTTP_RETRIES = 3        # 最多尝试次数
+HTTP_BACKOFF = 0.5      # 重试间隔基数（秒），按 2 的幂增长
+
+# 报告推送：目标为 "channel:target"，逗号分隔，可用环境变量覆盖
+NOTIFY_TARGETS = os.environ.get("MOT_NOTIFY_TARGETS", "telegram:8548089012")
+NOTIFY_WORKERS = 4      # 并发推送的目标数
+NOTIFY_RETRIES = 3      # 每个目标最多尝试次数
+NOTIFY_BACKOFF = 1.0    # 重试间隔基数（秒），按 2 的幂增长
+NOTIFY_TIMEOUT = 30     # 单次发送超时（秒）
+NOTIFY_LEDGER = DATA_DIR / "notify-ledger.json"  # 按天记录已推送的目标，重跑不重复发送
+NOTIFY_LEDGER_DAYS = 30 # 台账保留天数
+
+# browser 回退路径的就绪轮询参数
+BROWSER_DEADLINE = 45   # 从检查 browser 状态到拿到数据的总时限（秒）
+POLL_INITIAL = 0.25     # 首次轮询间隔（秒）
+POLL_FACTOR = 1.6       # 间隔增长倍数
+POLL_MAX_INTERVAL = 2.0 # 最大轮询间隔（秒）
+
+
+@dataclass
+class StatsResult:
+    """一次统计拉取的结果"""
+    ok: bool
+    questions: list = field(default_factory=list)
+    source: str = "http"        # http / browser
+    elapsed: float = 0.0        # 耗时（秒）
+    attempts: int = 0
+    error: str = ""
+    timings: dict = field(default_factory=dict)  # browser 路径各阶段耗时
+
+@contextmanager
+def file_lock(path):
+    """对 path 加进程间排他锁（fcntl.flock 建议锁，锁文件为同目录下的 .<name>.lock）
+
+    只在读-改-写期间持有；不同文件各自加锁，stats 定时任务和 --add 互不阻塞。
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(f".{path.name}.lock"), 'a') as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+def fsync_dir(path):
+    """fsync 目录，让 rename / 新建文件的目录项也落盘"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """临时文件 + fsync + rename 写 JSON，读者永远看不到写了一半的文件
+
+    调用方需持有 path 的 file_lock（临时文件名固定）。
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    fsync_dir(path.parent)
+
+def _replay_questions_journal(data):
+    """把 questions.json.journal 中尚未落盘的操作应用到 data；返回应用的条数"""
+    if not QUESTIONS_JOURNAL.exists():
+        return 0
+    known = {q["id"] for q in data["questions"]}
+    applied = 0
+    with open(QUESTIONS_JOURNAL, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                op = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 写到一半崩溃的末行：该操作未确认，丢弃
+            if op.get("op") == "add" and op["question"]["id"] not in known:
+                data["questions"].append(op["question"])
+                known.add(op["question"]["id"])
+                applied += 1
+    return applied
+
+def recover_questions():
+    """启动时重放 write-ahead journal：把崩溃前已记录但未写入 questions.json 的操作补写"""
+    if not QUESTIONS_JOURNAL.exists():
+        return 0
+    with file_lock(QUESTIONS_FILE):
+        data = _load_questions_file()
+        applied = _replay_questions_journal(data)
+        if applied:
+            save_questions(data)
+        QUESTIONS_JOURNAL.unlink(missing_ok=True)
+    if applied:
+        print(f"🔁 Replayed {applied} journaled question change(s)")
+    return applied
+
+class PhaseTimer:
+    """按阶段累计耗时：with TIMER.phase("name") 或 @TIMER.timed("name")
+
+    同名阶段多次进入时耗时累加。每次日常运行结束后 record() 追加到 TIMINGS_FILE。
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + self.clock() - started
+
+    def timed(self, name=None):
+        """装饰器版本，name 缺省为函数名"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.phase(name or fn.__name__):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, path=TIMINGS_FILE, **extra):
+        """把本次运行的各阶段耗时（毫秒）追加为 JSONL 一行，返回该记录"""
+        entry = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "total_ms": round((self.clock() - self.started) * 1000, 1),
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            **extra,
+        }
+        with file_lock(path):
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+TIMER = PhaseTimer()
 
 def ensure_dirs():
     """确保数据目录存在"""
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-def load_questions():
-    """加载问题配置"""
+def _load_questions_file():
     if QUESTIONS_FILE.exists():
         with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
             return json.load(f)
@@ -56,139 +229,725 @@ def load_questions():
         ]
     }
 
+def load_questions():
+    """加载问题配置（含 journal 中尚未落盘的修改）"""
+    data = _load_questions_file()
+    _replay_questions_journal(data)
+    return data
+
 def save_questions(data):
-    """保存问题配置"""
+    """保存问题配置（原子替换；调用方持有 QUESTIONS_FILE 的 file_lock）"""
     ensure_dirs()
-    with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    atomic_write_json(QUESTIONS_FILE, data, indent=2)
 
-def load_history():
-    """加载历史数据"""
-    if HISTORY_FILE.exists():
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+def load_history(path=HISTORY_FILE):
+    """加载 history.json 格式的历史数据（导入 / 导出用）"""
+    path = Path(path)
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
             return json.load(f)
     return {"questions": {}, "daily_snapshots": []}
 
-def save_history(history):
-    """保存历史数据"""
+def save_history(history, path=HISTORY_FILE):
+    """保存 history.json 格式的历史数据（导出用）"""
     ensure_dirs()
-    with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+    with file_lock(path):
+        atomic_write_json(path, history, indent=2)
+
+class VoteHistoryStore:
+    """投票历史存储：追加写日志 + 按问题的列式计数数组
+
+    目录结构（STORE_DIR）：
+      log.jsonl   每次运行追加一行当日快照（同一天重跑时后写入的为准）
+      dates.idx   追加写的日期索引：每行 "date offset length"，指向 log.jsonl 中的记录
+      series.json 压缩后的列式数据：dates 数组 + 每个问题按日期对齐的计数数组
+      prefix.jsonl / prefix.idx  窗口报告用的稀疏累计记录（见 prefix_row）及其日期索引：
+                  每个快照一行，只含当天出现的问题；压缩时整体重建，每次追加快照时在末尾补一行
+
+    日常运行只追加一行日志和一行索引，并从索引尾部读出上一天的快照，
+    耗时与当天问题数成正比，与历史长度无关。--compact 把日志并入 series.json 后清空日志。
+    history.json 保留为导入 / 导出格式。
+    """
+
+    COLUMNS = ("total", "count_a", "count_b", "delta", "days_active")
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root else STORE_DIR
+        self.log_file = self.root / "log.jsonl"
+        self.index_file = self.root / "dates.idx"
+        self.series_file = self.root / "series.json"
+        self.prefix_file = self.root / "prefix.jsonl"
+        self.prefix_index_file = self.root / "prefix.idx"
+
+    def exists(self):
+        return self.series_file.exists() or self.index_file.exists()
+
+    # ---- 追加写 ----
+
+    def append_snapshot(self, snapshot):
+        """追加一天的快照（{"date", "timestamp", "questions": [...]}）
+
+        日志即 write-ahead log：先写日志并 fsync，再写索引；
+        两步之间崩溃时由 recover() 根据日志补齐索引。
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        line = (json.dumps(snapshot, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+        with file_lock(self.log_file):
+            created = not self.log_file.exists()
+            previous = next(self._index_tail(), None)
+            with open(self.log_file, 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._append_index(snapshot['date'], offset, len(line))
+            self._extend_prefix(snapshot, offset, previous)
+            if created:
+                fsync_dir(self.root)
+
+    def _append_index(self, date, offset, length, path=None):
+        with open(path or self.index_file, 'a', encoding='utf-8') as f:
+            f.write(f"{date} {offset} {length}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _extend_prefix(self, snapshot, src, previous):
+        """在累计记录末尾补上 snapshot 这一行（调用方持有日志锁）
+
+        previous 为追加前日志索引的最后一条。累计记录还不存在时跳过，由 window_index()
+        首次使用时整体建立；累计记录没跟上日志（崩溃后）或快照日期早于已有记录（补录旧日期）时
+        删掉累计记录，下次使用时重建。只折叠当天出现的问题（检查点行折叠全部问题），
+        向前最多读到上一个检查点。
+        """
+        if not self.prefix_index_file.exists():
+            return
+        entry = next(self._index_tail(path=self.prefix_index_file), None)
+        last = self._read_log_entry(entry[1], entry[2], self.prefix_file) if entry else None
+        behind = previous is not None and (last is None or last.get("src") != previous[1])
+        # 没有行号的是旧版（按天稠密）的累计记录，重建为稀疏格式
+        if behind or (last and (snapshot["date"] < last["date"] or "n" not in last)):
+            self._drop_prefix()
+            return
+        n = last["n"] + 1 if last else 0
+        checkpoint = n % PREFIX_CHECKPOINT_EVERY == 0
+        qids = None if checkpoint else {row["question_id"] for row in snapshot["questions"]}
+        state, _ = self._fold_prefix(snapshot["date"], qids, inclusive=False)
+        self._append_prefix_rows([prefix_row(state, snapshot, n, checkpoint, src)])
+
+    def _fold_prefix(self, date, qids=None, inclusive=True):
+        """从尾部倒序折叠累计记录，返回 ({question_id: [date, total, count_a, 累计]}, 最近一行的日期)
+
+        只看日期不晚于 date（inclusive=False 时早于 date）的行；同一天重跑留下的旧行跳过。
+        qids 为 None 时折叠全部问题。遇到检查点行或 qids 全部找到即停止。
+        """
+        state, latest, seen = {}, None, set()
+        wanted = None if qids is None else set(qids)
+        for day, offset, length in self._index_tail(path=self.prefix_index_file):
+            if day > date or (day == date and not inclusive) or day in seen:
+                continue
+            seen.add(day)
+            latest = latest or day
+            row = self._read_log_entry(offset, length, self.prefix_file)
+            for qid, (total, a, running) in row["q"].items():
+                if qid not in state and (wanted is None or qid in wanted):
+                    state[qid] = [day, total, a, running]
+            if "carry" in row:
+                for qid, carried in row["carry"].items():
+                    if qid not in state and (wanted is None or qid in wanted):
+                        state[qid] = carried
+                break
+            if wanted is not None and wanted <= state.keys():
+                break
+        return state, latest
+
+    def _append_prefix_rows(self, rows):
+        with open(self.prefix_file, 'ab') as f:
+            entries = []
+            for row in rows:
+                line = (json.dumps(row, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+                entries.append((row["date"], f.seek(0, os.SEEK_END), len(line)))
+                f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.prefix_index_file, 'a', encoding='utf-8') as f:
+            f.writelines(f"{date} {offset} {length}\n" for date, offset, length in entries)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _drop_prefix(self):
+        # 先删索引：索引在、数据不全的状态不会出现
+        for path in (self.prefix_index_file, self.prefix_file):
+            path.unlink(missing_ok=True)
+
+    def _write_prefix(self, snapshots, last_src=None):
+        """由快照列表整体重建累计记录；last_src 为最后一个快照在日志中的偏移（调用方持有日志锁）"""
+        self._drop_prefix()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.prefix_file.touch()
+        self.prefix_index_file.touch()
+
+        def rows():
+            state = {}
+            for n, snapshot in enumerate(snapshots):
+                row = prefix_row(state, snapshot, n, n % PREFIX_CHECKPOINT_EVERY == 0,
+                                 last_src if n == len(snapshots) - 1 else None)
+                state.update((qid, [row["date"], *values]) for qid, values in row["q"].items())
+                yield row
+
+        self._append_prefix_rows(rows())
+
+    def recover(self):
+        """启动时检查日志与索引是否一致：补齐漏记的索引，截掉写了一半的日志末行
+
+        返回补齐的索引条数。
+        """
+        if not self.log_file.exists():
+            return 0
+        with file_lock(self.log_file):
+            indexed_end = next((offset + length for _, offset, length in self._index_tail()), 0)
+            size = self.log_file.stat().st_size
+            if size <= indexed_end:
+                return 0
+            recovered = 0
+            with open(self.log_file, 'r+b') as f:
+                f.seek(indexed_end)
+                offset = indexed_end
+                for raw in f.read().splitlines(keepends=True):
+                    try:
+                        if not raw.endswith(b"\n"):
+                            raise ValueError("partial line")
+                        date = json.loads(raw)["date"]
+                    except (ValueError, KeyError):
+                        break
+                    self._append_index(date, offset, len(raw))
+                    offset += len(raw)
+                    recovered += 1
+                if offset < size:
+                    f.truncate(offset)
+                    os.fsync(f.fileno())
+            return recovered
+
+    # ---- 读取 ----
+
+    def _index_tail(self, chunk=4096, path=None):
+        """倒序返回日期索引的条目 (date, offset, length)，只读文件尾部"""
+        path = path or self.index_file
+        if not path.exists():
+            return
+        with open(path, 'rb') as f:
+            end = f.seek(0, os.SEEK_END)
+            pos, buffer = end, b""
+            while pos > 0:
+                step = min(chunk, pos)
+                pos -= step
+                f.seek(pos)
+                buffer = f.read(step) + buffer
+                lines = buffer.split(b"\n")
+                # 第一段可能是被截断的半行，留到下一轮
+                buffer = lines[0] if pos > 0 else b""
+                for raw in reversed(lines[1:] if pos > 0 else lines):
+                    parts = raw.decode('utf-8').split()
+                    if len(parts) == 3:
+                        yield parts[0], int(parts[1]), int(parts[2])
+
+    def _read_log_entry(self, offset, length, path=None):
+        with open(path or self.log_file, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def load_series(self):
+        if self.series_file.exists():
+            with open(self.series_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"dates": [], "timestamps": [], "questions": {}}
+
+    def previous_snapshot(self, before):
+        """返回 before 之前最近一天的快照 {question_id: row}；没有则返回 {}"""
+        for date, offset, length in self._index_tail():
+            if date < before:
+                snapshot = self._read_log_entry(offset, length)
+                return {q["question_id"]: q for q in snapshot["questions"]}
+        # 日志里没有更早的记录（如刚导入），从 series.json 取
+        series = self.load_series()
+        for i in range(len(series["dates"]) - 1, -1, -1):
+            if series["dates"][i] < before:
+                return {qid: row for qid, row in self._rows_at(series, i)}
+        return {}
+
+    def _rows_at(self, series, i):
+        """series 第 i 天的各问题记录"""
+        for qid, q in series["questions"].items():
+            j = i - q["first"]
+            if 0 <= j < len(q["total"]) and q["total"][j] is not None:
+                yield qid, {"question_id": qid, "question": q["question"], "publish_date": q["publish_date"],
+                            **{col: q[col][j] for col in self.COLUMNS}}
+
+    def iter_log(self):
+        """顺序读出日志中的全部快照（容忍末尾被截断的半行）"""
+        if not self.log_file.exists():
+            return
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def snapshots(self):
+        """合并 series.json 与日志，返回按日期排序的快照列表（每天只保留最后一次）"""
+        series = self.load_series()
+        by_date = {}
+        for i, date in enumerate(series["dates"]):
+            by_date[date] = {
+                "date": date,
+                "timestamp": series["timestamps"][i],
+                "questions": [row for _, row in self._rows_at(series, i)],
+            }
+        for snapshot in self.iter_log():
+            by_date[snapshot["date"]] = snapshot
+        return [by_date[date] for date in sorted(by_date)]
+
+    def question_series(self, question_id):
+        """某个问题按日期的计数 [(date, total, count_a, count_b), ...]"""
+        series = self.load_series()
+        points = {}
+        q = series["questions"].get(question_id)
+        if q:
+            for j, total in enumerate(q["total"]):
+                if total is not None:
+                    points[series["dates"][q["first"] + j]] = (total, q["count_a"][j], q["count_b"][j])
+        for snapshot in self.iter_log():
+            for row in snapshot["questions"]:
+                if row["question_id"] == question_id:
+                    points[snapshot["date"]] = (row["total"], row["count_a"], row["count_b"])
+        return [(date, *points[date]) for date in sorted(points)]
+
+    def window_index(self):
+        """打开窗口报告用的累计索引；累计记录缺失或落后于日志（如崩溃后 recover）时整体重建一次"""
+        with file_lock(self.log_file):
+            latest = next(self._index_tail(), None)
+            row = next(self._index_tail(path=self.prefix_index_file), None)
+            if latest is None:
+                fresh = self.prefix_index_file.exists()
+            else:
+                last = self._read_log_entry(row[1], row[2], self.prefix_file) if row is not None else {}
+                fresh = row is not None and row[0] == latest[0] and last.get("src") == latest[1] and "n" in last
+            if not fresh:
+                self._write_prefix(self.snapshots(), latest[1] if latest else None)
+        return VoteSeriesIndex(self)
+
+    def prefix_view(self, date, qids=None):
+        """各问题截至 date 的计数 {"date", "q": {question_id: [total, count_a, 累计 total]}}
+
+        date 晚于最后一条记录时按最后一条记录的日期计；早于全部记录时返回 None。
+        缺席的日期沿用最近一次的计数，累计值按此外推。qids 为 None 时返回全部问题。
+        """
+        last = next(self._index_tail(path=self.prefix_index_file), None)
+        if last is None:
+            return None
+        date = min(date, last[0])
+        state, latest = self._fold_prefix(date, qids)
+        if latest is None:
+            return None
+        ordinal = datetime.strptime(date, "%Y-%m-%d").toordinal()
+        q = {}
+        for qid, (day, total, a, running) in state.items():
+            gap = ordinal - datetime.strptime(day, "%Y-%m-%d").toordinal()
+            q[qid] = [total, a, running + total * gap]
+        return {"date": date, "q": q}
+
+    def prefix_start(self):
+        """累计记录的第一天；没有记录时返回 None"""
+        if not self.prefix_index_file.exists():
+            return None
+        with open(self.prefix_index_file, 'r', encoding='utf-8') as f:
+            first = f.readline().split()
+        return first[0] if first else None
+
+    # ---- 压缩 / 导入导出 ----
+
+    def write_series(self, snapshots):
+        """把快照列表写成列式 series.json（原子替换）"""
+        dates = [s["date"] for s in snapshots]
+        questions = {}
+        for i, snapshot in enumerate(snapshots):
+            for row in snapshot["questions"]:
+                qid = row["question_id"]
+                q = questions.get(qid)
+                if q is None:
+                    q = questions[qid] = {"question": row.get("question", ""),
+                                          "publish_date": row.get("publish_date", qid[:10]),
+                                          "first": i, **{col: [] for col in self.COLUMNS}}
+                q["question"] = row.get("question", q["question"])
+                # 中间缺席的日期补 None，保持数组与 dates 对齐
+                gap = i - q["first"] - len(q["total"])
+                for col in self.COLUMNS:
+                    q[col].extend([None] * gap)
+                    q[col].append(row.get(col, 0))
+        series = {"dates": dates, "timestamps": [s.get("timestamp", "") for s in snapshots],
+                  "questions": questions}
+        with file_lock(self.series_file):
+            atomic_write_json(self.series_file, series, separators=(',', ':'))
+        return series
+
+    def compact(self):
+        """把日志并入 series.json，然后重建只含最后一天的日志和索引；返回并入的日志条数
+
+        series.json 先落盘再清日志：中途崩溃时日志会在下次压缩时被重复并入，结果不变。
+        最后一天留在日志里，下次日常运行取上一天快照时不必加载 series.json。
+        """
+        merged = sum(1 for _ in self.iter_log())
+        self._rewrite(self.snapshots())
+        return merged
+
+    def import_history(self, history):
+        """用 history.json 格式的数据替换整个存储"""
+        self._rewrite(sorted(history.get("daily_snapshots", []), key=lambda s: s["date"]))
+
+    def _rewrite(self, snapshots):
+        self.write_series(snapshots)
+        with file_lock(self.log_file):
+            for path in (self.index_file, self.log_file):
+                path.unlink(missing_ok=True)
+            # 累计记录重建到倒数第二天，最后一天随下面的追加补上
+            self._write_prefix(snapshots[:-1])
+        if snapshots:
+            self.append_snapshot(snapshots[-1])
+
+    def export_history(self):
+        """导出为 history.json 格式"""
+        snapshots = self.snapshots()
+        questions = {}
+        for snapshot in snapshots:
+            for row in snapshot["questions"]:
+                qid = row["question_id"]
+                q = questions.setdefault(qid, {"question": row.get("question", ""),
+                                               "publish_date": row.get("publish_date", qid[:10]),
+                                               "daily_totals": []})
+                q["daily_totals"].append({"date": snapshot["date"], "total": row["total"],
+                                          "count_a": row["count_a"], "count_b": row["count_b"]})
+        for snapshot in snapshots:
+            for row in snapshot["questions"]:
+                total = row["total"]
+                row.setdefault("percent_a", round(row["count_a"] / total * 100) if total > 0 else 0)
+                row.setdefault("percent_b", 100 - row["percent_a"] if total > 0 else 0)
+        return {"questions": questions, "daily_snapshots": snapshots}
+
+
+def prefix_row(state, snapshot, n, checkpoint=False, src=None):
+    """由折叠状态 state（{question_id: [date, total, count_a, 累计]}，日期都早于快照）生成 snapshot 的累计记录
+
+    记录格式 {"date", "n", "q": {question_id: [total, count_a, 累计 total]}, "src"}，只含当天出现的问题；
+    累计 total 按日历天计，缺席的日期沿用前一次的计数。n 为行号；检查点行另带 "carry"：
+    当天没出现的其余问题的折叠状态，倒序读取时读到检查点即可停止。
+    src 为快照在日志中的偏移，用来判断累计记录是否跟上了日志。
+    """
+    ordinal = datetime.strptime(snapshot["date"], "%Y-%m-%d").toordinal()
+    q = {}
+    for row in snapshot["questions"]:
+        qid = row["question_id"]
+        running = 0
+        if qid in state:
+            day, total, _, running = state[qid]
+            running += total * (ordinal - 1 - datetime.strptime(day, "%Y-%m-%d").toordinal())
+        q[qid] = [row["total"], row["count_a"], running + row["total"]]
+    record = {"date": snapshot["date"], "n": n, "q": q, "src": src}
+    if checkpoint:
+        record["carry"] = {qid: values for qid, values in state.items() if qid not in q}
+    return record
+
+
+class VoteSeriesIndex:
+    """按日历天对齐的累计索引，用于任意窗口的增量、均值和 A/B 占比变化
+
+    数据来自存储里持久化的稀疏累计记录（prefix.jsonl，见 prefix_row）：每行只含当天出现的问题
+    及其总票数前缀和（缺席的日期沿用前一天，首次出现前为 0）。压缩时整体重建、每天追加一行，
+    窗口查询从索引尾部折叠出窗口两端的计数（最多读到上一个检查点），之后每个问题 O(1)。
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.start = store.prefix_start()
+
+    def rows(self, date, days, qids=None):
+        """窗口两端：(截至 date 的记录, 窗口前一天的记录或 None, 窗口实际覆盖的天数)；qids 限定问题"""
+        if self.start is None:
+            return None, None, 0
+        end_row = self.store.prefix_view(date, qids)
+        if end_row is None:
+            return None, None, 0
+        end = datetime.strptime(end_row["date"], "%Y-%m-%d").toordinal()
+        start = end - days  # 窗口前一天，可能早于索引起点（视为 0 票）
+        first = datetime.strptime(self.start, "%Y-%m-%d").toordinal()
+        if start < first:
+            return end_row, None, end - first + 1
+        start_date = datetime.fromordinal(start).strftime("%Y-%m-%d")
+        return end_row, self.store.prefix_view(start_date, qids), days
+
+    @staticmethod
+    def window(qid, end_row, start_row, days, span):
+        """问题 qid 在窗口内的统计；span 为窗口实际覆盖的天数（历史短于窗口时小于 days）"""
+        end = end_row["q"].get(qid) if end_row else None
+        if end is None or not span:
+            return None
+        total_end, a_end, running_end = end
+        total_start, a_start, running_start = (start_row["q"].get(qid) if start_row else None) or (0, 0, 0)
+        delta = total_end - total_start
+        share_end = a_end / total_end * 100 if total_end else 0
+        share_start = a_start / total_start * 100 if total_start else share_end
+        return {
+            "window": days,
+            "delta": delta,
+            "avg_daily": delta / span,
+            "avg_total": (running_end - running_start) / span,
+            "drift": share_end - share_start,
+            "window_percent_a": round((a_end - a_start) / delta * 100) if delta > 0 else None,
+        }
+
+
+def apply_window(stats, index, date, days, trend=False):
+    """用 days 天窗口的增量替换每个问题的日增量；trend 时附带均值和占比变化"""
+    end_row, start_row, span = index.rows(date, days, [q["question_id"] for q in stats])
+    for q in stats:
+        window = index.window(q["question_id"], end_row, start_row, days, span)
+        if window is None:
+            window = {"window": days, "delta": q["delta"], "avg_daily": q["delta"] / max(span, 1),
+                      "avg_total": q["total"], "drift": 0.0, "window_percent_a": None}
+        q["delta"] = window["delta"]
+        q["window"] = days
+        if trend:
+            q.update(window)
+    return stats
+
+def open_store():
+    """打开默认存储；首次使用时从 history.json 迁移"""
+    store = VoteHistoryStore()
+    if not store.exists() and HISTORY_FILE.exists():
+        print(f"📦 Migrating {HISTORY_FILE.name} into {store.root}")
+        store.import_history(load_history())
+    recovered = store.recover()
+    if recovered:
+        print(f"🔁 Re-indexed {recovered} snapshot(s) written before a crash")
+    return store
+
+def call_vote_api(action, params=None, url=VOTE_API_URL, timeout=HTTP_TIMEOUT):
+    """调用 vote 云函数（HTTP），返回 data 字段；业务失败时抛出 RuntimeError"""
+    payload = json.dumps({"action": action, **(params or {})}).encode('utf-8')
+    req = urllib.request.Request(url, data=payload, method='POST',
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        result = json.loads(resp.read().decode('utf-8'))
+    if not result.get("success"):
+        raise RuntimeError(result.get("error") or "vote API returned success=false")
+    return result.get("data")
+
+def fetch_stats_via_http(url=VOTE_API_URL, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF):
+    """通过 vote 云函数的 stats action 拉取所有问题统计
+
+    网络错误（含响应被截断等 HTTPException）、超时和 5xx 按指数退避重试；4xx 和业务错误不重试。
+    """
+    started = time.monotonic()
+    error = ""
+    for attempt in range(1, retries + 1):
+        try:
+            data = call_vote_api("stats", url=url, timeout=timeout)
+            questions = data.get("questions", []) if isinstance(data, dict) else []
+            return StatsResult(True, questions, "http", time.monotonic() - started, attempt)
+        except urllib.error.HTTPError as e:
+            error = f"HTTP {e.code}"
+            if e.code < 500:
+                break
+        except (urllib.error.URLError, http.client.HTTPException, TimeoutError, ConnectionError) as e:
+            error = f"{type(e).__name__}: {getattr(e, 'reason', e)}"
+        except (RuntimeError, ValueError) as e:
+            error = str(e)
+            break
+        if attempt < retries:
+            time.sleep(backoff * 2 ** (attempt - 1))
+    return StatsResult(False, [], "http", time.monotonic() - started, attempt, error)
 
 def fetch_question_result(question_id):
-    """通过访问投票页获取单个问题的结果"""
-    # 构建投票结果页 URL（带 question_id 参数）
-    vote_url = f"{WEBAPP_URL}/vote.html?id={question_id}"
-    
+    """通过 vote 云函数的 result action 获取单个问题的结果"""
+    print(f"  Fetching {question_id}...")
     try:
-        # 使用 curl 获取页面（投票结果在页面加载后通过 JS 生成）
-        # 这里我们直接调用云函数的 HTTP 接口
-        # 如果 HTTP 不可用，返回 None，稍后用 browser
-        
-        # 尝试直接访问（可能需要 browser）
-        print(f"  Fetching {question_id}...")
-        return None  # 暂时返回 None，使用 fallback
-        
+        return call_vote_api("result", {"question_id": question_id})
     except Exception as e:
         print(f"  Error fetching {question_id}: {e}")
         return None
 
-def fetch_all_stats_via_browser():
-    """通过 browser 抓取 stats 页面获取所有统计"""
+@TIMER.timed("fetch")
+def fetch_all_stats(browser_deadline=BROWSER_DEADLINE):
+    """优先走 HTTP 接口，失败时回退到 browser 抓取"""
+    result = fetch_stats_via_http()
+    if result.ok:
+        return result
+    print(f"  HTTP fetch failed after {result.attempts} attempts ({result.error}), falling back to browser")
+    started = time.monotonic()
+    timings = {}
+    questions = fetch_all_stats_via_browser(deadline=browser_deadline, timings=timings)
+    if timings:
+        print("  Browser phases: " + ", ".join(f"{k}={v:.2f}s" for k, v in timings.items()))
+    if questions is None:
+        return StatsResult(False, [], "browser", time.monotonic() - started, 1, "browser fetch failed",
+                           timings=timings)
+    return StatsResult(True, questions, "browser", time.monotonic() - started, 1, timings=timings)
+
+# browser 回退路径的页面探针：一次 evaluate 同时判断中间页 / 加载中 / 数据就绪
+READINESS_PROBE = (
+    "() => {"
+    " if (document.getElementById('submitBtn')) return 'REDIRECT_PAGE:' + location.href;"
+    " const text = document.getElementById('stats')?.textContent || '';"
+    " try { JSON.parse(text); return 'READY:' + text; } catch (e) { return 'LOADING'; }"
+    "}"
+)
+CLICK_THROUGH = "() => { document.getElementById('submitBtn')?.click(); return 'clicked'; }"
+CURRENT_URL = "() => location.href"
+
+
+def run_command(cmd, timeout):
+    """默认的子进程执行器；测试时可替换为离线的假 runner"""
+    return subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+
+
+def poll_until(probe, deadline, initial=POLL_INITIAL, factor=POLL_FACTOR, max_interval=POLL_MAX_INTERVAL,
+               sleep=time.sleep, clock=time.monotonic):
+    """指数退避地调用 probe()，直到返回非 None 或超过 deadline（绝对时间）
+
+    返回 probe 的结果；超时返回 None。
+    """
+    interval = initial
+    while True:
+        value = probe()
+        if value is not None:
+            return value
+        remaining = deadline - clock()
+        if remaining <= 0:
+            return None
+        sleep(min(interval, remaining))
+        interval = min(interval * factor, max_interval)
+
+
+def _evaluate(runner, fn, timeout=10):
+    """执行 browser evaluate，返回页面函数的返回值（字符串）；失败返回 None"""
+    result = runner(["openclaw", "browser", "evaluate", "--json", "--fn", fn], timeout)
+    if result.returncode != 0:
+        return None
+    content = result.stdout.strip()
+    # browser evaluate 返回的可能是 JSON 包装的结果
+    try:
+        wrapper = json.loads(content)
+        if isinstance(wrapper, dict):
+            content = wrapper.get('result', wrapper.get('value', content))
+        elif isinstance(wrapper, str):
+            content = wrapper
+    except ValueError:
+        pass
+    return content if isinstance(content, str) else json.dumps(content)
+
+
+def fetch_all_stats_via_browser(runner=run_command, deadline=BROWSER_DEADLINE, timings=None,
+                                sleep=time.sleep, clock=time.monotonic):
+    """通过 browser 抓取 stats 页面获取所有统计
+
+    不再使用固定等待：每个阶段用廉价的 evaluate 探针指数退避轮询，
+    直到就绪或超过总时限 deadline（秒）。各阶段耗时写入 timings（如提供）。
+    runner(cmd, timeout) 可注入，便于离线测试。
+    """
+    timings = {} if timings is None else timings
+    started = clock()
+    cutoff = started + deadline
+    
+    def phase(name, since):
+        now = clock()
+        timings[name] = round(now - since, 3)
+        return now
+    
     try:
         # 检查 browser 状态
-        status = subprocess.run(
-            ["openclaw", "browser", "status", "--json"],
-            capture_output=True, text=True, timeout=10
-        )
-        
+        status = runner(["openclaw", "browser", "status", "--json"], 10)
+        mark = started
         if "stopped" in status.stdout.lower():
             print("  Starting browser...")
-            subprocess.run(
-                ["openclaw", "browser", "start", "--browser-profile", "openclaw"],
-                capture_output=True, timeout=15
-            )
-            import time
-            time.sleep(2)
+            runner(["openclaw", "browser", "start", "--browser-profile", "openclaw"], 15)
+            running = poll_until(
+                lambda: True if "stopped" not in runner(["openclaw", "browser", "status", "--json"], 10).stdout.lower() else None,
+                cutoff, sleep=sleep, clock=clock)
+            if not running:
+                print("  Browser did not start before deadline")
+                return None
+        mark = phase("browser_start", mark)
         
         # 导航到 stats 页面
         stats_url = f"{WEBAPP_URL}/stats.html"
         print(f"  Navigating to {stats_url}...")
-        
-        nav = subprocess.run(
-            ["openclaw", "browser", "navigate", stats_url],
-            capture_output=True, text=True, timeout=30
-        )
-        
+        nav = runner(["openclaw", "browser", "navigate", stats_url], 30)
         if nav.returncode != 0:
             print(f"  Navigate failed: {nav.stderr}")
             return None
+        mark = phase("navigate", mark)
         
-        import time
+        # 轮询页面状态：CloudBase 中间页（测试域名保护）→ 点击通过；数据 JSON 就绪 → 返回
+        state = {"redirect_seen": None, "redirect_url": None, "last": ""}
         
-        # 检查是否有 CloudBase 中间页（测试域名保护）
-        time.sleep(3)
-        check_redirect = subprocess.run(
-            ["openclaw", "browser", "evaluate", "--json",
-             "--fn", "() => document.getElementById('submitBtn') ? 'REDIRECT_PAGE' : 'OK'"],
-            capture_output=True, text=True, timeout=10
-        )
+        def click_through(value):
+            """在中间页上点击通过，点击后立即检查 URL 是否已跳走"""
+            if state["redirect_seen"] is None:
+                state["redirect_seen"] = clock()
+                state["redirect_url"] = value[len("REDIRECT_PAGE:"):]
+                print("  Clicking through CloudBase redirect page...")
+            # 倒计时结束前点击可能无效，下次探针仍是中间页时会再点一次
+            _evaluate(runner, CLICK_THROUGH)
+            url = _evaluate(runner, CURRENT_URL)
+            return bool(url) and url != state["redirect_url"]
         
-        if "REDIRECT_PAGE" in check_redirect.stdout:
-            print("  Clicking through CloudBase redirect page...")
-            # 等待倒计时（3秒）
-            time.sleep(4)
-            # 点击"确定访问"按钮
-            subprocess.run(
-                ["openclaw", "browser", "evaluate", "--json",
-                 "--fn", "() => { document.getElementById('submitBtn').click(); return 'clicked'; }"],
-                capture_output=True, text=True, timeout=10
-            )
-            # 等待页面加载
-            time.sleep(4)
+        def redirect_probe():
+            """中间页阶段：数据就绪、点击后 URL 跳走、或点击过的中间页已变为加载中才结束
+
+            首次探针时中间页可能还没渲染（LOADING / 探针失败），此时继续留在本阶段。
+            """
+            value = _evaluate(runner, READINESS_PROBE) or ""
+            state["last"] = value
+            if value.startswith("READY:"):
+                return value
+            if value.startswith("REDIRECT_PAGE:"):
+                return "REDIRECTED" if click_through(value) else None
+            if value == "LOADING" and state["redirect_seen"] is not None:
+                return "REDIRECTED"
+            return None
         
-        # 等待 SDK 初始化和数据加载（CloudBase SDK 需要较长时间）
-        print("  Waiting for SDK to initialize...")
-        time.sleep(8)
+        def ready_probe():
+            value = _evaluate(runner, READINESS_PROBE) or ""
+            state["last"] = value
+            if value.startswith("READY:"):
+                return value[len("READY:"):]
+            if value.startswith("REDIRECT_PAGE:"):
+                click_through(value)  # 跳转后又回到中间页（如点击未生效）时继续点击
+            return None
         
-        # 执行 JS 获取 stats 内容
-        result = subprocess.run(
-            ["openclaw", "browser", "evaluate", "--json",
-             "--fn", "() => document.getElementById('stats')?.textContent || 'NOT_FOUND'"],
-            capture_output=True, text=True, timeout=15
-        )
+        print(f"  Waiting for stats (deadline {deadline:g}s)...")
+        value = poll_until(redirect_probe, cutoff, sleep=sleep, clock=clock)
+        if state["redirect_seen"] is not None:
+            # 跳转完成于观察到 URL 变化（或中间页消失）的时刻；超时则计到当前
+            mark = phase("redirect", state["redirect_seen"])
+        if value is not None and value.startswith("READY:"):
+            content = value[len("READY:"):]
+        elif value is not None:
+            # SDK 加载阶段重新从最短间隔开始轮询，而不是沿用中间页阶段已增长的间隔
+            content = poll_until(ready_probe, cutoff, sleep=sleep, clock=clock)
+        else:
+            content = None
+        phase("sdk_load", mark)
+        timings["total"] = round(clock() - started, 3)
         
-        if result.returncode != 0:
-            print(f"  Evaluate failed: {result.stderr}")
+        if content is None:
+            print(f"  Page not ready before deadline: {state['last'][:100]}")
             return None
         
-        content = result.stdout.strip()
-        print(f"  Raw content length: {len(content)}")
-        
-        # 解析 JSON 结果
         try:
-            # browser evaluate 返回的可能是 JSON 包装的结果
-            wrapper = json.loads(content)
-            if isinstance(wrapper, dict):
-                if 'result' in wrapper:
-                    content = wrapper['result']
-                elif 'value' in wrapper:
-                    content = wrapper['value']
-        except:
-            pass
-        
-        if isinstance(content, str):
-            if 'NOT_FOUND' in content or 'Loading' in content or 'Error' in content:
-                print(f"  Page not ready: {content[:100]}")
-                return None
-            
-            try:
-                data = json.loads(content)
-            except json.JSONDecodeError:
-                print(f"  Invalid JSON in content: {content[:200]}")
-                return None
-        else:
-            data = content
+            data = json.loads(content)
+        except json.JSONDecodeError:
+            print(f"  Invalid JSON in content: {content[:200]}")
+            return None
         
         if isinstance(data, dict) and 'questions' in data:
             return data['questions']
@@ -205,85 +964,100 @@ def fetch_all_stats_via_browser():
         print(f"  Browser error: {e}")
         return None
 
-def calculate_stats(current_data, history, questions_config):
-    """计算统计数据，包括增量"""
-    today = datetime.now().strftime("%Y-%m-%d")
-    
-    # 获取昨天的快照用于计算增量
-    yesterday_snapshot = {}
-    if history["daily_snapshots"]:
-        last = history["daily_snapshots"][-1]
-        if last["date"] != today:
-            yesterday_snapshot = {q["question_id"]: q for q in last["questions"]}
+def _days_active_fn(now):
+    """返回按发布日期字符串计算活跃天数的函数；同一日期只解析一次"""
+    today_ordinal = now.toordinal()
+    cache = {}
+
+    def days_active(publish_date):
+        days = cache.get(publish_date)
+        if days is None:
+            try:
+                days = today_ordinal - datetime.strptime(publish_date, "%Y-%m-%d").toordinal() + 1
+            except (TypeError, ValueError):
+                days = 1
+            cache[publish_date] = days
+        return days
+
+    return days_active
+
+@TIMER.timed("calculate_stats")
+def calculate_stats(current_data, yesterday_snapshot, questions_config):
+    """计算统计数据，包括增量
+
+    yesterday_snapshot: 上一天的快照 {question_id: row}（见 VoteHistoryStore.previous_snapshot）
+    单次遍历：活跃问题按 id 建一次字典，已出现的 id 记入集合，
+    同一发布日期只解析一次，问题数上万时也是线性耗时。
+    """
+    now = datetime.now()
+    today = now.strftime("%Y-%m-%d")
+    days_active = _days_active_fn(now)
     
     # 合并问题配置和实际数据
     stats = []
+    seen = set()
     active_questions = {q["id"]: q for q in questions_config["questions"] if q.get("active", True)}
     
     for q in current_data or []:
         qid = q.get("question_id", q.get("id", ""))
         if not qid:
             continue
+        seen.add(qid)
         
         config = active_questions.get(qid, {})
-        prev = yesterday_snapshot.get(qid, {})
+        prev = yesterday_snapshot.get(qid)
         
         total = q.get("total", 0)
         count_a = q.get("count_a", 0)
-        count_b = q.get("count_b", 0)
-        
-        # 计算增量
-        delta = total - prev.get("total", 0)
         
         # 计算比例
         percent_a = round(count_a / total * 100) if total > 0 else 0
-        percent_b = 100 - percent_a if total > 0 else 0
-        
-        # 计算活跃天数
         publish_date = q.get("publish_date") or config.get("publish_date") or qid[:10]
-        try:
-            days_active = (datetime.now() - datetime.strptime(publish_date, "%Y-%m-%d")).days + 1
-        except:
-            days_active = 1
         
         stats.append({
             "question_id": qid,
             "question": q.get("question") or config.get("question", "未知问题"),
             "total": total,
-            "delta": delta,
+            "delta": total - prev["total"] if prev else total,
             "count_a": count_a,
-            "count_b": count_b,
+            "count_b": q.get("count_b", 0),
             "percent_a": percent_a,
-            "percent_b": percent_b,
-            "days_active": days_active,
+            "percent_b": 100 - percent_a if total > 0 else 0,
+            "days_active": days_active(publish_date),
             "publish_date": publish_date
         })
     
     # 对于没有数据的活跃问题，补零
     for qid, config in active_questions.items():
-        if not any(s["question_id"] == qid for s in stats):
-            prev = yesterday_snapshot.get(qid, {})
-            stats.append({
-                "question_id": qid,
-                "question": config.get("question", "未知问题"),
-                "total": 0,
-                "delta": 0 - prev.get("total", 0),
-                "count_a": 0,
-                "count_b": 0,
-                "percent_a": 0,
-                "percent_b": 0,
-                "days_active": 1,
-                "publish_date": config.get("publish_date", today)
-            })
+        if qid in seen:
+            continue
+        prev = yesterday_snapshot.get(qid)
+        stats.append({
+            "question_id": qid,
+            "question": config.get("question", "未知问题"),
+            "total": 0,
+            "delta": -prev["total"] if prev else 0,
+            "count_a": 0,
+            "count_b": 0,
+            "percent_a": 0,
+            "percent_b": 0,
+            "days_active": 1,
+            "publish_date": config.get("publish_date", today)
+        })
     
     return stats
 
-def format_report(stats, date):
-    """格式化 Telegram 报告"""
+def format_report(stats, date, window=None):
+    """格式化 Telegram 报告
+
+    window: 增量的窗口天数（见 apply_window）；为 None 时是日报
+    """
+    title = f"📊 投票日报 {date}" if not window else f"📊 投票 {window} 日报告 {date}"
     if not stats:
-        return f"📊 投票日报 {date}\n━━━━━━━━━━━━━━━━━━━━\n暂无活跃投票"
+        return f"{title}\n━━━━━━━━━━━━━━━━━━━━\n暂无活跃投票"
     
-    lines = [f"📊 投票日报 {date}", "━━━━━━━━━━━━━━━━━━━━"]
+    lines = [title, "━━━━━━━━━━━━━━━━━━━━"]
+    delta_label = f"近{window}日 " if window else ""
     
     for q in sorted(stats, key=lambda x: (-x["total"], x["question_id"])):
         delta_str = f"+{q['delta']}" if q['delta'] > 0 else str(q['delta']) if q['delta'] < 0 else "±0"
@@ -292,9 +1066,14 @@ def format_report(stats, date):
         question_short = q["question"][:25] + "..." if len(q["question"]) > 25 else q["question"]
         
         lines.append(f"\n【{question_short}】")
-        lines.append(f"📈 总票数: {q['total']} ({delta_str})")
+        lines.append(f"📈 总票数: {q['total']} ({delta_label}{delta_str})")
         if q['total'] > 0:
             lines.append(f"🅰️ {q['percent_a']}% / 🅱️ {q['percent_b']}%")
+        if "avg_daily" in q:
+            drift = f"{q['drift']:+.1f}pt" if abs(q['drift']) >= 0.05 else "±0pt"
+            lines.append(f"📉 日均 {q['avg_daily']:+.1f} 票 · 均值 {q['avg_total']:.0f} 票 · 🅰️ 占比 {drift}")
+            if q.get("window_percent_a") is not None:
+                lines.append(f"🗳️ 窗口内新票 🅰️ {q['window_percent_a']}% / 🅱️ {100 - q['window_percent_a']}%")
         lines.append(f"📅 活跃 {q['days_active']} 天")
     
     # 总计
@@ -303,50 +1082,187 @@ def format_report(stats, date):
     delta_str = f"+{total_delta}" if total_delta > 0 else str(total_delta)
     
     lines.append(f"\n━━━━━━━━━━━━━━━━━━━━")
-    lines.append(f"📊 总计: {len(stats)} 个问题, {total_votes} 票 ({delta_str})")
+    lines.append(f"📊 总计: {len(stats)} 个问题, {total_votes} 票 ({delta_label}{delta_str})")
     
     return "\n".join(lines)
 
-def send_telegram(message):
-    """发送 Telegram 消息"""
-    try:
+def parse_targets(spec):
+    """解析 "channel:target,channel:target" 形式的推送目标列表"""
+    targets = []
+    for item in spec.split(","):
+        item = item.strip()
+        if item:
+            channel, _, target = item.partition(":")
+            targets.append((channel, target))
+    return targets
+
+@dataclass
+class NotifyResult:
+    """单个推送目标的发送结果"""
+    channel: str
+    target: str
+    ok: bool
+    attempts: int = 0
+    latency: float = 0.0        # 含重试的总耗时（秒）
+    error: str = ""
+    skipped: bool = False       # 当天已发送过，按去重跳过
+
+class OpenClawTransport:
+    """通过 openclaw message send 发送消息"""
+
+    def send(self, channel, target, message, timeout=NOTIFY_TIMEOUT):
+        """发送一条消息；成功返回 None，失败返回错误描述"""
         result = subprocess.run(
-            ["openclaw", "message", "send", 
-             "--channel", "telegram",
-             "--target", "8548089012",
+            ["openclaw", "message", "send",
+             "--channel", channel,
+             "--target", target,
              "--message", message],
             capture_output=True,
             text=True,
-            timeout=30
+            timeout=timeout
         )
-        return result.returncode == 0
-    except Exception as e:
-        print(f"Failed to send Telegram: {e}")
-        return False
+        if result.returncode != 0:
+            return (result.stderr or result.stdout).strip()[:200] or f"exit {result.returncode}"
+        return None
+
+class NotificationDispatcher:
+    """把报告并发推送到多个目标，失败重试，按天去重
+
+    transport 只需实现 send(channel, target, message, timeout)，离线测试时可换成假实现。
+    去重台账（ledger）按天记录已成功发送的"报告类型/目标"，同一份报告当天重跑不会重复推送；
+    日报、--window、--trend 报告类型不同（见 report_kind），互不影响。
+    """
+
+    def __init__(self, transport=None, workers=NOTIFY_WORKERS, retries=NOTIFY_RETRIES,
+                 backoff=NOTIFY_BACKOFF, timeout=NOTIFY_TIMEOUT, ledger_file=NOTIFY_LEDGER, sleep=time.sleep):
+        self.transport = transport or OpenClawTransport()
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.ledger_file = Path(ledger_file)
+        self.sleep = sleep
+
+    def _load_ledger(self):
+        try:
+            with open(self.ledger_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _send_one(self, channel, target, message):
+        started = time.monotonic()
+        error = ""
+        for attempt in range(1, self.retries + 1):
+            try:
+                error = self.transport.send(channel, target, message, self.timeout)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            if not error:
+                return NotifyResult(channel, target, True, attempt, time.monotonic() - started)
+            if attempt < self.retries:
+                self.sleep(self.backoff * 2 ** (attempt - 1))
+        return NotifyResult(channel, target, False, self.retries, time.monotonic() - started, error)
+
+    def dispatch(self, message, targets, date, force=False, report="daily"):
+        """推送 message 到 targets（[(channel, target), ...]），返回与 targets 同序的 NotifyResult 列表
+
+        report 为报告类型（report_kind 的返回值），与目标一起作为去重键。
+        """
+        ledger = self._load_ledger()
+        # 旧台账的键只有 "channel:target"，当时只发日报
+        sent_today = {key if "/" in key else f"daily/{key}" for key in ledger.get(date, [])}
+        keys = [f"{report}/{channel}:{target}" for channel, target in targets]
+        
+        results = [None] * len(targets)
+        pending = []
+        for i, (key, (channel, target)) in enumerate(zip(keys, targets)):
+            if key in sent_today and not force:
+                results[i] = NotifyResult(channel, target, True, skipped=True)
+            else:
+                pending.append(i)
+        
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+                futures = {pool.submit(self._send_one, *targets[i], message): i for i in pending}
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+        
+        delivered = [keys[i] for i in pending if results[i].ok]
+        if delivered:
+            # 持锁重读再合并，避免并发运行互相覆盖台账；只保留最近几天
+            with file_lock(self.ledger_file):
+                ledger = self._load_ledger()
+                ledger[date] = sorted(set(ledger.get(date, [])) | set(delivered))
+                ledger = {day: ledger[day] for day in sorted(ledger)[-NOTIFY_LEDGER_DAYS:]}
+                atomic_write_json(self.ledger_file, ledger, indent=2)
+        return results
+
+def report_kind(window=None, trend=False):
+    """报告类型：daily、window-7、trend-7 等，用作推送去重键的一部分"""
+    if not window:
+        return "daily"
+    return f"{'trend' if trend else 'window'}-{window}"
 
 def add_question(question_id, question_text):
-    """添加新问题"""
+    """添加新问题
+
+    持锁完成读-改-写：先把操作写入 journal 并 fsync，再原子替换 questions.json，最后清 journal。
+    """
     ensure_dirs()
-    questions = load_questions()
-    
-    # 检查是否已存在
-    for q in questions["questions"]:
-        if q["id"] == question_id:
-            print(f"Question {question_id} already exists")
-            return
-    
-    questions["questions"].append({
-        "id": question_id,
-        "question": question_text,
-        "publish_date": question_id[:10] if question_id[:10].count('-') == 2 else datetime.now().strftime("%Y-%m-%d"),
-        "active": True
-    })
-    
-    save_questions(questions)
+    with file_lock(QUESTIONS_FILE):
+        questions = load_questions()
+        
+        # 检查是否已存在
+        for q in questions["questions"]:
+            if q["id"] == question_id:
+                print(f"Question {question_id} already exists")
+                return
+        
+        question = {
+            "id": question_id,
+            "question": question_text,
+            "publish_date": question_id[:10] if question_id[:10].count('-') == 2 else datetime.now().strftime("%Y-%m-%d"),
+            "active": True
+        }
+        with open(QUESTIONS_JOURNAL, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"op": "add", "question": question}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        
+        questions["questions"].append(question)
+        save_questions(questions)
+        QUESTIONS_JOURNAL.unlink(missing_ok=True)
     print(f"✅ Added: {question_id}")
 
 def main():
+    """入口：--profile 时在 cProfile 下运行并输出 .prof 文件和热点摘要"""
+    if "--profile" not in sys.argv:
+        return run()
+    idx = sys.argv.index("--profile")
+    if len(sys.argv) > idx + 1 and not sys.argv[idx + 1].startswith("--"):
+        path = Path(sys.argv[idx + 1])
+    else:
+        path = PROFILE_DIR / f"vote-stats-{datetime.now():%Y%m%d-%H%M%S}.prof"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(run)
+    finally:
+        profiler.dump_stats(path)
+        print(f"\n🔬 Profile written to {path}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+def run():
     dry_run = "--dry-run" in sys.argv
+    browser_deadline = BROWSER_DEADLINE
+    if "--browser-deadline" in sys.argv:
+        browser_deadline = float(sys.argv[sys.argv.index("--browser-deadline") + 1])
+    window, trend = None, False
+    for flag in ("--window", "--trend"):
+        if flag in sys.argv:
+            window = int(sys.argv[sys.argv.index(flag) + 1])
+            trend = trend or flag == "--trend"
     today = datetime.now().strftime("%Y-%m-%d")
     
     # 处理 --add 命令
@@ -358,30 +1274,51 @@ def main():
             print("Usage: --add <question_id> <question_text>")
         return 0
     
+    # 存储维护命令
+    for flag in ("--export-history", "--import-history"):
+        if flag in sys.argv:
+            idx = sys.argv.index(flag)
+            path = Path(sys.argv[idx + 1]) if len(sys.argv) > idx + 1 else HISTORY_FILE
+            store = open_store()
+            if flag == "--export-history":
+                save_history(store.export_history(), path)
+                print(f"✅ Exported history to {path}")
+            else:
+                store.import_history(load_history(path))
+                print(f"✅ Imported {path} into {store.root}")
+            return 0
+    if "--compact" in sys.argv:
+        store = open_store()
+        merged = store.compact()
+        print(f"✅ Compacted {merged} log entries into {store.series_file}")
+        return 0
+    
     print(f"📊 投票统计 {today}")
     ensure_dirs()
     
-    # 加载配置和历史
-    questions_config = load_questions()
-    history = load_history()
+    # 加载配置和历史（先重放上次崩溃遗留的 journal）
+    with TIMER.phase("load"):
+        recover_questions()
+        questions_config = load_questions()
+        store = open_store()
     
     # 从 CloudBase 拉取数据
     print("📡 Fetching votes from CloudBase...")
-    current_data = fetch_all_stats_via_browser()
+    fetched = fetch_all_stats(browser_deadline)
     
-    if current_data is None:
-        print("⚠️ Could not fetch from CloudBase, using empty data")
+    if not fetched.ok:
+        print(f"⚠️ Could not fetch from CloudBase ({fetched.error}), using empty data")
         current_data = []
     else:
-        print(f"✅ Got {len(current_data)} questions from CloudBase")
+        current_data = fetched.questions
+        print(f"✅ Got {len(current_data)} questions from CloudBase "
+              f"via {fetched.source} in {fetched.elapsed:.2f}s")
     
     # 计算统计
     print("📊 Calculating stats...")
-    stats = calculate_stats(current_data, history, questions_config)
-    
-    # 生成报告
-    report = format_report(stats, today)
-    print("\n" + report)
+    with TIMER.phase("previous_snapshot"):
+        previous = store.previous_snapshot(today)
+    stats = calculate_stats(current_data, previous, questions_config)
     
     # 保存快照
     snapshot = {
@@ -390,42 +1327,51 @@ def main():
         "questions": stats
     }
     
-    # 避免同一天重复记录
-    if history["daily_snapshots"] and history["daily_snapshots"][-1]["date"] == today:
-        history["daily_snapshots"][-1] = snapshot
-    else:
-        history["daily_snapshots"].append(snapshot)
+    # 同一天重跑时追加新记录，读取和压缩时以最后一条为准
+    with TIMER.phase("save"):
+        store.append_snapshot(snapshot)
+        # 统计不修改问题配置；只在配置文件还不存在时写出默认配置
+        if not QUESTIONS_FILE.exists():
+            with file_lock(QUESTIONS_FILE):
+                if not QUESTIONS_FILE.exists():
+                    save_questions(questions_config)
     
-    # 更新问题历史
-    for q in stats:
-        qid = q["question_id"]
-        if qid not in history["questions"]:
-            history["questions"][qid] = {
-                "question": q["question"],
-                "publish_date": q["publish_date"],
-                "daily_totals": []
-            }
-        
-        daily = history["questions"][qid]["daily_totals"]
-        entry = {"date": today, "total": q["total"], "count_a": q["count_a"], "count_b": q["count_b"]}
-        if daily and daily[-1]["date"] == today:
-            daily[-1] = entry
-        else:
-            daily.append(entry)
+    # 窗口报告：快照落盘后建累计索引（含今天），按窗口改写增量
+    if window:
+        with TIMER.phase("window_index"):
+            index = store.window_index()
+            stats = apply_window([dict(q) for q in stats], index, today, window, trend)
     
-    save_history(history)
-    save_questions(questions_config)
-    print(f"\n✅ History saved to {HISTORY_FILE}")
+    # 生成报告
+    with TIMER.phase("format_report"):
+        report = format_report(stats, today, window)
+    print("\n" + report)
+    print(f"\n✅ Snapshot appended to {store.log_file}")
     
-    # 发送 Telegram
+    # 推送报告
     if not dry_run:
-        print("\n📤 Sending Telegram...")
-        if send_telegram(report):
-            print("✅ Telegram sent")
-        else:
-            print("❌ Telegram failed")
+        targets = parse_targets(NOTIFY_TARGETS)
+        print(f"\n📤 Sending report to {len(targets)} target(s)...")
+        with TIMER.phase("notify"):
+            kind = report_kind(window, trend)
+            results = NotificationDispatcher().dispatch(report, targets, today, force="--force-notify" in sys.argv,
+                                                        report=kind)
+        for r in results:
+            if r.skipped:
+                print(f"⏭️ {r.channel}:{r.target} already sent the {kind} report today")
+            elif r.ok:
+                print(f"✅ {r.channel}:{r.target} sent in {r.latency:.2f}s ({r.attempts} attempts)")
+            else:
+                print(f"❌ {r.channel}:{r.target} failed after {r.attempts} attempts: {r.error}")
     else:
-        print("\n[dry-run] Skipping Telegram")
+        print("\n[dry-run] Skipping notifications")
+    
+    # 阶段耗时（browser 回退路径的子阶段单独列出）
+    entry = TIMER.record(date=today, source=fetched.source if fetched.ok else None,
+                         questions=len(stats), dry_run=dry_run,
+                         browser_ms={k: round(v * 1000, 1) for k, v in fetched.timings.items()})
+    print("⏱️ " + ", ".join(f"{k} {v:.0f}ms" for k, v in entry["phases_ms"].items())
+          + f" (total {entry['total_ms']:.0f}ms)")
     
     return 0
 